@@ -0,0 +1,188 @@
+import bisect
+import tkinter as tk
+from datetime import date
+from tkinter import ttk
+
+from downsample import lttb, min_max
+from transactions import Transaction
+
+GRANULARITIES = {"Daily": "day", "Weekly": "week", "Monthly": "month"}
+
+# Plot margins in pixels: left (y labels), top, right, bottom (x labels)
+MARGINS = (70, 20, 20, 30)
+
+ZOOM_STEP = 1.25
+MIN_VISIBLE_DAYS = 14
+
+
+class EarningsChartPage(ttk.Frame):
+    """
+    Earnings trend line drawn on a Canvas.
+    The series is loaded once per granularity from an aggregate query. Each redraw takes the visible slice
+    with a binary search and downsamples it to the plot width, so panning and zooming over many years of
+    daily totals stays fluid. Redraws move the existing canvas items instead of recreating them, and
+    several pan/zoom events in a row are coalesced into one redraw.
+    """
+    def __init__(self, parent, db_connection, go_back_callback):
+        super().__init__(parent)
+
+        self.transaction_manager = Transaction(db_connection)
+        self.points = []
+        self.xs = []
+        self.view = None  # (first day, last day) shown, as date ordinals
+        self.drag_x = None
+        self.redraw_pending = False
+        self.axis_key = None
+
+        control_frame = ttk.Frame(self)
+        control_frame.pack(pady=10, fill=tk.X)
+
+        ttk.Label(control_frame, text="Earnings per:").pack(side=tk.LEFT, padx=(20, 5))
+        self.granularity_var = tk.StringVar(value="Monthly")
+        granularity_dropdown = ttk.Combobox(control_frame, textvariable=self.granularity_var, state="readonly",
+                                            values=list(GRANULARITIES), width=10)
+        granularity_dropdown.pack(side=tk.LEFT)
+        granularity_dropdown.bind("<<ComboboxSelected>>", lambda event: self.load_series())
+
+        self.method_var = tk.StringVar(value="LTTB")
+        method_dropdown = ttk.Combobox(control_frame, textvariable=self.method_var, state="readonly",
+                                       values=["LTTB", "Min/Max"], width=10)
+        method_dropdown.pack(side=tk.LEFT, padx=(10, 0))
+        method_dropdown.bind("<<ComboboxSelected>>", lambda event: self.schedule_redraw())
+
+        ttk.Button(control_frame, text="Reset View", command=self.reset_view).pack(side=tk.LEFT, padx=(10, 0))
+        ttk.Label(control_frame, text="Drag to pan, scroll to zoom").pack(side=tk.LEFT, padx=(20, 0))
+
+        self.canvas = tk.Canvas(self, background="white", highlightthickness=0)
+        self.canvas.pack(expand=True, fill="both", padx=10)
+        self.line = self.canvas.create_line(0, 0, 0, 0, fill="#1f77b4", width=1.5)
+        self.axis_items = []
+
+        self.canvas.bind("<Configure>", lambda event: self.schedule_redraw())
+        self.canvas.bind("<ButtonPress-1>", self.on_drag_start)
+        self.canvas.bind("<B1-Motion>", self.on_drag)
+        self.canvas.bind("<MouseWheel>", self.on_wheel)  # Windows and macOS
+        self.canvas.bind("<Button-4>", lambda event: self.zoom(event.x, 1 / ZOOM_STEP))  # Linux
+        self.canvas.bind("<Button-5>", lambda event: self.zoom(event.x, ZOOM_STEP))
+
+        go_back_button = ttk.Button(self, text="Go Back", command=go_back_callback)
+        go_back_button.pack(pady=5)
+
+    def load_series(self):
+        """
+        Load the series for the selected granularity and show all of it.
+        """
+        series = self.transaction_manager.get_series(GRANULARITIES[self.granularity_var.get()])
+        self.points = [(date.fromisoformat(period).toordinal(), total) for period, total in series]
+        self.xs = [x for x, _ in self.points]
+        self.reset_view()
+
+    def reset_view(self):
+        if self.points:
+            self.view = (self.xs[0], max(self.xs[-1], self.xs[0] + MIN_VISIBLE_DAYS))
+        else:
+            self.view = None
+        self.schedule_redraw()
+
+    def plot_area(self):
+        left, top, right, bottom = MARGINS
+        return left, top, max(left + 1, self.canvas.winfo_width() - right), \
+            max(top + 1, self.canvas.winfo_height() - bottom)
+
+    def on_drag_start(self, event):
+        self.drag_x = event.x
+
+    def on_drag(self, event):
+        if self.view is None or self.drag_x is None:
+            return
+        left, _, right, _ = self.plot_area()
+        days_per_pixel = (self.view[1] - self.view[0]) / (right - left)
+        shift = (self.drag_x - event.x) * days_per_pixel
+        self.drag_x = event.x
+        self.view = (self.view[0] + shift, self.view[1] + shift)
+        self.schedule_redraw()
+
+    def on_wheel(self, event):
+        self.zoom(event.x, 1 / ZOOM_STEP if event.delta > 0 else ZOOM_STEP)
+
+    def zoom(self, pixel_x, factor):
+        """
+        Zoom around the day under the cursor.
+        :param pixel_x: Cursor position on the canvas.
+        :param factor: Below 1 zooms in, above 1 zooms out.
+        """
+        if self.view is None:
+            return
+        left, _, right, _ = self.plot_area()
+        first, last = self.view
+        anchor = first + (min(max(pixel_x, left), right) - left) / (right - left) * (last - first)
+        span = max(MIN_VISIBLE_DAYS, (last - first) * factor)
+        ratio = (anchor - first) / (last - first)
+        self.view = (anchor - span * ratio, anchor + span * (1 - ratio))
+        self.schedule_redraw()
+
+    def schedule_redraw(self):
+        # Pan and zoom events arrive faster than frames; draw once per idle period
+        if not self.redraw_pending:
+            self.redraw_pending = True
+            self.after_idle(self.redraw)
+
+    def redraw(self):
+        self.redraw_pending = False
+        left, top, right, bottom = self.plot_area()
+        if self.view is None:
+            self.canvas.coords(self.line, 0, 0, 0, 0)
+            self.draw_axes(None, None)
+            return
+
+        first, last = self.view
+        # One point either side of the view so the line runs to the edges
+        start = max(0, bisect.bisect_left(self.xs, first) - 1)
+        end = min(len(self.points), bisect.bisect_right(self.xs, last) + 1)
+        visible = self.points[start:end]
+        width = right - left
+        if self.method_var.get() == "LTTB":
+            visible = lttb(visible, width)
+        else:
+            visible = min_max(visible, width // 2)
+
+        high = max((y for _, y in visible), default=0) or 1
+        x_scale = width / (last - first)
+        y_scale = (bottom - top) / high
+        coords = []
+        for x, y in visible:
+            coords.append(left + (x - first) * x_scale)
+            coords.append(bottom - y * y_scale)
+        if len(coords) < 4:
+            coords = coords * 2 if coords else [0, 0, 0, 0]
+        self.canvas.coords(self.line, *coords)
+        self.draw_axes(self.view, high)
+
+    def draw_axes(self, view, high):
+        """
+        Redraw the axis labels, only when the labelled range or the canvas size changed.
+        """
+        left, top, right, bottom = self.plot_area()
+        key = (left, top, right, bottom, view and (int(view[0]), int(view[1])), high)
+        if key == self.axis_key:
+            return
+        self.axis_key = key
+        for item in self.axis_items:
+            self.canvas.delete(item)
+        self.axis_items = [self.canvas.create_rectangle(left, top, right, bottom, outline="#cccccc")]
+        if view is None:
+            self.axis_items.append(self.canvas.create_text((left + right) / 2, (top + bottom) / 2,
+                                                           text="No transactions yet"))
+            return
+
+        for step in range(5):
+            value = high * step / 4
+            y = bottom - (bottom - top) * step / 4
+            self.axis_items.append(self.canvas.create_text(left - 5, y, text=f"{value:,.0f}", anchor="e"))
+        first, last = view
+        for step in range(5):
+            day = first + (last - first) * step / 4
+            x = left + (right - left) * step / 4
+            label = date.fromordinal(max(1, int(day))).isoformat()
+            self.axis_items.append(self.canvas.create_text(x, bottom + 5, text=label, anchor="n"))
+        self.canvas.tag_raise(self.line)
@@ -1,5 +1,7 @@
+import sqlite3
 import tkinter as tk
 from tkinter import ttk, messagebox
+from client_index import ClientIndex
 
 
 def is_valid_client(name, phone, email):
@@ -24,6 +26,8 @@ class Client:
         :param db_connection: Instance of DatabaseConnection to interact with the SQLite database.
         """
         self.db_connection = db_connection
+        self._index = None
+        self._index_changes = None
 
     def add_client(self, name, phone_number, email, notes):
         """
@@ -60,6 +64,75 @@ class Client:
         cur.execute("SELECT * FROM clients")
         return cur.fetchall()
 
+    def get_client_index(self):
+        """
+        Return a ClientIndex over all clients.
+        The index is rebuilt only after the connection has written something since it was built.
+        :return: A ClientIndex instance.
+        """
+        changes = self.db_connection.conn.total_changes
+        if self._index is None or self._index_changes != changes:
+            cur = self.db_connection.conn.cursor()
+            cur.execute("SELECT id, name FROM clients")
+            self._index = ClientIndex(cur.fetchall())
+            self._index_changes = changes
+        return self._index
+
+    def search_clients(self, query, limit=20):
+        """
+        Search clients whose name contains the words in the query.
+        Uses the FTS5 index over client names when create_search_index() has set it up, otherwise LIKE.
+        :param query: String typed by the user.
+        :param limit: Maximum number of results.
+        :return: A list of (client_id, name) tuples.
+        """
+        words = query.split()
+        if not words:
+            return []
+        cur = self.db_connection.conn.cursor()
+        if self.has_search_index():
+            fts_query = " ".join('"' + word.replace('"', '""') + '"*' for word in words)
+            cur.execute("SELECT rowid, name FROM clients_fts WHERE clients_fts MATCH ? ORDER BY rank LIMIT ?",
+                        (fts_query, limit))
+        else:
+            pattern = "%" + query.strip().replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+            cur.execute("SELECT id, name FROM clients WHERE name LIKE ? ESCAPE '\\' ORDER BY name LIMIT ?",
+                        (pattern, limit))
+        return cur.fetchall()
+
+    def has_search_index(self):
+        """
+        Check whether the clients_fts table exists.
+        :return: Boolean.
+        """
+        available = getattr(self.db_connection, 'clients_fts_available', None)
+        if available is None:
+            cur = self.db_connection.conn.cursor()
+            cur.execute("SELECT 1 FROM sqlite_master WHERE type='table' AND name='clients_fts'")
+            available = cur.fetchone() is not None
+            self.db_connection.clients_fts_available = available
+        return available
+
+    def create_search_index(self):
+        """
+        Create the clients_fts table and the triggers keeping it in sync with the clients table.
+        Does nothing if the index exists or SQLite was built without FTS5.
+        :return: Boolean indicating whether the FTS index is available.
+        """
+        self.db_connection.clients_fts_available = None
+        if self.has_search_index():
+            return True
+        conn = self.db_connection.conn
+        try:
+            with conn:
+                conn.executescript(sql_create_clients_fts)
+        except sqlite3.OperationalError:
+            # SQLite built without FTS5; searches use LIKE
+            self.db_connection.clients_fts_available = False
+            return False
+        self.db_connection.clients_fts_available = True
+        return True
+
     def update_client(self, client_id, name, phone_number, email, notes):
         """
         Update a client's information in the database.
@@ -100,6 +173,90 @@ class Client:
         self.db_connection.conn.commit()
 
 
+sql_create_clients_fts = """
+    BEGIN;
+    CREATE VIRTUAL TABLE clients_fts USING fts5(name, content='clients', content_rowid='id');
+    CREATE TRIGGER clients_fts_ai AFTER INSERT ON clients BEGIN
+        INSERT INTO clients_fts(rowid, name) VALUES (new.id, new.name);
+    END;
+    CREATE TRIGGER clients_fts_ad AFTER DELETE ON clients BEGIN
+        INSERT INTO clients_fts(clients_fts, rowid, name) VALUES ('delete', old.id, old.name);
+    END;
+    CREATE TRIGGER clients_fts_au AFTER UPDATE OF name ON clients BEGIN
+        INSERT INTO clients_fts(clients_fts, rowid, name) VALUES ('delete', old.id, old.name);
+        INSERT INTO clients_fts(rowid, name) VALUES (new.id, new.name);
+    END;
+    INSERT INTO clients_fts(clients_fts) VALUES ('rebuild');
+    COMMIT;
+"""
+
+
+class ClientPicker(ttk.Combobox):
+    """
+    Type-ahead client selector.
+    Suggestions come from the client manager's ClientIndex; when no name starts with the typed text,
+    the full-text search is used instead. At most 'limit' suggestions are shown.
+    """
+    def __init__(self, parent, client_manager, limit=20, delay=150, **kwargs):
+        super().__init__(parent, **kwargs)
+        self.client_manager = client_manager
+        self.index = client_manager.get_client_index()
+        self.limit = limit
+        self.delay = delay
+        self._pending = None
+
+        self['values'] = self.index.suggest("", self.limit)
+        self.bind("<KeyRelease>", self.on_key_release)
+        self.bind("<FocusOut>", self.on_focus_out)
+
+    def on_key_release(self, event):
+        # Navigation keys open or walk the dropdown and should not refilter it
+        if event.keysym in ("Up", "Down", "Return", "Escape", "Tab"):
+            return
+        if self._pending is not None:
+            self.after_cancel(self._pending)
+        self._pending = self.after(self.delay, self.update_suggestions)
+
+    def on_focus_out(self, event):
+        # Complete partially typed text when it matches exactly one client
+        text = self.get().strip()
+        if text and self.get_client_id() is None:
+            suggestions = self.index.suggest(text, 2)
+            if len(suggestions) == 1:
+                self.set(suggestions[0])
+
+    def update_suggestions(self):
+        """
+        Refresh the dropdown values for the text currently typed in the picker.
+        """
+        self._pending = None
+        text = self.get()
+        suggestions = self.index.suggest(text, self.limit)
+        if not suggestions and len(text.strip()) >= 2:
+            for client_id, name in self.client_manager.search_clients(text, self.limit):
+                label = self.index.label_for(client_id)
+                suggestions.append(label if label is not None else name)
+        self['values'] = suggestions
+
+    def set_client(self, client_id):
+        """
+        Select the client with the given ID.
+        :param client_id: Integer representing the client's unique ID.
+        :return: Boolean indicating whether the client was found.
+        """
+        label = self.index.label_for(client_id)
+        if label is None:
+            return False
+        self.set(label)
+        return True
+
+    def get_client_id(self):
+        """
+        :return: ID of the selected client, or None if the text does not name a client.
+        """
+        return self.index.resolve(self.get())
+
+
 class ClientsPage(ttk.Frame):
     def __init__(self, parent, db_connection, go_back_callback):
         super().__init__(parent)
@@ -0,0 +1,82 @@
+import bisect
+
+
+class ClientIndex:
+    """
+    In-memory sorted prefix index over client names.
+    Labels are kept sorted by their case-folded form, so prefix suggestions and label -> id
+    resolution are binary searches instead of linear scans over every client.
+    """
+    def __init__(self, clients=()):
+        """
+        :param clients: Iterable of client rows (client_id, name, ...) as returned by Client.get_all_clients.
+        """
+        self.rebuild(clients)
+
+    def rebuild(self, clients):
+        """
+        Rebuild the index from client rows.
+        Clients sharing a name get their id appended to the label so every label resolves to one client.
+        :param clients: Iterable of client rows (client_id, name, ...).
+        """
+        rows = [(row[0], row[1]) for row in clients]
+        name_counts = {}
+        for _, name in rows:
+            name_counts[name] = name_counts.get(name, 0) + 1
+
+        entries = []
+        for client_id, name in rows:
+            label = name if name_counts[name] == 1 else f"{name} (#{client_id})"
+            entries.append((label.casefold(), label, client_id))
+        entries.sort()
+
+        self._keys = [key for key, _, _ in entries]
+        self._labels = [label for _, label, _ in entries]
+        self._ids = [client_id for _, _, client_id in entries]
+        self._label_by_id = {client_id: label for _, label, client_id in entries}
+
+    def __len__(self):
+        return len(self._keys)
+
+    def suggest(self, prefix, limit=20):
+        """
+        Return up to 'limit' labels starting with the given prefix (case-insensitive), in sorted order.
+        :param prefix: String typed by the user.
+        :param limit: Maximum number of suggestions.
+        :return: A list of client labels.
+        """
+        key = prefix.casefold()
+        start = bisect.bisect_left(self._keys, key)
+        end = min(start + limit, len(self._keys))
+        suggestions = []
+        for i in range(start, end):
+            if not self._keys[i].startswith(key):
+                break
+            suggestions.append(self._labels[i])
+        return suggestions
+
+    def resolve(self, label):
+        """
+        Resolve a client label to its ID.
+        Surrounding whitespace is ignored, and case too when only one client's label matches.
+        :param label: String label as shown in the picker, or typed by the user.
+        :return: The client's ID, or None if no client has that label.
+        """
+        label = label.strip()
+        key = label.casefold()
+        i = bisect.bisect_left(self._keys, key)
+        matches = []
+        while i < len(self._keys) and self._keys[i] == key:
+            if self._labels[i] == label:
+                return self._ids[i]
+            matches.append(self._ids[i])
+            i += 1
+        # Typed text differing only in case names a client when exactly one label matches it
+        return matches[0] if len(matches) == 1 else None
+
+    def label_for(self, client_id):
+        """
+        :param client_id: Integer representing the client's unique ID.
+        :return: The label shown for the client, or None if the client is not indexed.
+        """
+        return self._label_by_id.get(client_id)
@@ -14,6 +14,8 @@ class DatabaseConnection:
             print(f"SQLite database connected: {db_file}")
         except Error as e:
             print(e)
+        else:
+            self.create_indexes()
 
     def create_table(self):
         """Create a table from the create_table_sql statement"""
@@ -21,10 +23,20 @@ class DatabaseConnection:
             c = self.conn.cursor()
             c.execute(sql_create_clients_table)
             c.execute(sql_create_transactions_table)
+            self.create_indexes()
             db.close_connection()
         except Error as e:
             print(e)
 
+    def create_indexes(self):
+        """Create the indexes the pages query through, once their tables exist"""
+        try:
+            c = self.conn.cursor()
+            c.execute(sql_create_transactions_date_index)
+            self.conn.commit()
+        except Error as e:
+            print(e)
+
     def close_connection(self):
         """Close database connection"""
         if self.conn:
@@ -49,6 +61,10 @@ sql_create_transactions_table = """ CREATE TABLE IF NOT EXISTS transactions (
                                     FOREIGN KEY (client_id) REFERENCES clients (id)
                                 ); """
 
+# Covers the date range scans behind the yearly/monthly aggregates
+sql_create_transactions_date_index = """ CREATE INDEX IF NOT EXISTS idx_transactions_date
+                                    ON transactions (date, amount); """
+
 
 if __name__ == '__main__':
     database = "./finance_management.sqlite"
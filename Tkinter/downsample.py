@@ -0,0 +1,64 @@
+def min_max(points, buckets):
+    """
+    Reduce a series to at most 2 * buckets points, keeping the lowest and highest point of each bucket.
+    Buckets split the points evenly by count, so spikes survive however far the series is zoomed out.
+    :param points: List of (x, y) tuples sorted by x.
+    :param buckets: Number of buckets, usually the plot width in pixels.
+    :return: List of (x, y) tuples sorted by x.
+    """
+    if buckets <= 0 or len(points) <= 2 * buckets:
+        return list(points)
+    result = []
+    size = len(points) / buckets
+    for bucket in range(buckets):
+        chunk = points[int(bucket * size):int((bucket + 1) * size)]
+        if not chunk:
+            continue
+        low = min(chunk, key=lambda point: point[1])
+        high = max(chunk, key=lambda point: point[1])
+        result.extend((low, high) if low[0] <= high[0] else (high, low))
+    return result
+
+
+def lttb(points, threshold):
+    """
+    Largest-Triangle-Three-Buckets downsampling: keep the first and last point, and from each bucket in
+    between the point forming the largest triangle with the previously kept point and the next bucket's
+    average. Preserves the visual shape of a line with exactly 'threshold' points.
+    :param points: List of (x, y) tuples sorted by x.
+    :param threshold: Number of points to keep (at least 3 to have any effect).
+    :return: List of (x, y) tuples sorted by x.
+    """
+    count = len(points)
+    if threshold >= count or threshold < 3:
+        return list(points)
+
+    result = [points[0]]
+    size = (count - 2) / (threshold - 2)
+    kept = 0
+    for bucket in range(threshold - 2):
+        start = int(bucket * size) + 1
+        end = int((bucket + 1) * size) + 1
+
+        # Average of the next bucket (the last point for the final bucket)
+        next_start = end
+        next_end = min(int((bucket + 2) * size) + 1, count)
+        if next_start >= next_end:
+            next_start, next_end = count - 1, count
+        span = next_end - next_start
+        avg_x = sum(point[0] for point in points[next_start:next_end]) / span
+        avg_y = sum(point[1] for point in points[next_start:next_end]) / span
+
+        kept_x, kept_y = points[kept]
+        best_area = -1.0
+        best = start
+        for index in range(start, end):
+            x, y = points[index]
+            area = abs((kept_x - avg_x) * (y - kept_y) - (kept_x - x) * (avg_y - kept_y))
+            if area > best_area:
+                best_area = area
+                best = index
+        result.append(points[best])
+        kept = best
+    result.append(points[-1])
+    return result
@@ -1,8 +1,9 @@
 import tkinter as tk
 from tkinter import ttk, messagebox, Tk
-from client import ClientsPage
+from client import Client, ClientsPage
 from database import DatabaseConnection
 from transactions import TransactionsPage
+from charts import EarningsChartPage
 
 
 class App:
@@ -22,11 +23,13 @@ class App:
         # Clients & Transactions frame
         self.clients_frame = ClientsPage(self.root, db_connection, self.show_main_menu)
         self.transactions_frame = TransactionsPage(self.root, db_connection, self.show_main_menu)
+        self.reports_frame = EarningsChartPage(self.root, db_connection, self.show_main_menu)
 
         # Positioning frames using place
         self.menu_frame.place(relwidth=1, relheight=1)
         self.clients_frame.place(relwidth=1, relheight=1)
         self.transactions_frame.place(relwidth=1, relheight=1)
+        self.reports_frame.place(relwidth=1, relheight=1)
 
         # Initially, only the main menu is visible
         self.menu_frame.lift()
@@ -52,18 +55,22 @@ class App:
         self.menu_frame.lower()
         self.clients_frame.lift()
 
-    # Placeholder methods for transactions and reports
     def show_transactions(self):
         self.menu_frame.lower()
         self.transactions_frame.lift()
 
     def show_reports(self):
-        messagebox.showinfo("Info", "Not Available")
+        # Reload on every visit so the chart includes transactions added since
+        self.reports_frame.load_series()
+        self.menu_frame.lower()
+        self.reports_frame.lift()
 
 
 def main():
     database_path = './Tkinter/finance_management.sqlite'
     db_connection = DatabaseConnection(database_path)
+    # Full-text index behind the client picker's search fallback
+    Client(db_connection).create_search_index()
 
     root = tk.Tk()
     root.title("MOTA")
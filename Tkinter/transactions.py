@@ -1,7 +1,7 @@
 import tkinter as tk
 import calendar
 from tkinter import ttk, messagebox
-from client import Client
+from client import Client, ClientPicker
 from datetime import datetime
 
 
@@ -41,6 +41,20 @@ class Transaction:
         :param db_connection: Instance of DatabaseConnection to interact with the SQLite database.
         """
         self.db_connection = db_connection
+        self._cache = {}
+
+    def _cached(self, key, loader):
+        """
+        Return loader()'s result, reusing it until the connection writes again.
+        :param key: Name of the cached value.
+        :param loader: Callable computing the value from the database.
+        """
+        changes = self.db_connection.conn.total_changes
+        entry = self._cache.get(key)
+        if entry is None or entry[0] != changes:
+            entry = (changes, loader())
+            self._cache[key] = entry
+        return entry[1]
 
     def add_transaction(self, client_id, amount, date, description):
         """
@@ -114,6 +128,41 @@ class Transaction:
         monthly_totals = {row[0]: row[1] for row in cur.fetchall()}
         return monthly_totals
 
+    def get_active_years(self):
+        """
+        Retrieve the years that have at least one transaction, in ascending order.
+        Each year is found with one lookup on the date index, jumping straight to the next year.
+        :return: A list of integers.
+        """
+        def load():
+            years = []
+            cur = self.db_connection.conn.cursor()
+            cur.execute("SELECT MIN(date) FROM transactions")
+            first_date = cur.fetchone()[0]
+            while first_date is not None:
+                year = int(first_date[:4])
+                years.append(year)
+                cur.execute("SELECT MIN(date) FROM transactions WHERE date >= ?", (str(year + 1),))
+                first_date = cur.fetchone()[0]
+            return years
+
+        return list(self._cached('active_years', load))
+
+    def get_yearly_totals(self):
+        """
+        Retrieve the total amount transacted in each year that has transactions.
+        :return: A dictionary with year (int) as key and total amount as value.
+        """
+        def load():
+            sql = ''' SELECT substr(date, 1, 4) AS year, SUM(amount) AS total
+                        FROM transactions
+                        GROUP BY year '''
+            cur = self.db_connection.conn.cursor()
+            cur.execute(sql)
+            return {int(row[0]): row[1] for row in cur.fetchall()}
+
+        return dict(self._cached('yearly_totals', load))
+
     def get_daily_transactions(self, year, month):
         """
         Retrieve transactions for each day in a selected month of a particular year, including client names.
@@ -137,6 +186,33 @@ class Transaction:
             daily_transactions[date].append((transaction_id, client_id, amount, description, client_name))
         return daily_transactions
 
+    def get_series(self, granularity):
+        """
+        Retrieve total earnings per day, week or month across all years, in date order.
+        Weeks start on Monday and months on their first day; periods without transactions are left out.
+        :param granularity: 'day', 'week' or 'month'.
+        :return: A list of (period start date 'YYYY-MM-DD', total) tuples.
+        """
+        periods = {
+            'day': "date",
+            'week': "date(date, '-6 days', 'weekday 1')",
+            'month': "substr(date, 1, 7) || '-01'",
+        }
+        if granularity not in periods:
+            raise ValueError(f"Unknown granularity: {granularity}")
+
+        def load():
+            sql = f''' SELECT {periods[granularity]} AS period, SUM(amount) AS total
+                        FROM transactions
+                        GROUP BY period
+                        HAVING period IS NOT NULL
+                        ORDER BY period '''
+            cur = self.db_connection.conn.cursor()
+            cur.execute(sql)
+            return cur.fetchall()
+
+        return list(self._cached(('series', granularity), load))
+
 
 class TransactionsPage(ttk.Frame):
     def __init__(self, parent, db_connection, go_back_callback):
@@ -161,12 +237,7 @@ class TransactionsPage(ttk.Frame):
 
         # Dropdown to select year
         self.year_var = tk.StringVar()
-        self.year_dropdown = ttk.Combobox(control_frame, textvariable=self.year_var, state="readonly")
-
-        # Populate the dropdown with years from 2010 to the current year
-        current_year = datetime.now().year
-        self.year_dropdown['values'] = [year for year in range(2010, current_year + 1)]
-        self.year_dropdown.set(current_year)  # Default to current year
+        self.year_dropdown = ttk.Combobox(control_frame, textvariable=self.year_var, state="readonly", width=24)
         self.year_dropdown.pack(side=tk.LEFT)
 
         # Bind the selection event
@@ -185,10 +256,9 @@ class TransactionsPage(ttk.Frame):
         go_back_button = ttk.Button(self, text="Go Back", command=go_back_callback)
         go_back_button.pack(pady=5)
 
-        # Initialize and load data for the current year
-        current_year = str(datetime.now().year)
-        self.year_var.set(current_year)
-        self.load_monthly_totals(current_year)
+        # Populate the dropdown with the years that have transactions and load the latest one
+        self.load_years()
+        self.load_monthly_totals(self.get_selected_year())
 
         # Treeview for daily transactions
         self.daily_transactions_tree = ttk.Treeview(self, columns=("Date", "Amount", "Client", "Work Description"), show='headings')
@@ -226,15 +296,37 @@ class TransactionsPage(ttk.Frame):
 
     def refresh_callback(self):
         # Method to refresh transaction data display
-        selected_year = int(self.year_var.get())
-        self.load_monthly_totals(selected_year)
+        self.load_years()
+        self.load_monthly_totals(self.get_selected_year())
+
+    def load_years(self):
+        """
+        Populate the year dropdown with the years that have transactions, each labelled with its total.
+        Keeps the current selection if that year still has data, otherwise selects the latest year.
+        """
+        yearly_totals = self.transaction_manager.get_yearly_totals()
+        years = self.transaction_manager.get_active_years()
+        if not years:
+            years = [datetime.now().year]
+
+        labels = [f"{year}  (total {round(yearly_totals.get(year, 0), 2):,})" for year in years]
+        self.year_dropdown['values'] = labels
+
+        selected = self.get_selected_year() if self.year_var.get() else None
+        index = years.index(selected) if selected in years else len(years) - 1
+        self.year_dropdown.set(labels[index])
+
+    def get_selected_year(self):
+        """
+        :return: The year (int) selected in the dropdown.
+        """
+        return int(self.year_var.get().split()[0])
 
     def on_year_selected(self, event):
         """
         Load monthly totals for the selected year
         """
-        selected_year = int(self.year_var.get())
-        self.load_monthly_totals(selected_year)
+        self.load_monthly_totals(self.get_selected_year())
 
     def load_monthly_totals(self, year):
         """
@@ -254,7 +346,7 @@ class TransactionsPage(ttk.Frame):
 
     def show_daily_transactions(self, event):
         selected_item = self.monthly_totals_tree.selection()[0]
-        self.selected_year = int(self.year_var.get())  # Store selected year as a class attribute
+        self.selected_year = self.get_selected_year()  # Store selected year as a class attribute
         self.selected_month = self.monthly_totals_tree.item(selected_item, 'values')[0]  # Store selected month name
         month_number = list(calendar.month_name).index(self.selected_month)
 
@@ -321,19 +413,16 @@ class AddTransactionForm:
 
         ttk.Label(self.window, text="Client:").pack()
         self.client_var = tk.StringVar()
-        self.client_combobox = ttk.Combobox(self.window, textvariable=self.client_var, state="readonly")
         self.populate_client_dropdown()
-        self.client_combobox.pack()
+        self.client_picker.pack()
 
         # Submit button
         submit_button = ttk.Button(self.window, text="Submit", command=self.submit)
         submit_button.pack(pady=10)
 
     def populate_client_dropdown(self):
-        clients = self.client_manager.get_all_clients()
-        # Store clients as a list of tuples (client_name, client_id)
-        self.clients_list = [(client[1], client[0]) for client in clients]
-        self.client_combobox['values'] = [name for name, _ in self.clients_list]
+        # Type-ahead picker backed by the client index; names resolve to ids without scanning all clients
+        self.client_picker = ClientPicker(self.window, self.client_manager, textvariable=self.client_var)
 
     def submit(self):
         # Method to handle the submission of the form
@@ -341,7 +430,7 @@ class AddTransactionForm:
         amount = self.amount_entry.get()
         description = self.description_entry.get()
         client_name = self.client_var.get()
-        client_id = next((id for name, id in self.clients_list if name == client_name), None)
+        client_id = self.client_picker.get_client_id()
 
         # Perform validations
         if not is_valid_date(date):
@@ -373,7 +462,7 @@ class AddTransactionForm:
 
 class EditTransactionForm:
     def __init__(self, parent, transaction_manager, client_manager, transaction_id, refresh_callback, refresh_daily_transactions):
-        self.client_id_by_name = None
+        self.client_picker = None
         self.window = tk.Toplevel(parent)
         self.window.title("Edit Transaction")
         self.window.geometry('300x400')
@@ -404,50 +493,27 @@ class EditTransactionForm:
         self.description_entry.pack()
 
         ttk.Label(self.window, text="Client:").pack()
-        self.client_combobox = ttk.Combobox(self.window, state="readonly")
-        # Populate combobox with client names and set the current client
+        # Create the client picker and set the current client
         self.populate_client_dropdown(transaction_details[1])
-        self.client_combobox.pack()
+        self.client_picker.pack()
 
         # Submit button
         submit_button = ttk.Button(self.window, text="Update", command=self.submit)
         submit_button.pack(pady=10)
 
     def populate_client_dropdown(self, current_client_id):
-        # Fetch all clients
-        clients = self.client_manager.get_all_clients()
-        client_names = []
-        client_ids = []
-        current_client_name = None
-
-        for client in clients:
-            # Assuming client structure is (client_id, client_name)
-            client_id, client_name = client[0], client[1]
-            client_names.append(client_name)
-            client_ids.append(client_id)
-            # Identify the current client's name
-            if client_id == current_client_id:
-                current_client_name = client_name
-
-        # Populate the combobox
-        self.client_combobox['values'] = client_names
+        self.client_picker = ClientPicker(self.window, self.client_manager)
 
         # Set the current client as the default selection
-        if current_client_name:
-            self.client_combobox.set(current_client_name)
-        else:
+        if not self.client_picker.set_client(current_client_id):
             print("Current client not found.")
 
-        # Store client IDs mapped by name for retrieval
-        self.client_id_by_name = dict(zip(client_names, client_ids))
-
     def submit(self):
         # Extract form data
         date = self.date_entry.get()
         amount = self.amount_entry.get()
         description = self.description_entry.get()
-        client_name = self.client_combobox.get()
-        client_id = self.client_id_by_name.get(client_name)
+        client_id = self.client_picker.get_client_id()
 
         # Perform validations
         if not is_valid_date(date):
@@ -0,0 +1,175 @@
+import asyncio
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from database import DatabaseManager
+from events import EventBus
+from models import Client, IncomeRecord
+
+
+class AsyncDatabaseManager:
+    """
+    asyncio facade over DatabaseManager and the model methods.
+    SQL runs on a bounded thread pool and each worker thread lazily opens its own DatabaseManager,
+    so coroutines never block the event loop and no connection is used by two threads at once.
+
+    Cancelling a coroutine cancels its statement if it has not started yet; a statement that is already
+    running finishes on its worker and its result is discarded. Every write commits on its own, so a
+    cancelled coroutine never leaves a transaction half done.
+    """
+    def __init__(self, db_path, max_workers=4, write_queue=False):
+        """
+        Args:
+            db_path: Path of the SQLite database file.
+            max_workers: Number of worker threads, and so of open connections.
+            write_queue: Route the workers' writes through the shared single-writer queue.
+
+        Every worker's DatabaseManager publishes to the one EventBus in self.events; its subscribers are
+        called on the worker thread that made the write.
+        """
+        self.db_path = db_path
+        self.max_workers = max_workers
+        self.write_queue = write_queue
+        self.events = EventBus()
+        self._local = threading.local()
+        self._managers = []
+        self._managers_lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="mota-db")
+        self._stream_slots = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.aclose()
+
+    def _db_manager(self):
+        """Return the calling worker thread's DatabaseManager, opening it on first use."""
+        db_manager = getattr(self._local, 'db_manager', None)
+        if db_manager is None:
+            # check_same_thread=False only so close() can run after the pool is shut down
+            db_manager = DatabaseManager(self.db_path, verbose=False, check_same_thread=False,
+                                         events=self.events)
+            if self.write_queue:
+                db_manager.enable_write_queue()
+            self._local.db_manager = db_manager
+            with self._managers_lock:
+                self._managers.append(db_manager)
+        return db_manager
+
+    def _submit(self, func, *args):
+        return asyncio.wrap_future(self._executor.submit(func, *args))
+
+    async def run(self, func, *args):
+        """
+        Run func(*args, db_manager) on a worker thread with that thread's DatabaseManager.
+        Model methods take db_manager as their last argument, so any of them can be passed directly,
+        e.g. await adb.run(IncomeRecord.get_monthly_totals, 2024).
+        """
+        def call():
+            return func(*args, self._db_manager())
+
+        return await self._submit(call)
+
+    async def execute(self, query, params=None):
+        """
+        Execute a statement and return all of its rows (empty for writes).
+        Args:
+            query: SQL statement to execute
+            params: Optional values to be used in the SQL statement
+        """
+        def call():
+            cursor = self._db_manager().execute_query(query, params)
+            return cursor.fetchall() if hasattr(cursor, 'fetchall') else []
+
+        return await self._submit(call)
+
+    def _connect(self):
+        # Each call on a stream may land on a different worker, one at a time
+        return sqlite3.connect(self.db_path, check_same_thread=False)
+
+    async def stream(self, query, params=None, batch_size=500):
+        """
+        Iterate asynchronously over the rows of a query, fetching 'batch_size' rows per worker call.
+        The query gets its own connection for the lifetime of the iteration. Use contextlib.aclosing()
+        when breaking out of the loop early, so the connection is released straight away.
+        Args:
+            query: SQL statement to execute
+            params: Optional values to be used in the SQL statement
+            batch_size: Rows fetched per round trip to the pool
+        """
+        if self._stream_slots is None:
+            self._stream_slots = asyncio.Semaphore(self.max_workers)
+        async with self._stream_slots:
+            conn = await self._submit(self._connect)
+            pending = None
+            try:
+                pending = self._executor.submit(conn.execute, query, params or ())
+                cursor = await asyncio.wrap_future(pending)
+                while True:
+                    pending = self._executor.submit(cursor.fetchmany, batch_size)
+                    rows = await asyncio.wrap_future(pending)
+                    if not rows:
+                        break
+                    for row in rows:
+                        yield row
+            finally:
+                # A cancelled fetch may still be running on a worker; close once it is done
+                if pending is not None and not pending.done():
+                    pending.add_done_callback(lambda _: conn.close())
+                else:
+                    conn.close()
+
+    # Model facade
+
+    async def get_client(self, client_id):
+        return await self.run(Client.get_client, client_id)
+
+    async def get_all_clients(self):
+        return await self.run(Client.get_all_clients)
+
+    async def add_client(self, client):
+        return await self.run(client.add_client)
+
+    async def update_client(self, client):
+        return await self.run(client.update_client)
+
+    async def delete_client(self, client_id):
+        return await self.run(Client.delete_client, client_id)
+
+    async def add_record(self, record):
+        return await self.run(record.add_record)
+
+    async def get_record(self, record):
+        return await self.run(record.get_record)
+
+    async def update_record(self, record):
+        return await self.run(record.update_record)
+
+    async def delete_record(self, income_id):
+        return await self.run(IncomeRecord.delete_record, income_id)
+
+    async def get_monthly_totals(self, year):
+        return await self.run(IncomeRecord.get_monthly_totals, year)
+
+    async def get_daily_records(self, year, month):
+        return await self.run(IncomeRecord.get_daily_records, year, month)
+
+    async def get_active_years(self):
+        return await self.run(IncomeRecord.get_active_years)
+
+    async def get_yearly_totals(self):
+        return await self.run(IncomeRecord.get_yearly_totals)
+
+    def close(self):
+        """Wait for running statements, then close every worker connection."""
+        self._executor.shutdown(wait=True)
+        with self._managers_lock:
+            managers, self._managers = self._managers, []
+        for db_manager in managers:
+            db_manager.close_connection()
+
+    async def aclose(self):
+        """close() without blocking the event loop."""
+        await asyncio.get_running_loop().run_in_executor(None, self.close)
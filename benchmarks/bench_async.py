@@ -0,0 +1,70 @@
+"""
+Throughput of AsyncDatabaseManager under concurrent coroutines.
+"""
+import asyncio
+import os
+import random
+import tempfile
+import time
+
+from async_database import AsyncDatabaseManager
+from database import DatabaseManager
+from models import IncomeRecord
+
+
+def make_ledger(db_path, rows):
+    db_manager = DatabaseManager(db_path, verbose=False)
+    rng = random.Random(42)
+    records = [(rng.randint(1, 50), round(rng.uniform(10, 2000), 2),
+                f"{rng.randint(2015, 2024)}-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}", "")
+               for _ in range(rows)]
+    with db_manager.conn:
+        db_manager.conn.executemany(
+            "INSERT INTO income_records(client_id, amount, date, description) VALUES (?, ?, ?, ?)", records)
+    db_manager.close_connection()
+
+
+async def query_throughput(adb, coroutines, calls_per_coroutine):
+    async def worker(seed):
+        rng = random.Random(seed)
+        for _ in range(calls_per_coroutine):
+            await adb.get_monthly_totals(rng.randint(2015, 2024))
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker(seed) for seed in range(coroutines)))
+    return coroutines * calls_per_coroutine / (time.perf_counter() - started)
+
+
+async def stream_throughput(adb):
+    started = time.perf_counter()
+    count = 0
+    async for _ in adb.stream("SELECT * FROM income_records", batch_size=1000):
+        count += 1
+    return count / (time.perf_counter() - started)
+
+
+def run(quick):
+    rows = 20000 if quick else 200000
+    calls = 20 if quick else 100
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "bench.db")
+        make_ledger(db_path, rows)
+
+        db_manager = DatabaseManager(db_path, verbose=False)
+        started = time.perf_counter()
+        for year in range(calls):
+            IncomeRecord.get_monthly_totals(2015 + year % 10, db_manager)
+        results.append(("blocking get_monthly_totals", calls / (time.perf_counter() - started), "calls/s"))
+        db_manager.close_connection()
+
+        async def main():
+            async with AsyncDatabaseManager(db_path, max_workers=4) as adb:
+                for coroutines in (1, 4, 16, 64):
+                    per_coroutine = max(1, calls // coroutines)
+                    rate = await query_throughput(adb, coroutines, per_coroutine)
+                    results.append((f"async get_monthly_totals x{coroutines} coroutines", rate, "calls/s"))
+                results.append((f"async stream {rows} rows", await stream_throughput(adb), "rows/s"))
+
+        asyncio.run(main())
+    return results
@@ -0,0 +1,324 @@
+"""
+Load test of several DatabaseManagers sharing one database file, to measure lock contention.
+
+Readers call IncomeRecord.get_monthly_totals and get_daily_records; writers call add_record and
+update_record on random existing records. Each worker opens its own DatabaseManager, in its own thread or
+process, and runs for a fixed number of seconds. Operations failing with SQLITE_BUSY or SQLITE_LOCKED are
+retried with exponential backoff, like WriteQueue does. The report gives throughput, latency percentiles
+(retries included), busy and locked errors, retries and operations that gave up, per role.
+
+Readers go through DatabaseManager.cached(), so without writers most reads are cache hits; each write
+invalidates every reader's cache.
+
+As a benchmark (python benchmarks/runner.py contention) it compares the rollback journal with WAL. It can
+also be run directly, e.g.
+    python benchmarks/bench_contention.py --readers 8 --writers 2 --processes --journal-mode wal --seconds 10
+"""
+import argparse
+import multiprocessing
+import os
+import queue
+import random
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+import traceback
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database import DatabaseManager  # noqa: E402
+from models import IncomeRecord  # noqa: E402
+
+JOURNAL_MODES = ('delete', 'truncate', 'persist', 'wal')
+
+YEARS = range(2020, 2025)
+
+# Seconds past the run time to wait for worker processes before giving up on them
+PROCESS_GRACE = 30.0
+
+
+def make_ledger(db_path, rows, seed=42):
+    db_manager = DatabaseManager(db_path, verbose=False)
+    rng = random.Random(seed)
+    with db_manager.conn:
+        db_manager.conn.executemany("INSERT INTO clients(name, email) VALUES (?, ?)",
+                                    [(f"Client {number}", f"c{number}@example.com") for number in range(50)])
+        db_manager.conn.executemany(
+            "INSERT INTO income_records(client_id, amount, date, description) VALUES (?, ?, ?, ?)",
+            [(rng.randint(1, 50), round(rng.uniform(10, 2000), 2),
+              f"{rng.choice(YEARS)}-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}", "Consulting")
+             for _ in range(rows)])
+    db_manager.close_connection()
+
+
+def lock_error_kind(error):
+    """
+    Classify a sqlite3 error.
+    :return: 'busy' (another connection holds the file lock), 'locked' (a table lock within the same
+        shared cache or connection) or None for any other error.
+    """
+    if not isinstance(error, sqlite3.OperationalError):
+        return None
+    name = getattr(error, 'sqlite_errorname', '')
+    message = str(error).lower()
+    if name.startswith('SQLITE_LOCKED') or 'table is locked' in message:
+        return 'locked'
+    if name.startswith('SQLITE_BUSY') or 'database is locked' in message or 'busy' in message:
+        return 'busy'
+    return None
+
+
+def worker(db_path, role, seconds, journal_mode, busy_timeout, max_retries, backoff, rows, seed):
+    """
+    Run one reader or writer until 'seconds' have passed.
+    Opening the database and setting its journal mode are retried like operations, since switching to or
+    from WAL needs a lock other workers may hold; a worker that cannot open it does no operations.
+    Returns:
+        dict: 'role', 'ops' (succeeded), 'latencies' (seconds per succeeded operation), 'busy', 'locked',
+        'retries' and 'failures' (operations that gave up).
+    """
+    rng = random.Random(seed)
+    stats = {'role': role, 'ops': 0, 'latencies': [], 'busy': 0, 'locked': 0, 'retries': 0, 'failures': 0}
+    db_manager = None
+
+    def with_retries(operation):
+        """Run operation, retrying lock errors with backoff; False when it gave up."""
+        for attempt in range(max_retries + 1):
+            try:
+                operation()
+                return True
+            except sqlite3.Error as e:
+                kind = lock_error_kind(e)
+                if kind is None:
+                    raise
+                stats[kind] += 1
+                if db_manager is not None and db_manager.conn.in_transaction:
+                    db_manager.conn.rollback()
+                if attempt == max_retries:
+                    stats['failures'] += 1
+                else:
+                    stats['retries'] += 1
+                    # Jitter keeps competing workers from retrying in lockstep
+                    time.sleep(backoff * (2 ** attempt) * rng.uniform(0.5, 1.0))
+        return False
+
+    def open_database():
+        nonlocal db_manager
+        if db_manager is None:
+            db_manager = DatabaseManager(db_path, verbose=False)
+        conn = db_manager.conn
+        conn.execute(f"PRAGMA busy_timeout = {int(busy_timeout * 1000)}")
+        # The rollback journal modes are per connection; WAL is stored in the file
+        conn.execute(f"PRAGMA journal_mode = {journal_mode}")
+
+    def read():
+        if rng.random() < 0.5:
+            IncomeRecord.get_monthly_totals(rng.choice(YEARS), db_manager)
+        else:
+            IncomeRecord.get_daily_records(rng.choice(YEARS), rng.randint(1, 12), db_manager)
+
+    def write():
+        record_date = f"{rng.choice(YEARS)}-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}"
+        amount = round(rng.uniform(10, 2000), 2)
+        if rng.random() < 0.5:
+            IncomeRecord(client_id=rng.randint(1, 50), amount=amount, date=record_date).add_record(db_manager)
+        else:
+            IncomeRecord(income_id=rng.randint(1, rows), client_id=rng.randint(1, 50), amount=amount,
+                         date=record_date, description="Updated").update_record(db_manager)
+
+    operation = read if role == 'reader' else write
+    deadline = time.perf_counter() + seconds
+    try:
+        if not with_retries(open_database):
+            return stats
+        while time.perf_counter() < deadline:
+            started = time.perf_counter()
+            if not with_retries(operation):
+                continue  # gave up; not counted in ops or latencies
+            stats['latencies'].append(time.perf_counter() - started)
+            stats['ops'] += 1
+    finally:
+        if db_manager is not None:
+            db_manager.close_connection()
+    return stats
+
+
+def _run_worker(job):
+    """worker(*job), or a result with the traceback in 'error' when it raised."""
+    try:
+        return worker(*job)
+    except Exception:
+        return {'role': job[1], 'error': traceback.format_exc()}
+
+
+def _process_worker(job, results):
+    # Always put a result, so the parent never waits for one that will not come
+    results.put(_run_worker(job))
+
+
+def percentile(sorted_values, fraction):
+    """Nearest-rank percentile of an ascending list; 0 when empty."""
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(fraction * len(sorted_values)))]
+
+
+def summarize(worker_stats, seconds):
+    """
+    Merge worker results per role.
+    Returns:
+        dict: role -> 'workers', 'ops', 'ops_per_second', 'p50_ms', 'p95_ms', 'p99_ms', 'max_ms', 'busy',
+        'locked', 'retries' and 'failures'.
+    """
+    summary = {}
+    for role in ('reader', 'writer'):
+        stats = [entry for entry in worker_stats if entry['role'] == role]
+        if not stats:
+            continue
+        latencies = sorted(latency for entry in stats for latency in entry['latencies'])
+        ops = sum(entry['ops'] for entry in stats)
+        summary[role] = {
+            'workers': len(stats),
+            'ops': ops,
+            'ops_per_second': ops / seconds,
+            'p50_ms': percentile(latencies, 0.50) * 1000,
+            'p95_ms': percentile(latencies, 0.95) * 1000,
+            'p99_ms': percentile(latencies, 0.99) * 1000,
+            'max_ms': latencies[-1] * 1000 if latencies else 0.0,
+            **{key: sum(entry[key] for entry in stats) for key in ('busy', 'locked', 'retries', 'failures')},
+        }
+    return summary
+
+
+def _run_processes(jobs, timeout):
+    """Run each job in its own process; return their results, raising RuntimeError for lost workers."""
+    results = multiprocessing.Queue()
+    workers = [multiprocessing.Process(target=_process_worker, args=(job, results)) for job in jobs]
+    for process in workers:
+        process.start()
+    # Drain before joining: a process does not exit while its result is still in the pipe. A process
+    # that died without a result (e.g. killed) is noticed once none are left running.
+    worker_stats = []
+    deadline = time.monotonic() + timeout
+    while len(worker_stats) < len(workers) and time.monotonic() < deadline:
+        try:
+            worker_stats.append(results.get(timeout=0.1))
+        except queue.Empty:
+            if not any(process.is_alive() for process in workers):
+                try:
+                    worker_stats.append(results.get(timeout=0.1))
+                except queue.Empty:
+                    break
+    for process in workers:
+        process.join(max(0.0, deadline - time.monotonic()))
+        if process.is_alive():
+            process.terminate()
+            process.join()
+    exit_codes = [process.exitcode for process in workers]
+    if len(worker_stats) < len(workers) or any(exit_codes):
+        raise RuntimeError(f"{len(workers) - len(worker_stats)} of {len(workers)} worker processes returned no "
+                           f"result; exit codes {exit_codes}")
+    return worker_stats
+
+
+def load(db_path, readers=4, writers=2, seconds=5.0, processes=False, journal_mode='delete', busy_timeout=0.1,
+         max_retries=8, backoff=0.005, rows=None):
+    """
+    Run readers and writers against db_path at the same time.
+    Args:
+        db_path: Database file, e.g. from make_ledger().
+        readers: Reader workers.
+        writers: Writer workers.
+        seconds: How long every worker runs.
+        processes: Run each worker in its own process instead of a thread.
+        journal_mode: One of JOURNAL_MODES; the file is switched to it first.
+        busy_timeout: Seconds SQLite waits on a lock before reporting SQLITE_BUSY.
+        max_retries: Retries of a failing operation before it counts as a failure.
+        backoff: Initial sleep in seconds between retries; doubled after each retry.
+        rows: Ids up to this are updated by writers; defaults to the records in the file.
+
+    Returns:
+        dict: See summarize().
+    """
+    if journal_mode not in JOURNAL_MODES:
+        raise ValueError(f"journal_mode must be one of {', '.join(JOURNAL_MODES)}")
+    conn = sqlite3.connect(db_path)
+    conn.execute(f"PRAGMA journal_mode = {journal_mode}")
+    if rows is None:
+        rows = conn.execute("SELECT MAX(id) FROM income_records").fetchone()[0] or 1
+    conn.close()
+
+    jobs = [(db_path, role, seconds, journal_mode, busy_timeout, max_retries, backoff, rows, seed)
+            for seed, role in enumerate(['reader'] * readers + ['writer'] * writers)]
+    if processes:
+        worker_stats = _run_processes(jobs, seconds + PROCESS_GRACE)
+    else:
+        worker_stats = [None] * len(jobs)
+
+        def run_job(index):
+            worker_stats[index] = _run_worker(jobs[index])
+
+        threads = [threading.Thread(target=run_job, args=(index,)) for index in range(len(jobs))]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    errors = [entry['error'] for entry in worker_stats if 'error' in entry]
+    if errors:
+        raise RuntimeError(f"{len(errors)} of {len(jobs)} workers failed; first traceback:\n{errors[0]}")
+    return summarize(worker_stats, seconds)
+
+
+def run(quick):
+    seconds = 1 if quick else 5
+    rows = 20000 if quick else 200000
+    results = []
+    for journal_mode in ('delete', 'wal'):
+        with tempfile.TemporaryDirectory() as tmp:
+            db_path = os.path.join(tmp, "bench.db")
+            make_ledger(db_path, rows)
+            summary = load(db_path, readers=4, writers=2, seconds=seconds, journal_mode=journal_mode)
+        for role, stats in summary.items():
+            label = f"{journal_mode}, 4 readers + 2 writers (threads): {role}s"
+            results.append((f"{label} throughput", stats['ops_per_second'], "ops/s"))
+            for name in ('p50', 'p95', 'p99'):
+                results.append((f"{label} {name} latency", stats[f'{name}_ms'], "ms"))
+            results.append((f"{label} busy/locked errors", stats["busy"] + stats["locked"], "errors"))
+            results.append((f"{label} retries", stats['retries'], "retries"))
+            results.append((f"{label} failures", stats['failures'], "ops"))
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load test concurrent readers and writers of a MOTA database")
+    parser.add_argument("db", nargs="?", help="database file to load (default: a generated one)")
+    parser.add_argument("--readers", type=int, default=4)
+    parser.add_argument("--writers", type=int, default=2)
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--processes", action="store_true", help="one process per worker instead of threads")
+    parser.add_argument("--journal-mode", choices=JOURNAL_MODES, default="delete")
+    parser.add_argument("--busy-timeout", type=float, default=0.1, help="seconds (default: %(default)s)")
+    parser.add_argument("--retries", type=int, default=8)
+    parser.add_argument("--rows", type=int, default=200000, help="records in the generated database")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = args.db
+        if db_path is None:
+            db_path = os.path.join(tmp, "loadtest.db")
+            make_ledger(db_path, args.rows)
+        summary = load(db_path, args.readers, args.writers, args.seconds, args.processes, args.journal_mode,
+                       args.busy_timeout, args.retries)
+    print(f"journal_mode={args.journal_mode} {'processes' if args.processes else 'threads'} "
+          f"{args.seconds:g}s busy_timeout={args.busy_timeout:g}s")
+    for role, stats in summary.items():
+        print(f"{role}s x{stats['workers']}: {stats['ops_per_second']:,.0f} ops/s, "
+              f"p50 {stats['p50_ms']:.2f} ms, p95 {stats['p95_ms']:.2f} ms, p99 {stats['p99_ms']:.2f} ms, "
+              f"max {stats['max_ms']:.2f} ms, busy {stats['busy']}, locked {stats['locked']}, "
+              f"retries {stats['retries']}, failures {stats['failures']}")
+
+
+if __name__ == '__main__':
+    main()
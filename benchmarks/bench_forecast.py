@@ -0,0 +1,74 @@
+"""
+Seasonal forecasts on 20-year synthetic ledgers: first fit, incremental updates as months close, and
+cached forecasts, against refitting from scratch.
+"""
+import os
+import random
+import tempfile
+import time
+from datetime import date
+
+from database import DatabaseManager
+from forecast import Forecaster
+
+FIRST_YEAR = 2004
+YEARS = 20
+
+
+def month_records(rng, year, month, per_month):
+    return [(rng.randint(1, 50), round(rng.uniform(10, 2000) * (1 + month / 12), 2),
+             f"{year}-{month:02d}-{rng.randint(1, 28):02d}", "") for _ in range(per_month)]
+
+
+def insert(db_manager, records):
+    with db_manager.conn:
+        db_manager.conn.executemany(
+            "INSERT INTO income_records(client_id, amount, date, description) VALUES (?, ?, ?, ?)", records)
+
+
+def run(quick):
+    per_month = 100 if quick else 1000
+    results = []
+    rng = random.Random(42)
+    with tempfile.TemporaryDirectory() as tmp:
+        db_manager = DatabaseManager(os.path.join(tmp, "bench.db"), verbose=False)
+        insert(db_manager, [record for year in range(FIRST_YEAR, FIRST_YEAR + YEARS - 1)
+                            for month in range(1, 13) for record in month_records(rng, year, month, per_month)])
+        rows = db_manager.conn.execute("SELECT COUNT(*) FROM income_records").fetchone()[0]
+        today = date(FIRST_YEAR + YEARS - 1, 1, 1)
+
+        forecaster = Forecaster(db_manager)
+        started = time.perf_counter()
+        forecaster.forecast(today=today)
+        results.append((f"first fit, overall ({rows} rows)", (time.perf_counter() - started) * 1000, "ms"))
+
+        started = time.perf_counter()
+        for client_id in range(1, 51):
+            forecaster.forecast(client_id, today=today)
+        results.append(("first fit, per client", (time.perf_counter() - started) * 1000 / 50, "ms"))
+
+        calls = 2000
+        started = time.perf_counter()
+        for _ in range(calls):
+            forecaster.forecast(today=today)
+        results.append(("cached forecast", calls / (time.perf_counter() - started), "calls/s"))
+
+        incremental = refit = 0.0
+        for month in range(1, 13):
+            insert(db_manager, month_records(rng, today.year, month, per_month))
+            closed = date(today.year + month // 12, month % 12 + 1, 1)
+            started = time.perf_counter()
+            forecaster.forecast(today=closed)
+            forecaster.forecast(7, today=closed)
+            incremental += time.perf_counter() - started
+            started = time.perf_counter()
+            fresh = Forecaster(db_manager)
+            fresh.forecast(today=closed)
+            fresh.forecast(7, today=closed)
+            refit += time.perf_counter() - started
+            fresh.close()
+        results.append(("month closed: incremental update", incremental * 1000 / 12, "ms"))
+        results.append(("month closed: refit from scratch", refit * 1000 / 12, "ms"))
+        forecaster.close()
+        db_manager.close_connection()
+    return results
@@ -0,0 +1,113 @@
+"""
+Load test of the JSON HTTP API: requests per second from concurrent keep-alive clients.
+
+As a benchmark (python benchmarks/runner.py http) it starts a server on a generated database. It can
+also load an already running server:
+    python benchmarks/bench_http.py --port 8765 --threads 8 --seconds 10 /totals/2024
+"""
+import argparse
+import http.client
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database import DatabaseManager  # noqa: E402
+from http_api import ApiServer  # noqa: E402
+
+
+def load(host, port, path, threads, seconds, revalidate=False):
+    """
+    Request path from 'threads' connections for 'seconds' seconds.
+    With revalidate, each client sends the ETag of its first response, so the server answers 304.
+    Returns:
+        (requests per second, errors)
+    """
+    counts = [0] * threads
+    errors = [0] * threads
+    deadline = time.perf_counter() + seconds
+
+    def client(index):
+        connection = http.client.HTTPConnection(host, port)
+        headers = {}
+        while time.perf_counter() < deadline:
+            try:
+                connection.request("GET", path, headers=headers)
+                response = connection.getresponse()
+                response.read()
+            except (OSError, http.client.HTTPException):
+                errors[index] += 1
+                connection.close()
+                connection = http.client.HTTPConnection(host, port)
+                continue
+            if response.status not in (200, 304):
+                errors[index] += 1
+            elif revalidate and not headers:
+                headers = {"If-None-Match": response.getheader("ETag")}
+            counts[index] += 1
+        connection.close()
+
+    started = time.perf_counter()
+    workers = [threading.Thread(target=client, args=(index,)) for index in range(threads)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    return sum(counts) / (time.perf_counter() - started), sum(errors)
+
+
+def run(quick):
+    rows = 20000 if quick else 200000
+    seconds = 1 if quick else 5
+    rng = random.Random(42)
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "bench.db")
+        db_manager = DatabaseManager(db_path, verbose=False)
+        with db_manager.conn:
+            db_manager.conn.executemany("INSERT INTO clients(name, email) VALUES (?, ?)",
+                                        [(f"Client {number}", f"c{number}@example.com") for number in range(200)])
+            db_manager.conn.executemany(
+                "INSERT INTO income_records(client_id, amount, date, description) VALUES (?, ?, ?, ?)",
+                [(rng.randint(1, 200), round(rng.uniform(10, 2000), 2),
+                  f"{rng.randint(2020, 2024)}-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}",
+                  rng.choice(("Design", "Website", "Consulting", "Retainer"))) for _ in range(rows)])
+        db_manager.close_connection()
+
+        server = ApiServer(db_path, port=0, readers=4)
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+        host, port = server.server_address[:2]
+        try:
+            for path, revalidate in (("/totals/2024", False), ("/totals/2024", True),
+                                     ("/records/2024/6", False), ("/search?q=web&limit=200", False)):
+                rate, errors = load(host, port, path, threads=8, seconds=seconds, revalidate=revalidate)
+                label = f"GET {path}{' (304)' if revalidate else ''}, 8 clients"
+                results.append((label, rate, "req/s"))
+                if errors:
+                    results.append((f"{label} errors", errors, "errors"))
+        finally:
+            server.shutdown()
+            server.server_close()
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load test a running MOTA JSON API")
+    parser.add_argument("path", nargs="?", default="/totals")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--revalidate", action="store_true", help="send If-None-Match after the first response")
+    args = parser.parse_args(argv)
+    rate, errors = load(args.host, args.port, args.path, args.threads, args.seconds, args.revalidate)
+    print(f"{rate:,.0f} requests/s, {errors} errors")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,61 @@
+"""
+Incremental vacuum after deleting two years of records: time per slice (how long a writer may wait behind
+maintenance) and throughput of reclaiming the whole freelist, plus the one-time rebuild that switches the
+file to incremental auto-vacuum and the cost of optimize().
+"""
+import os
+import random
+import sqlite3
+import tempfile
+import time
+
+from database import DatabaseManager
+from maintenance import enable_incremental_auto_vacuum, incremental_vacuum, optimize
+
+
+def run(quick):
+    rows = 50000 if quick else 500000
+    rng = random.Random(42)
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "bench.db")
+        DatabaseManager(db_path, verbose=False).close_connection()
+        conn = sqlite3.connect(db_path, isolation_level=None)
+        conn.execute("BEGIN")
+        conn.executemany("INSERT INTO income_records(client_id, amount, date, description) VALUES (?, ?, ?, ?)",
+                         [(rng.randint(1, 200), round(rng.uniform(10, 2000), 2),
+                           f"{rng.randint(2020, 2024)}-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}",
+                           "Consulting") for _ in range(rows)])
+        conn.execute("COMMIT")
+        started = time.perf_counter()
+        enable_incremental_auto_vacuum(conn)
+        results.append(("one-time rebuild for incremental auto-vacuum", (time.perf_counter() - started) * 1000, "ms"))
+        # Deleted the way archive_year() does, without change log entries taking the freed pages
+        conn.execute("BEGIN")
+        conn.execute("INSERT INTO settings(key, value) VALUES ('archiving', '2021')")
+        conn.execute("DELETE FROM income_records WHERE date < '2022-01-01'")
+        conn.execute("DELETE FROM settings WHERE key = 'archiving'")
+        conn.execute("COMMIT")
+        size_before = os.path.getsize(db_path)
+        free_pages = conn.execute("PRAGMA freelist_count").fetchone()[0]
+
+        slices = []
+        while True:
+            started = time.perf_counter()
+            report = incremental_vacuum(conn, slice_pages=256, time_budget=0)
+            slices.append(time.perf_counter() - started)
+            if report['free_pages'] == 0:
+                break
+        results.append(("free pages reclaimed", free_pages, "pages"))
+        results.append(("bytes reclaimed", size_before - os.path.getsize(db_path), "bytes"))
+        results.append(("incremental vacuum slice of 256 pages, max", max(slices) * 1000, "ms"))
+        results.append(("incremental vacuum, total", sum(slices) * 1000, "ms"))
+
+        started = time.perf_counter()
+        optimize(conn)
+        results.append(("first ANALYZE (analysis_limit 1000)", (time.perf_counter() - started) * 1000, "ms"))
+        started = time.perf_counter()
+        optimize(conn)
+        results.append(("PRAGMA optimize afterwards", (time.perf_counter() - started) * 1000, "ms"))
+        conn.close()
+    return results
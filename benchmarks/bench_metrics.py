@@ -0,0 +1,36 @@
+"""
+Cost of recording metrics: a point query through execute_query() with and without the recording, and
+rendering the exposition text with the database collector.
+"""
+import os
+import tempfile
+import time
+
+from database import DatabaseManager
+from metrics import MetricsRegistry
+
+
+def per_call(func, calls):
+    started = time.perf_counter()
+    for _ in range(calls):
+        func()
+    return (time.perf_counter() - started) / calls * 1e6
+
+
+def run(quick):
+    calls = 20000 if quick else 200000
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        db_manager = DatabaseManager(os.path.join(tmp, "bench.db"), verbose=False, metrics=MetricsRegistry())
+        with db_manager.conn:
+            db_manager.conn.executemany("INSERT INTO clients(name, email) VALUES (?, ?)",
+                                        [(f"Client {number}", f"c{number}@example.com") for number in range(1000)])
+        query = "SELECT name FROM clients WHERE id = ?"
+        conn = db_manager.conn
+        bare = per_call(lambda: conn.execute(query, (500,)).fetchone(), calls)
+        recorded = per_call(lambda: db_manager.execute_query(query, (500,)).fetchone(), calls)
+        results.append(("point query, sqlite3 directly", bare, "us/call"))
+        results.append(("point query, execute_query() with metrics", recorded, "us/call"))
+        results.append(("render with database collector", per_call(db_manager.metrics.render, 200) / 1000, "ms"))
+        db_manager.close_connection()
+    return results
@@ -0,0 +1,33 @@
+"""
+Multi-year report generation with 1, 2 and 4 worker processes. Workers only help with several cores;
+on one core the pool's start-up cost shows instead.
+"""
+import os
+import random
+import tempfile
+import time
+
+from database import DatabaseManager
+from reports import generate_report
+
+
+def run(quick):
+    rows = 100000 if quick else 1000000
+    results = []
+    rng = random.Random(42)
+    with tempfile.TemporaryDirectory() as tmp:
+        db_manager = DatabaseManager(os.path.join(tmp, "bench.db"), verbose=False)
+        records = [(rng.randint(1, 200), round(rng.uniform(10, 2000), 2),
+                    f"{rng.randint(2013, 2024)}-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}", "")
+                   for _ in range(rows)]
+        with db_manager.conn:
+            db_manager.conn.executemany(
+                "INSERT INTO income_records(client_id, amount, date, description) VALUES (?, ?, ?, ?)", records)
+
+        for workers in (1, 2, 4):
+            started = time.perf_counter()
+            generate_report(db_manager, os.path.join(tmp, "report.html"), report_format='html', workers=workers)
+            results.append((f"12-year HTML report, {workers} worker(s), {rows} rows",
+                            (time.perf_counter() - started) * 1000, "ms"))
+        db_manager.close_connection()
+    return results
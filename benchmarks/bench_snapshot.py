@@ -0,0 +1,64 @@
+"""
+Columnar snapshots against reading income_records from SQLite: build, incremental update, open and a
+full scan of the amounts.
+"""
+import os
+import random
+import sqlite3
+import tempfile
+import time
+
+from database import DatabaseManager
+from models import IncomeRecord
+from snapshot import Snapshot, update_snapshot, write_snapshot
+
+
+def timed(func):
+    started = time.perf_counter()
+    result = func()
+    return (time.perf_counter() - started) * 1000, result
+
+
+def run(quick):
+    rows = 200000 if quick else 2000000
+    rng = random.Random(42)
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "bench.db")
+        path = os.path.join(tmp, "records.snap")
+        db_manager = DatabaseManager(db_path, verbose=False)
+        with db_manager.conn:
+            db_manager.conn.executemany("INSERT INTO clients(name, email) VALUES (?, ?)",
+                                        [(f"Client {number}", f"c{number}@example.com") for number in range(200)])
+            db_manager.conn.executemany(
+                "INSERT INTO income_records(client_id, amount, date, description) VALUES (?, ?, ?, ?)",
+                [(rng.randint(1, 200), round(rng.uniform(10, 2000), 2),
+                  f"{rng.randint(2020, 2024)}-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}", "Consulting")
+                 for _ in range(rows)])
+
+        elapsed, _ = timed(lambda: db_manager.conn.execute(
+            "SELECT id, amount, date, client_id FROM income_records").fetchall())
+        results.append((f"SELECT all {rows:,} records from SQLite", elapsed, "ms"))
+        elapsed, _ = timed(lambda: write_snapshot(db_manager, path))
+        results.append(("full snapshot build", elapsed, "ms"))
+
+        for number in range(100):
+            IncomeRecord(client_id=1, amount=number + 1, date="2024-12-31").add_record(db_manager)
+        IncomeRecord.delete_record(rows // 2, db_manager)
+        elapsed, report = timed(lambda: update_snapshot(db_manager, path))
+        results.append((f"incremental update, {report['changes']} changes", elapsed, "ms"))
+        elapsed, _ = timed(lambda: update_snapshot(db_manager, path))
+        results.append(("update check, unchanged", elapsed, "ms"))
+
+        elapsed, snapshot = timed(lambda: Snapshot(path))
+        results.append(("open snapshot (mmap)", elapsed, "ms"))
+        elapsed, _ = timed(lambda: sum(snapshot.amounts))
+        results.append(("sum of all amounts from the mapped column", elapsed, "ms"))
+        snapshot.close()
+        db_manager.close_connection()
+
+        conn = sqlite3.connect(db_path)
+        elapsed, _ = timed(lambda: conn.execute("SELECT SUM(amount) FROM income_records").fetchone())
+        results.append(("SUM(amount) in SQLite", elapsed, "ms"))
+        conn.close()
+    return results
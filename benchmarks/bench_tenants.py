@@ -0,0 +1,48 @@
+"""
+Opening many tenants through TenantPool: time per call and file descriptors held.
+"""
+import os
+import tempfile
+import time
+
+from models import IncomeRecord
+from tenants import TenantPool, TenantRegistry
+
+
+def open_files():
+    try:
+        return len(os.listdir("/proc/self/fd"))
+    except OSError:
+        return 0
+
+
+def run(quick):
+    tenants = 200 if quick else 1000
+    max_open = 64
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        registry = TenantRegistry(tmp)
+        pool = TenantPool(registry, max_open=max_open)
+        for number in range(tenants):
+            registry.register(f"tenant-{number:04d}")
+        baseline = open_files()
+
+        # First pass creates every tenant's file (running its migrations); the second reopens them
+        for label in ("create", "reopen"):
+            started = time.perf_counter()
+            for number in range(tenants):
+                pool.run(f"tenant-{number:04d}", IncomeRecord.get_yearly_totals)
+            results.append((f"{label} {tenants} tenants, per tenant", (time.perf_counter() - started) / tenants * 1000,
+                            "ms"))
+        results.append((f"file descriptors held, max_open={max_open}", open_files() - baseline, "fds"))
+
+        started = time.perf_counter()
+        calls = 0
+        for repeat in range(20):
+            for number in range(max_open // 2):
+                pool.run(f"tenant-{number:04d}", IncomeRecord.get_yearly_totals)
+                calls += 1
+        results.append(("cached handle call", (time.perf_counter() - started) / calls * 1000000, "us"))
+        pool.close()
+        registry.close()
+    return results
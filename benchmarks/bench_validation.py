@@ -0,0 +1,77 @@
+"""
+Batch validation of imported rows against the per-record validation methods.
+"""
+import random
+import time
+
+from models import Client, IncomeRecord
+
+
+def make_records(count):
+    rng = random.Random(42)
+    records = []
+    for _ in range(count):
+        date = f"{rng.randint(2015, 2024)}-{rng.randint(1, 12):02d}-{rng.randint(1, 31):02d}"
+        # About 5% of amounts fall outside the allowed range
+        amount = rng.uniform(-100, 11000) if rng.random() < 0.05 else rng.uniform(1, 2000)
+        amount = str(round(amount, 2))
+        records.append(IncomeRecord(client_id=str(rng.randint(1, 50)), amount=amount, date=date))
+    return records
+
+
+def make_clients(count):
+    rng = random.Random(7)
+    return [Client(name=f"Client {n}", email=f"client{n}@example.com" if rng.random() < 0.95 else f"client{n}")
+            for n in range(count)]
+
+
+def per_record(records):
+    errors = []
+    for index, record in enumerate(records):
+        if not record.client_id:
+            errors.append((index, "Client is required."))
+        elif not record.is_valid_amount():
+            errors.append((index, "Invalid amount."))
+        elif not record.is_valid_date():
+            errors.append((index, "Invalid date format."))
+    return errors
+
+
+def per_client(clients):
+    errors = []
+    for index, client in enumerate(clients):
+        try:
+            if not client.name:
+                raise ValueError("Client name cannot be empty.")
+            client.validate_email()
+        except ValueError as e:
+            errors.append((index, str(e)))
+    return errors
+
+
+def rate(func, items):
+    started = time.perf_counter()
+    result = func(items)
+    return len(items) / (time.perf_counter() - started), result
+
+
+def run(quick):
+    count = 50000 if quick else 500000
+    results = []
+
+    records = make_records(count)
+    single_rate, single_errors = rate(per_record, records)
+    batch_rate, batch_errors = rate(IncomeRecord.validate_records, records)
+    assert single_errors == batch_errors
+    results.append(("IncomeRecord per-record methods", single_rate, "rows/s"))
+    results.append(("IncomeRecord.validate_records", batch_rate, "rows/s"))
+    results.append(("IncomeRecord speedup", batch_rate / single_rate, "x"))
+
+    clients = make_clients(count // 5)
+    single_rate, single_errors = rate(per_client, clients)
+    batch_rate, batch_errors = rate(Client.validate_clients, clients)
+    assert single_errors == batch_errors
+    results.append(("Client per-client methods", single_rate, "rows/s"))
+    results.append(("Client.validate_clients", batch_rate, "rows/s"))
+    results.append(("Client speedup", batch_rate / single_rate, "x"))
+    return results
@@ -0,0 +1,59 @@
+"""
+Benchmark runner.
+
+Usage:
+    python benchmarks/runner.py [--quick] [--output FILE] [NAME ...]
+
+Runs every benchmarks/bench_<NAME>.py module (or only the named ones). Each module exposes
+run(quick) returning a list of (metric, value, unit) tuples, which are printed as one table.
+"""
+import argparse
+import importlib
+import os
+import sys
+import time
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCHMARKS_DIR))
+sys.path.insert(0, BENCHMARKS_DIR)
+
+
+def available_benchmarks():
+    names = []
+    for file_name in sorted(os.listdir(BENCHMARKS_DIR)):
+        if file_name.startswith("bench_") and file_name.endswith(".py"):
+            names.append(file_name[len("bench_"):-len(".py")])
+    return names
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run MOTA benchmarks")
+    parser.add_argument("names", nargs="*", help="benchmarks to run (default: all)")
+    parser.add_argument("--quick", action="store_true", help="smaller data sets, for smoke runs")
+    parser.add_argument("--output", help="also write the results to this file")
+    args = parser.parse_args(argv)
+
+    names = args.names or available_benchmarks()
+    unknown = set(names) - set(available_benchmarks())
+    if unknown:
+        parser.error(f"unknown benchmarks: {', '.join(sorted(unknown))}")
+
+    lines = []
+    for name in names:
+        module = importlib.import_module(f"bench_{name}")
+        started = time.perf_counter()
+        results = module.run(args.quick)
+        elapsed = time.perf_counter() - started
+        lines.append(f"## {name} ({elapsed:.1f}s)")
+        for metric, value, unit in results:
+            lines.append(f"  {metric:<48} {value:>14,.2f} {unit}")
+        print("\n".join(lines[-len(results) - 1:]), flush=True)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write("\n".join(lines) + "\n")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,89 @@
+"""
+Calendar dimension: one calendar_dim row per date with its quarter, ISO week, weekday and fiscal period.
+
+Rollups join income_records to calendar_dim on the date instead of regrouping rows in Python. Rows are
+generated a whole year at a time, on demand, for the years that rollups ask about.
+"""
+from datetime import date, timedelta
+
+DEFAULT_FISCAL_START_MONTH = 1
+
+
+def get_fiscal_start_month(conn):
+    """
+    Read the month fiscal years start in.
+    :param conn: sqlite3.Connection.
+    :return: Integer month, 1 (calendar years) unless set with set_fiscal_start_month().
+    """
+    row = conn.execute("SELECT value FROM settings WHERE key = 'fiscal_start_month'").fetchone()
+    return int(row[0]) if row is not None else DEFAULT_FISCAL_START_MONTH
+
+
+def set_fiscal_start_month(conn, month):
+    """
+    Set the month fiscal years start in and recompute the fiscal columns of the calendar.
+    :param conn: sqlite3.Connection.
+    :param month: Integer month, 1-12.
+    """
+    month = int(month)
+    if not 1 <= month <= 12:
+        raise ValueError("Fiscal start month must be between 1 and 12.")
+    with conn:
+        conn.execute("INSERT OR REPLACE INTO settings(key, value) VALUES ('fiscal_start_month', ?)", (str(month),))
+        conn.execute('''UPDATE calendar_dim
+                        SET fiscal_year = year + (CASE WHEN :start > 1 AND month >= :start THEN 1 ELSE 0 END),
+                            fiscal_quarter = ((month - :start + 12) % 12) / 3 + 1''', {'start': month})
+
+
+def fiscal_period(year, month, start_month):
+    """
+    Fiscal year and quarter of a calendar month. A fiscal year is named after the calendar year it ends in.
+    :return: Tuple (fiscal_year, fiscal_quarter).
+    """
+    fiscal_year = year + 1 if start_month > 1 and month >= start_month else year
+    return fiscal_year, (month - start_month) % 12 // 3 + 1
+
+
+def fiscal_year_bounds(fiscal_year, start_month):
+    """
+    First date and the day after the last date of a fiscal year, as YYYY-MM-DD strings.
+    :return: Tuple (first_date, end_date).
+    """
+    if start_month == 1:
+        return f"{fiscal_year:04d}-01-01", f"{fiscal_year + 1:04d}-01-01"
+    return f"{fiscal_year - 1:04d}-{start_month:02d}-01", f"{fiscal_year:04d}-{start_month:02d}-01"
+
+
+def calendar_rows(year, start_month):
+    """Yield the calendar_dim rows of one year."""
+    day = date(year, 1, 1)
+    while day.year == year:
+        iso_year, iso_week, weekday = day.isocalendar()
+        fiscal_year, fiscal_quarter = fiscal_period(year, day.month, start_month)
+        yield (day.isoformat(), year, (day.month - 1) // 3 + 1, day.month, iso_year, iso_week, weekday,
+               fiscal_year, fiscal_quarter)
+        day += timedelta(days=1)
+
+
+def ensure_calendar(conn, first_year, last_year):
+    """
+    Make sure calendar_dim covers every date from first_year to last_year.
+    The calendar is kept contiguous, so the check is two primary key lookups once it is covered.
+    :param conn: sqlite3.Connection.
+    :return: Number of rows added.
+    """
+    first_date, last_date = conn.execute("SELECT MIN(date), MAX(date) FROM calendar_dim").fetchone()
+    if first_date is None:
+        missing = range(first_year, last_year + 1)
+    else:
+        covered_first, covered_last = int(first_date[:4]), int(last_date[:4])
+        missing = [year for year in range(min(first_year, covered_first), max(last_year, covered_last) + 1)
+                   if not covered_first <= year <= covered_last]
+    if not missing:
+        return 0
+
+    start_month = get_fiscal_start_month(conn)
+    rows = [row for year in missing for row in calendar_rows(year, start_month)]
+    with conn:
+        conn.executemany("INSERT OR IGNORE INTO calendar_dim VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", rows)
+    return len(rows)
@@ -0,0 +1,567 @@
+"""
+Headless command-line interface for batch jobs.
+
+Usage:
+    python cli.py [--db PATH] summary [--year YEAR [--by month|quarter|week|weekday|fiscal] [--scheduled]]
+    python cli.py [--db PATH] daily --year YEAR --month MONTH [--scheduled]
+    python cli.py [--db PATH] schedules
+    python cli.py [--db PATH] schedule-add --client ID --amount AMOUNT --start DATE [--end DATE]
+                                           [--cadence CADENCE] [--description TEXT]
+    python cli.py [--db PATH] schedule-confirm [--through DATE]
+    python cli.py [--db PATH] import [--allow-duplicates] FILE
+    python cli.py [--db PATH] clients
+    python cli.py [--db PATH] duplicates
+    python cli.py [--db PATH] tax --year YEAR [--brackets SPEC] [--deduction AMOUNT]
+    python cli.py [--db PATH] export [--year YEAR] [--format csv|json] [--output FILE]
+    python cli.py [--db PATH] report --output FILE [--format text|csv|html] [--year YEAR ...] [--workers N]
+    python cli.py [--db PATH] archive --year YEAR
+    python cli.py [--db PATH] sync [--new-origin] OTHER_DB
+    python cli.py [--db PATH] changes [--since SEQ] [--output FILE]
+    python cli.py [--db PATH] apply-changes FILE
+    python cli.py [--db PATH] serve [--host HOST] [--port PORT] [--readers N] [--maintain]
+    python cli.py [--db PATH] metrics [--output FILE]
+    python cli.py [--db PATH] snapshot --output FILE
+    python cli.py [--db PATH] maintain [--pages N] [--budget SECONDS] [--wal-threshold BYTES]
+    python cli.py [--db PATH] vacuum
+    python cli.py [--db PATH] stats
+
+Results are printed as a single line of JSON (export writes CSV or JSON lines, metrics the Prometheus
+text format).
+Only models.py and database.py are used, so no display is needed. Modules that are not needed by
+every subcommand are imported inside the subcommand to keep startup fast.
+"""
+import argparse
+import json
+import os
+import sys
+
+from database import DatabaseManager
+from models import CADENCES, Client, IncomeRecord, RecurringSchedule
+
+DEFAULT_DB_PATH = "finance_management.sqlite"
+
+EXPORT_COLUMNS = ("id", "client_id", "amount", "date", "description")
+
+
+# --by value: (output key, IncomeRecord method, label for each group)
+SUMMARY_GROUPINGS = {
+    "month": ("months", IncomeRecord.get_monthly_totals, str),
+    "quarter": ("quarters", IncomeRecord.get_quarterly_totals, lambda quarter: f"Q{quarter}"),
+    "week": ("weeks", IncomeRecord.get_weekly_totals, lambda week: f"{week[0]}-W{week[1]:02d}"),
+    "weekday": ("weekdays", IncomeRecord.get_weekday_totals, str),
+    "fiscal": ("fiscal_quarters", IncomeRecord.get_fiscal_quarter_totals, lambda quarter: f"Q{quarter}"),
+}
+
+
+def emit(data, out=None):
+    """
+    Print data as one line of JSON.
+    :param data: JSON-serializable object.
+    :param out: File object to write to. Defaults to stdout.
+    """
+    out = out or sys.stdout
+    out.write(json.dumps(data, separators=(",", ":")) + "\n")
+
+
+def cmd_summary(args, db_manager):
+    """
+    Totals for a year by month, quarter, ISO week, weekday or fiscal quarter, or yearly totals when no
+    year is given. With --by fiscal, the year is the fiscal year.
+    """
+    if args.year is None:
+        totals = IncomeRecord.get_yearly_totals(db_manager)
+        emit({"years": {str(year): total for year, total in totals.items()},
+              "total": sum(totals.values())})
+        return 0
+
+    key, loader, label = SUMMARY_GROUPINGS[args.by]
+    if args.scheduled:
+        if args.by != "month":
+            emit({"error": "--scheduled only applies to monthly totals."})
+            return 1
+        groups = IncomeRecord.get_monthly_totals(args.year, db_manager, include_scheduled=True)
+    else:
+        groups = loader(args.year, db_manager)
+    totals = {label(group): total for group, total in sorted(groups.items())}
+    emit({"year": args.year, key: totals, "total": sum(totals.values())})
+    return 0
+
+
+def cmd_daily(args, db_manager):
+    """
+    Records for each day of a month, including client names. With --scheduled, pending recurring
+    occurrences are listed too, with a null id.
+    """
+    daily_records = IncomeRecord.get_daily_records(args.year, args.month, db_manager,
+                                                   include_scheduled=args.scheduled)
+    days = {}
+    for date, records in daily_records.items():
+        days[date] = [{"id": income_id, "client_id": client_id, "amount": amount,
+                       "description": description, "client_name": client_name}
+                      for income_id, client_id, amount, description, client_name in records]
+    emit({"year": args.year, "month": args.month, "days": days})
+    return 0
+
+
+def cmd_import(args, db_manager):
+    """
+    Import records from a CSV file with a header row of client_id, amount, date and description.
+    Valid rows are inserted in a single transaction; invalid rows are reported by line number, and rows
+    already stored are skipped (or inserted with --allow-duplicates) and reported with the stored id.
+    """
+    import csv
+
+    with open(args.file, newline="") as csv_file:
+        records = [IncomeRecord(client_id=row.get("client_id"), amount=row.get("amount") or "",
+                                date=row.get("date") or "", description=row.get("description") or "")
+                   for row in csv.DictReader(csv_file)]
+
+    invalid = dict(IncomeRecord.validate_records(records))
+    valid = []
+    line_numbers = []
+    errors = []
+    for index, record in enumerate(records):
+        # CSV client ids must also be numeric; this outranks amount and date errors
+        if record.client_id and not record.client_id.isdigit():
+            invalid[index] = "Invalid client id."
+        if index in invalid:
+            errors.append([index + 2, invalid[index]])
+        else:
+            valid.append(record)
+            line_numbers.append(index + 2)
+
+    imported, duplicates = IncomeRecord.add_records(valid, db_manager, skip_duplicates=not args.allow_duplicates)
+    emit({"imported": imported, "errors": errors,
+          "duplicates": [[line_numbers[index], income_id] for index, income_id in duplicates]})
+    return 1 if errors else 0
+
+
+def cmd_schedules(args, db_manager):
+    """
+    List the recurring schedules.
+    """
+    schedules = RecurringSchedule.get_all_schedules(db_manager)
+    emit({"schedules": [{"id": schedule.schedule_id, "client_id": schedule.client_id, "amount": schedule.amount,
+                         "cadence": schedule.cadence, "start_date": schedule.start_date,
+                         "end_date": schedule.end_date, "description": schedule.description,
+                         "materialized_through": schedule.materialized_through} for schedule in schedules]})
+    return 0
+
+
+def cmd_schedule_add(args, db_manager):
+    """
+    Add a recurring schedule. Its occurrences are not recorded until confirmed with schedule-confirm.
+    """
+    schedule = RecurringSchedule(client_id=args.client, amount=args.amount, cadence=args.cadence,
+                                 start_date=args.start, end_date=args.end, description=args.description)
+    try:
+        schedule_id = schedule.add_schedule(db_manager)
+    except ValueError as e:
+        emit({"error": str(e)})
+        return 1
+    emit({"id": schedule_id})
+    return 0
+
+
+def cmd_schedule_confirm(args, db_manager):
+    """
+    Record every pending recurring occurrence up to --through (default: today) as income records.
+    """
+    from datetime import date
+
+    through = args.through or date.today().isoformat()
+    try:
+        inserted = RecurringSchedule.materialize(through, db_manager)
+    except ValueError as e:
+        emit({"error": str(e)})
+        return 1
+    emit({"through": through, "inserted": inserted})
+    return 0
+
+
+def cmd_export(args, db_manager):
+    """
+    Export records ordered by date, optionally for one year only. Archived years are included.
+    """
+    if args.year is not None:
+        source = IncomeRecord.records_source(args.year, db_manager)
+    else:
+        source = IncomeRecord.all_records_source(db_manager)
+    sql = f"SELECT id, client_id, amount, date, description FROM {source}"
+    params = ()
+    if args.year is not None:
+        sql += " WHERE date >= ? AND date < ?"
+        params = (str(args.year), str(args.year + 1))
+    sql += " ORDER BY date, id"
+
+    out = open(args.output, "w", newline="") if args.output else sys.stdout
+    try:
+        cursor = db_manager.conn.execute(sql, params)
+        count = 0
+        if args.format == "csv":
+            import csv
+
+            writer = csv.writer(out)
+            writer.writerow(EXPORT_COLUMNS)
+            for rows in iter(lambda: cursor.fetchmany(1000), []):
+                writer.writerows(rows)
+                count += len(rows)
+        else:
+            for rows in iter(lambda: cursor.fetchmany(1000), []):
+                for row in rows:
+                    emit(dict(zip(EXPORT_COLUMNS, row)), out)
+                count += len(rows)
+    finally:
+        if args.output:
+            out.close()
+    if args.output:
+        emit({"exported": count, "output": args.output})
+    return 0
+
+
+def cmd_tax(args, db_manager):
+    """
+    Year-to-date tax estimate and estimated payments. --brackets (and --deduction) are stored for later runs.
+    """
+    from tax import TaxEstimator, parse_brackets
+
+    try:
+        if args.brackets:
+            estimator = TaxEstimator(parse_brackets(args.brackets), args.deduction or 0.0)
+            estimator.save(db_manager)
+        else:
+            estimator = TaxEstimator.load(db_manager)
+            if estimator is None:
+                raise ValueError("No tax brackets configured; pass --brackets.")
+    except ValueError as e:
+        emit({"error": str(e)})
+        return 1
+    emit(estimator.estimate(args.year, db_manager))
+    return 0
+
+
+def cmd_clients(args, db_manager):
+    """
+    Invoice statistics per client: median and 90th percentile invoice, days between payments, revenue share.
+    """
+    analytics = Client.get_client_analytics(db_manager)
+    emit({"clients": {str(client_id): stats for client_id, stats in analytics.items()}})
+    return 0
+
+
+def cmd_duplicates(args, db_manager):
+    """
+    Groups of records with the same client, amount, date and description.
+    """
+    groups = IncomeRecord.find_duplicates(db_manager)
+    emit({"groups": groups, "duplicates": sum(len(ids) - 1 for ids in groups)})
+    return 0
+
+
+def cmd_report(args, db_manager):
+    """
+    Write a per-month and per-client report, one section per year.
+    """
+    from reports import generate_report
+
+    result = generate_report(db_manager, args.output, years=args.year or None, report_format=args.format,
+                             workers=args.workers)
+    emit({"output": args.output, **result})
+    return 0
+
+
+def cmd_archive(args, db_manager):
+    """
+    Move a past year's records into its own archive file.
+    """
+    try:
+        moved = IncomeRecord.archive_year(args.year, db_manager)
+    except ValueError as e:
+        emit({"error": str(e)})
+        return 1
+    emit({"year": args.year, "archived": moved, "path": db_manager.archive_path(args.year)})
+    return 0
+
+
+def cmd_sync(args, db_manager):
+    """
+    Exchange changes with another database file, both ways, and report conflicts.
+    """
+    import sync
+
+    if args.new_origin:
+        sync.new_origin_id(db_manager.conn)
+    try:
+        result = sync.sync_databases(db_manager, args.other)
+    except ValueError as e:
+        emit({"error": str(e)})
+        return 1
+    emit(result)
+    return 0
+
+
+def cmd_changes(args, db_manager):
+    """
+    Write the changes logged after --since as one JSON document, for apply-changes on another database.
+    """
+    from sync import export_changes
+
+    delta = export_changes(db_manager, args.since)
+    if args.output:
+        with open(args.output, "w") as out:
+            emit(delta, out)
+        emit({"changes": len(delta["changes"]), "last_seq": delta["last_seq"], "output": args.output})
+    else:
+        emit(delta)
+    return 0
+
+
+def cmd_apply_changes(args, db_manager):
+    """
+    Apply a file written by the changes command.
+    """
+    from sync import apply_changes
+
+    with open(args.file) as changes_file:
+        delta = json.load(changes_file)
+    try:
+        report = apply_changes(db_manager, delta)
+    except ValueError as e:
+        emit({"error": str(e)})
+        return 1
+    emit(report)
+    return 0
+
+
+def cmd_serve(args, db_manager):
+    """
+    Serve the read-only JSON API until interrupted.
+    """
+    from http_api import ApiServer
+
+    server = ApiServer(db_manager.db_path, args.host, args.port, readers=args.readers, verbose=True)
+    scheduler = None
+    if args.maintain:
+        from maintenance import MaintenanceScheduler
+
+        scheduler = MaintenanceScheduler(db_manager.db_path, metrics=db_manager.metrics)
+        scheduler.start()
+    host, port = server.server_address[:2]
+    emit({"serving": f"http://{host}:{port}/"})
+    sys.stdout.flush()
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        if scheduler is not None:
+            scheduler.stop()
+    return 0
+
+
+def cmd_metrics(args, db_manager):
+    """
+    Database metrics in the Prometheus text format, printed or written atomically to --output
+    (e.g. for node_exporter's textfile collector).
+    """
+    if args.output:
+        db_manager.metrics.write(args.output)
+        emit({"output": args.output})
+    else:
+        sys.stdout.write(db_manager.metrics.render())
+    return 0
+
+
+def cmd_snapshot(args, db_manager):
+    """
+    Write or bring up to date a binary columnar snapshot of the income records.
+    """
+    from snapshot import update_snapshot
+
+    emit(update_snapshot(db_manager, args.output))
+    return 0
+
+
+def cmd_maintain(args, db_manager):
+    """
+    One round of maintenance now: WAL checkpoint, incremental vacuum and ANALYZE / PRAGMA optimize.
+    """
+    from maintenance import MaintenanceScheduler
+
+    scheduler = MaintenanceScheduler(db_manager.db_path, slice_pages=args.pages, time_budget=args.budget,
+                                     wal_threshold=args.wal_threshold, busy_timeout=5.0, metrics=db_manager.metrics)
+    try:
+        emit(scheduler.run_once(force_optimize=True))
+    finally:
+        scheduler.stop()
+    return 0
+
+
+def cmd_vacuum(args, db_manager):
+    """
+    Rebuild the database file, reporting its size before and after. Also switches a file created before
+    migration 10 to incremental auto-vacuum.
+    """
+    size_before = os.path.getsize(db_manager.db_path)
+    db_manager.conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+    db_manager.conn.execute("VACUUM")
+    size_after = os.path.getsize(db_manager.db_path)
+    emit({"size_before": size_before, "size_after": size_after, "reclaimed": size_before - size_after})
+    return 0
+
+
+def cmd_stats(args, db_manager):
+    """
+    Row counts, income total and date range (archived years included), and storage statistics.
+    """
+    conn = db_manager.conn
+    first_date, last_date = IncomeRecord.get_date_bounds(db_manager)
+    page_size = conn.execute("PRAGMA page_size").fetchone()[0]
+    emit({
+        "path": db_manager.db_path,
+        "clients": conn.execute("SELECT COUNT(*) FROM clients").fetchone()[0],
+        "income_records": conn.execute(
+            f"SELECT COUNT(*) FROM {IncomeRecord.all_records_source(db_manager)}").fetchone()[0],
+        "total": sum(IncomeRecord.get_yearly_totals(db_manager).values()),
+        "first_date": first_date,
+        "last_date": last_date,
+        "years": IncomeRecord.get_active_years(db_manager),
+        "page_size": page_size,
+        "page_count": conn.execute("PRAGMA page_count").fetchone()[0],
+        "freelist_count": conn.execute("PRAGMA freelist_count").fetchone()[0],
+        "file_size": os.path.getsize(db_manager.db_path),
+    })
+    return 0
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="mota", description="MOTA batch commands")
+    parser.add_argument("--db", default=os.environ.get("MOTA_DB", DEFAULT_DB_PATH),
+                        help="database file (default: $MOTA_DB or %(default)s)")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    summary = subparsers.add_parser("summary", help="monthly totals for a year, or yearly totals")
+    summary.add_argument("--year", type=int)
+    summary.add_argument("--by", choices=tuple(SUMMARY_GROUPINGS), default="month",
+                         help="grouping when --year is given (default: %(default)s)")
+    summary.add_argument("--scheduled", action="store_true",
+                         help="include recurring occurrences not confirmed yet (monthly totals only)")
+    summary.set_defaults(func=cmd_summary)
+
+    daily = subparsers.add_parser("daily", help="records for each day of a month")
+    daily.add_argument("--year", type=int, required=True)
+    daily.add_argument("--month", type=int, required=True, choices=range(1, 13), metavar="MONTH")
+    daily.add_argument("--scheduled", action="store_true", help="include recurring occurrences not confirmed yet")
+    daily.set_defaults(func=cmd_daily)
+
+    schedules = subparsers.add_parser("schedules", help="list recurring income schedules")
+    schedules.set_defaults(func=cmd_schedules)
+
+    schedule_add = subparsers.add_parser("schedule-add", help="add a recurring income schedule")
+    schedule_add.add_argument("--client", type=int, required=True)
+    schedule_add.add_argument("--amount", type=float, required=True)
+    schedule_add.add_argument("--start", required=True, help="date of the first occurrence")
+    schedule_add.add_argument("--end", help="last date an occurrence may fall on (default: none)")
+    schedule_add.add_argument("--cadence", choices=tuple(CADENCES), default="monthly")
+    schedule_add.add_argument("--description", default="")
+    schedule_add.set_defaults(func=cmd_schedule_add)
+
+    schedule_confirm = subparsers.add_parser("schedule-confirm", help="record recurring occurrences up to a date")
+    schedule_confirm.add_argument("--through", help="last date to record (default: today)")
+    schedule_confirm.set_defaults(func=cmd_schedule_confirm)
+
+    import_parser = subparsers.add_parser("import", help="import records from a CSV file")
+    import_parser.add_argument("file")
+    import_parser.add_argument("--allow-duplicates", action="store_true",
+                               help="insert rows that are already stored instead of skipping them")
+    import_parser.set_defaults(func=cmd_import)
+
+    export = subparsers.add_parser("export", help="export records as CSV or JSON lines")
+    export.add_argument("--year", type=int)
+    export.add_argument("--format", choices=("csv", "json"), default="csv")
+    export.add_argument("--output", "-o")
+    export.set_defaults(func=cmd_export)
+
+    tax = subparsers.add_parser("tax", help="year-to-date tax estimate and estimated payments")
+    tax.add_argument("--year", type=int, required=True)
+    tax.add_argument("--brackets", help="threshold:rate pairs, e.g. 0:0.1,11000:0.12 (stored for later runs)")
+    tax.add_argument("--deduction", type=float, help="amount deducted before the brackets apply")
+    tax.set_defaults(func=cmd_tax)
+
+    clients = subparsers.add_parser("clients", help="invoice statistics per client")
+    clients.set_defaults(func=cmd_clients)
+
+    duplicates = subparsers.add_parser("duplicates", help="list groups of identical records")
+    duplicates.set_defaults(func=cmd_duplicates)
+
+    report = subparsers.add_parser("report", help="per-month and per-client report as text, CSV or HTML")
+    report.add_argument("--output", "-o", required=True)
+    report.add_argument("--format", choices=("text", "csv", "html"), default="text")
+    report.add_argument("--year", type=int, action="append", help="year to include; repeat for several (default: all)")
+    report.add_argument("--workers", type=int, default=1,
+                        help="worker processes summarising years in parallel (default: %(default)s)")
+    report.set_defaults(func=cmd_report)
+
+    archive = subparsers.add_parser("archive", help="move a past year's records into an archive file")
+    archive.add_argument("--year", type=int, required=True)
+    archive.set_defaults(func=cmd_archive)
+
+    sync_parser = subparsers.add_parser("sync", help="exchange changes with another database file")
+    sync_parser.add_argument("other")
+    sync_parser.add_argument("--new-origin", action="store_true",
+                             help="give this database a new origin id first (needed once on a copied file)")
+    sync_parser.set_defaults(func=cmd_sync)
+
+    changes = subparsers.add_parser("changes", help="export the change log after a sequence number")
+    changes.add_argument("--since", type=int, default=0, help="last sequence number already exported")
+    changes.add_argument("--output", "-o")
+    changes.set_defaults(func=cmd_changes)
+
+    apply_parser = subparsers.add_parser("apply-changes", help="apply changes exported from another database")
+    apply_parser.add_argument("file")
+    apply_parser.set_defaults(func=cmd_apply_changes)
+
+    serve = subparsers.add_parser("serve", help="serve clients, totals and records as a local JSON API")
+    serve.add_argument("--host", default="127.0.0.1")
+    serve.add_argument("--port", type=int, default=8765)
+    serve.add_argument("--readers", type=int, default=4, help="read-only connections (default: %(default)s)")
+    serve.add_argument("--maintain", action="store_true", help="run maintenance in the background while idle")
+    serve.set_defaults(func=cmd_serve)
+
+    metrics = subparsers.add_parser("metrics", help="database metrics in the Prometheus text format")
+    metrics.add_argument("--output", "-o")
+    metrics.set_defaults(func=cmd_metrics)
+
+    snapshot = subparsers.add_parser("snapshot", help="binary columnar snapshot of the records, for analytics")
+    snapshot.add_argument("--output", "-o", required=True)
+    snapshot.set_defaults(func=cmd_snapshot)
+
+    maintain = subparsers.add_parser("maintain", help="checkpoint, incrementally vacuum and analyze the database")
+    maintain.add_argument("--pages", type=int, default=256, help="pages freed per transaction (default: %(default)s)")
+    maintain.add_argument("--budget", type=float, help="seconds to spend freeing pages (default: until done)")
+    maintain.add_argument("--wal-threshold", type=int, default=0,
+                          help="checkpoint only when the WAL file is at least this many bytes (default: %(default)s)")
+    maintain.set_defaults(func=cmd_maintain)
+
+    vacuum = subparsers.add_parser("vacuum", help="rebuild the database file")
+    vacuum.set_defaults(func=cmd_vacuum)
+
+    stats = subparsers.add_parser("stats", help="row counts and storage statistics")
+    stats.set_defaults(func=cmd_stats)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    db_manager = DatabaseManager(args.db, verbose=False)
+    if db_manager.conn is None:
+        return 2
+    try:
+        return args.func(args, db_manager)
+    finally:
+        db_manager.close_connection()
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,37 +1,127 @@
+import os
 import sqlite3
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+
+from events import EventBus
+from metrics import REGISTRY, database_collector, database_label
+from migrations import migrate
+
+# Statements starting with these keywords return rows and are never routed to the write queue
+READ_KEYWORDS = ('SELECT', 'WITH', 'PRAGMA', 'EXPLAIN', 'VALUES')
+
+# SQLite allows 10 attached databases by default; older attachments are detached beyond this
+MAX_ATTACHED = 8
 
 
 class DatabaseManager:
     """
     This class will handle the connection to the SQLite database.
     """
-    def __init__(self, db_path):
-        """ Initialize db connection"""
+    def __init__(self, db_path, verbose=True, check_same_thread=True, migration_progress=None, archive_dir=None,
+                 events=None, read_only=False, metrics=None):
+        """
+        Initialize db connection
+        Args:
+            db_path: Path of the SQLite database file
+            verbose: Print connection and migration status messages
+            check_same_thread: Passed to sqlite3.connect; False lets another thread close the connection
+            migration_progress: Optional callback receiving migration progress events (see migrations.migrate)
+            archive_dir: Directory of the per-year archive files. Defaults to '<database name>-archive'
+                next to the database file.
+            events: EventBus receiving the model write methods' change events. Defaults to a new bus;
+                pass one in to share it between managers of the same database.
+            read_only: Open the file read-only and leave the schema as it is. Writes raise
+                sqlite3.OperationalError; the file must exist and be migrated already.
+            metrics: MetricsRegistry to record query latency, commits, changed rows and cache hits in,
+                labelled with the database file's name. Defaults to metrics.REGISTRY.
+
+        """
+        self.db_path = db_path
+        if archive_dir is None:
+            archive_dir = os.path.splitext(os.path.abspath(db_path))[0] + "-archive"
+        self.archive_dir = archive_dir
+        self._attached = OrderedDict()
+        self.events = events if events is not None else EventBus()
+        self.verbose = verbose
+        if migration_progress is None and verbose:
+            migration_progress = self._print_migration_progress
+        self.migration_progress = migration_progress
         self.conn = None
+        # Bumped whenever a statement executed through this manager changes rows; see cached()
+        self.write_generation = 0
+        self._total_changes = 0
+        self._cache = {}
+        self.write_queue = None
+        self.read_only = read_only
+        self._init_metrics(metrics if metrics is not None else REGISTRY)
         try:
-            self.conn = sqlite3.connect(db_path)
-            self.create_tables()
-            print(f"SQLite database connected: {db_path}")
+            if read_only:
+                self.conn = sqlite3.connect(f"file:{os.path.abspath(db_path)}?mode=ro", uri=True,
+                                            check_same_thread=check_same_thread)
+            else:
+                self.conn = sqlite3.connect(db_path, check_same_thread=check_same_thread)
+                self.create_tables()
+            self.metrics.add_collector(self._collector_key, database_collector(db_path))
+            if self.verbose:
+                print(f"SQLite database connected: {db_path}")
         except sqlite3.Error as e:
             print(e)
 
-    def create_tables(self):
-        """Create a table from the create_table_sql statement"""
+    def _init_metrics(self, registry):
+        # Children are looked up once here so recording on the hot path is a clock read and an addition
+        self.metrics = registry
+        label = database_label(self.db_path)
+        latency = registry.histogram('mota_query_duration_seconds',
+                                     'Time to execute a statement or a model transaction, fetching excluded.',
+                                     ('database', 'kind'))
+        self._read_latency = latency.labels(label, 'read')
+        self._write_latency = latency.labels(label, 'write')
+        self._transaction_latency = latency.labels(label, 'transaction')
+        self._commits = registry.counter('mota_commits_total', 'Transactions that changed rows.',
+                                         ('database',)).labels(label)
+        self._rows_changed = registry.counter('mota_rows_changed_total', 'Rows inserted, updated or deleted.',
+                                              ('database',)).labels(label)
+        cache_requests = registry.counter('mota_cache_requests_total', 'DatabaseManager.cached() lookups.',
+                                          ('database', 'result'))
+        self._cache_hits = cache_requests.labels(label, 'hit')
+        self._cache_misses = cache_requests.labels(label, 'miss')
+        self._collector_key = ('database', os.path.abspath(self.db_path))
 
+    def record_transaction(self, started, rows):
+        """
+        Account for a transaction a model method ran on self.conn directly, bypassing execute_query().
+        Args:
+            started: time.perf_counter() value taken when the transaction began
+            rows: Number of rows it changed
+
+        """
+        self._transaction_latency.observe(time.perf_counter() - started)
+        if rows:
+            self._commits.inc()
+            self._rows_changed.inc(rows)
+        # Keeps execute_query() from counting these changes again
+        if self.conn.total_changes != self._total_changes:
+            self._total_changes = self.conn.total_changes
+            self.write_generation += 1
+
+    def create_tables(self):
+        """
+        Bring the schema up to date by applying pending migrations.
+        When the schema is current this is a single PRAGMA user_version read.
+        """
         try:
-            cursor = self.execute_query("SELECT name FROM sqlite_master WHERE type='table';")
-            tables = [name for (name,) in cursor.fetchall()]
-            if 'clients' not in tables:
-                self.execute_query(sql_create_clients_table)
-            else:
-                print("client table exist.")
-            if 'income_records' not in tables:
-                self.execute_query(sql_create_income_records_table)
-            else:
-                print("income_records table exist.")
+            migrate(self.conn, progress=self.migration_progress)
         except sqlite3.Error as e:
             print(f"Error creating tables: {e}")
 
+    def _print_migration_progress(self, event):
+        if event['stage'] == 'start':
+            print(f"Applying migration {event['version']}: {event['description']}")
+        elif event['stage'] == 'running':
+            print(f"  ... migration {event['version']} running for {event['elapsed']:.1f}s")
+
     def execute_query(self, query, params=None):
         """
         Helper for managing cursor lifecycle with 'with' blocks
@@ -40,6 +130,15 @@ class DatabaseManager:
             params: Optional values to be used in the SQL statement
 
         """
+        started = time.perf_counter()
+        if self.write_queue is not None and not is_read_query(query):
+            result = self.submit_write(query, params).result()
+            self.write_generation += 1
+            self._write_latency.observe(time.perf_counter() - started)
+            if result.rowcount > 0:
+                self._rows_changed.inc(result.rowcount)
+            return result
+
         try:
             with self.conn:
                 cursor = self.conn.cursor()
@@ -47,31 +146,223 @@ class DatabaseManager:
                     cursor.execute(query, params)
                 else:
                     cursor.execute(query)
-                return cursor
         except sqlite3.Error as e:
             raise e
+        elapsed = time.perf_counter() - started
+        if self.conn.total_changes != self._total_changes:
+            self._write_latency.observe(elapsed)
+            self._commits.inc()
+            # rowcount leaves out the rows the change log triggers write
+            if cursor.rowcount > 0:
+                self._rows_changed.inc(cursor.rowcount)
+            self._total_changes = self.conn.total_changes
+            self.write_generation += 1
+        else:
+            self._read_latency.observe(elapsed)
+        return cursor
+
+    def data_stamp(self):
+        """
+        Return a value that changes whenever the database may have changed.
+        Combines this manager's write_generation, the connection's total_changes (writes made on
+        self.conn directly) and PRAGMA data_version (commits from any other connection or process).
+        """
+        data_version = self.conn.execute("PRAGMA data_version").fetchone()[0]
+        return self.write_generation, self.conn.total_changes, data_version
+
+    def cached(self, key, loader):
+        """
+        Return the value produced by loader(), reusing it until the database changes (see data_stamp()).
+        Args:
+            key: Hashable name of the cached value
+            loader: Callable computing the value from the database
+
+        """
+        stamp = self.data_stamp()
+        entry = self._cache.get(key)
+        if entry is not None and entry[0] == stamp:
+            self._cache_hits.inc()
+            return entry[1]
+        self._cache_misses.inc()
+        value = loader()
+        self._cache[key] = (stamp, value)
+        return value
+
+    def attach(self, path, schema):
+        """
+        Attach another database file to this connection under 'schema', unless it already is.
+        At most MAX_ATTACHED files stay attached; the least recently used one is detached first.
+        Args:
+            path: Path of the database file (created if missing)
+            schema: Schema name to attach it as; must be a plain identifier
+
+        Returns:
+            str: schema
+        """
+        if schema in self._attached:
+            self._attached.move_to_end(schema)
+            return schema
+        if not schema.isidentifier():
+            raise ValueError(f"Invalid schema name: {schema}")
+        if len(self._attached) >= MAX_ATTACHED:
+            oldest, _ = self._attached.popitem(last=False)
+            self.conn.execute(f"DETACH DATABASE {oldest}")
+        self.conn.execute(f"ATTACH DATABASE ? AS {schema}", (path,))
+        self._attached[schema] = path
+        return schema
+
+    def archive_path(self, year):
+        """Path of the archive file holding a year's records."""
+        return os.path.join(self.archive_dir, f"income_records_{int(year)}.sqlite")
+
+    def enable_write_queue(self, **options):
+        """
+        Route writes through a single writer thread shared by every manager of this database file.
+        Writes are then committed in groups, and concurrent writers queue up instead of failing with
+        'database is locked'. execute_query() keeps blocking until the write is committed and returns a
+        WriteResult carrying lastrowid and rowcount.
+        Args:
+            options: WriteQueue options (max_batch, max_delay, max_retries, backoff, busy_timeout)
+
+        """
+        if self.write_queue is None:
+            # Imported here so plain DatabaseManager users (e.g. the CLI) do not pay for threading imports
+            from write_queue import acquire_write_queue
+
+            self.write_queue = acquire_write_queue(self.db_path, **options)
+        return self.write_queue
+
+    def submit_write(self, query, params=None):
+        """
+        Queue a write without waiting for it.
+        Args:
+            query: SQL statement to execute
+            params: Optional values to be used in the SQL statement
+
+        Returns:
+            concurrent.futures.Future resolving to a WriteResult with the statement's lastrowid.
+        """
+        return self.enable_write_queue().submit(query, params)
+
+    def backup(self, target_path, pages=256, sleep=0.005, progress=None, verify=True):
+        """
+        Copy the database to target_path with SQLite's online backup API while it stays in use.
+        The copy is read through this manager's connection, 'pages' pages per step with a pause between
+        steps, so locks are only held briefly. Writes made through this manager during the copy are
+        applied to the copy in place; the file appears at target_path only once it is complete and verified.
+        Args:
+            target_path: Path of the backup file to create (replaced if it exists)
+            pages: Pages copied per step
+            sleep: Seconds to pause between steps
+            progress: Optional callback receiving (pages_copied, total_pages) after each step
+            verify: Run PRAGMA integrity_check on the copy
+
+        Returns:
+            str: target_path
+        """
+        partial_path = target_path + ".part"
+        target = sqlite3.connect(partial_path)
+        completed = False
+        try:
+            def on_progress(status, remaining, total):
+                if progress is not None:
+                    progress(total - remaining, total)
+
+            self.conn.backup(target, pages=pages, progress=on_progress, sleep=sleep)
+            if verify:
+                result = target.execute("PRAGMA integrity_check").fetchone()[0]
+                if result != 'ok':
+                    raise sqlite3.DatabaseError(f"Backup failed integrity check: {result}")
+            completed = True
+        finally:
+            target.close()
+            if not completed and os.path.exists(partial_path):
+                os.remove(partial_path)
+        os.replace(partial_path, target_path)
+        return target_path
+
+    def create_backup(self, backup_dir, keep=7, max_age_days=None, **backup_options):
+        """
+        Write a timestamped backup into backup_dir, then apply the retention policy.
+        Backups are named '<database name>-YYYYmmdd-HHMMSS-ffffff.sqlite'.
+        Args:
+            backup_dir: Directory holding the backups (created if missing)
+            keep: Number of most recent backups to keep
+            max_age_days: Also delete backups older than this many days, except the newest one
+            backup_options: Passed to backup() (pages, sleep, progress, verify)
+
+        Returns:
+            str: Path of the new backup.
+        """
+        os.makedirs(backup_dir, exist_ok=True)
+        stem = os.path.splitext(os.path.basename(self.db_path))[0]
+        file_name = f"{stem}-{datetime.now().strftime('%Y%m%d-%H%M%S-%f')}.sqlite"
+        path = self.backup(os.path.join(backup_dir, file_name), **backup_options)
+        self.rotate_backups(backup_dir, keep, max_age_days)
+        return path
+
+    def list_backups(self, backup_dir):
+        """
+        List this database's timestamped backups in backup_dir, newest first.
+        Returns:
+            A list of (datetime, path) tuples.
+        """
+        stem = os.path.splitext(os.path.basename(self.db_path))[0]
+        backups = []
+        for file_name in os.listdir(backup_dir):
+            if not (file_name.startswith(stem + "-") and file_name.endswith(".sqlite")):
+                continue
+            try:
+                taken_at = datetime.strptime(file_name[len(stem) + 1:-len(".sqlite")], '%Y%m%d-%H%M%S-%f')
+            except ValueError:
+                continue
+            backups.append((taken_at, os.path.join(backup_dir, file_name)))
+        backups.sort(reverse=True)
+        return backups
+
+    def rotate_backups(self, backup_dir, keep=7, max_age_days=None):
+        """
+        Delete backups beyond the newest 'keep', and those older than max_age_days (the newest always stays).
+        Returns:
+            A list of deleted paths.
+        """
+        backups = self.list_backups(backup_dir)
+        cutoff = datetime.now() - timedelta(days=max_age_days) if max_age_days is not None else None
+        deleted = []
+        for position, (taken_at, path) in enumerate(backups):
+            if position >= max(keep, 1) or (position > 0 and cutoff is not None and taken_at < cutoff):
+                os.remove(path)
+                deleted.append(path)
+        return deleted
 
     def close_connection(self):
         """Close database connection"""
 
+        if self.write_queue is not None:
+            from write_queue import release_write_queue
+
+            release_write_queue(self.write_queue)
+            self.write_queue = None
         if self.conn:
             self.conn.close()
+            if self._collector_key is not None:
+                self.metrics.remove_collector(self._collector_key)
+                self._collector_key = None
+
 
+def is_read_query(query):
+    """
+    Check whether a SQL statement only reads.
+    Leading comments are skipped; a statement with no keyword is treated as a read so it runs directly.
+    """
+    text = query.lstrip()
+    while text.startswith(('--', '/*')):
+        if text.startswith('--'):
+            end = text.find('\n')
+            text = text[end + 1:].lstrip() if end != -1 else ''
+        else:
+            end = text.find('*/')
+            text = text[end + 2:].lstrip() if end != -1 else ''
+    words = text.split(None, 1)
+    return not words or words[0].upper().rstrip('(;') in READ_KEYWORDS
 
-# SQL for creating tables
-sql_create_clients_table = """ CREATE TABLE IF NOT EXISTS clients (
-                                    id integer PRIMARY KEY,
-                                    name text NOT NULL,
-                                    phone_number text,
-                                    email text,
-                                    notes text
-                                ); """
-
-sql_create_income_records_table = """ CREATE TABLE IF NOT EXISTS income_records (
-                                    id integer PRIMARY KEY,
-                                    client_id integer NOT NULL,
-                                    amount real NOT NULL,
-                                    date text NOT NULL,
-                                    description text,
-                                    FOREIGN KEY (client_id) REFERENCES clients (id)
-                                ); """
@@ -0,0 +1,77 @@
+import threading
+import traceback
+from collections import namedtuple
+
+# One committed change to a row. entity is 'client' or 'income_record', action is 'insert', 'update' or
+# 'delete', row_id the row's id, and before/after the row as a dict of its columns (None when absent).
+ChangeEvent = namedtuple('ChangeEvent', ['entity', 'action', 'row_id', 'before', 'after'])
+
+CLIENT_COLUMNS = ('id', 'name', 'phone_number', 'email', 'notes')
+INCOME_RECORD_COLUMNS = ('id', 'client_id', 'amount', 'date', 'description')
+
+
+class EventBus:
+    """
+    In-process publish/subscribe for change events.
+    The model write methods publish a ChangeEvent once their statement is committed; subscribers are called
+    synchronously, in subscription order, on the thread that made the write. A subscriber that raises is
+    reported and skipped, so it can neither undo the write nor keep the other subscribers from running.
+    """
+    def __init__(self):
+        self._subscribers = []
+        self._lock = threading.Lock()
+
+    def subscribe(self, callback, entity=None, actions=None):
+        """
+        Call callback(event) for every matching change event.
+        Args:
+            callback: Callable receiving a ChangeEvent
+            entity: Only deliver events for this entity ('client' or 'income_record'). Defaults to all.
+            actions: Only deliver these actions (e.g. ('update', 'delete')). Defaults to all.
+
+        Returns:
+            A token to pass to unsubscribe().
+        """
+        token = (callback, entity, frozenset(actions) if actions is not None else None)
+        with self._lock:
+            # Copy on write so publish() can iterate without holding the lock
+            self._subscribers = self._subscribers + [token]
+        return token
+
+    def unsubscribe(self, token):
+        with self._lock:
+            self._subscribers = [subscriber for subscriber in self._subscribers if subscriber is not token]
+
+    def wants(self, entity):
+        """
+        Check whether any subscriber listens to an entity.
+        Writers use it to skip reading the 'before' row when nobody would receive it.
+        """
+        return any(subscribed is None or subscribed == entity for _, subscribed, _ in self._subscribers)
+
+    def publish(self, event):
+        """
+        Deliver an event to the matching subscribers.
+        Args:
+            event: ChangeEvent
+
+        Returns:
+            int: Number of subscribers the event was delivered to.
+        """
+        delivered = 0
+        for callback, entity, actions in self._subscribers:
+            if entity is not None and entity != event.entity:
+                continue
+            if actions is not None and event.action not in actions:
+                continue
+            try:
+                callback(event)
+            except Exception:
+                traceback.print_exc()
+            delivered += 1
+        return delivered
+
+
+def row_dict(columns, row):
+    """Turn a row tuple into a {column: value} dict; None stays None."""
+    return dict(zip(columns, row)) if row is not None else None
@@ -0,0 +1,228 @@
+"""
+Income forecasts from seasonal baselines over monthly totals.
+
+Each calendar month gets its own baseline: the moving average of that month over the last few years,
+and an exponentially smoothed level. Models consume the monthly series one closed month at a time, so
+when a month closes only that month's total is read and folded in; nothing is refit from raw records.
+"""
+from collections import deque
+from datetime import date
+
+from models import IncomeRecord, is_iso_date
+
+METHODS = ('smoothing', 'moving_average')
+
+
+def month_index(year, month):
+    """Months since year 0, so consecutive months differ by one."""
+    return int(year) * 12 + int(month) - 1
+
+
+class SeasonalForecast:
+    """Per-month seasonal baselines over a monthly income series."""
+
+    def __init__(self, window=3, alpha=0.3):
+        """
+        Args:
+            window (int): Years averaged by the moving average of each month.
+            alpha (float): Smoothing factor between 0 and 1; higher values follow recent years more closely.
+        """
+        if not 0 < alpha <= 1:
+            raise ValueError("alpha must be in (0, 1].")
+        self.window = window
+        self.alpha = alpha
+        self.recent = [deque(maxlen=window) for _ in range(12)]
+        self.smoothed = [None] * 12
+        # Month index of the last month folded in, and the sum and count of every total folded in so far
+        self.last_index = None
+        self.observed_total = 0.0
+        self.observed_months = 0
+
+    def update(self, year, month, total):
+        """
+        Fold in the total of the month after the last one seen. Skipped months count as zero income.
+        Args:
+            year: Integer year of the month.
+            month: Integer month.
+            total: Income for that month.
+        """
+        index = month_index(year, month)
+        if self.last_index is not None:
+            if index <= self.last_index:
+                raise ValueError(f"Month {year}-{month:02d} is already part of the model.")
+            for missing in range(self.last_index + 1, index):
+                self._observe(missing % 12, 0.0)
+        self._observe(index % 12, float(total))
+        self.last_index = index
+
+    def _observe(self, calendar_month, total):
+        self.recent[calendar_month].append(total)
+        previous = self.smoothed[calendar_month]
+        self.smoothed[calendar_month] = total if previous is None else \
+            self.alpha * total + (1 - self.alpha) * previous
+        self.observed_total += total
+        self.observed_months += 1
+
+    def baseline(self, calendar_month, method='smoothing'):
+        """
+        Expected income for a calendar month (0 = January).
+        Args:
+            calendar_month: Integer 0-11.
+            method: 'smoothing' or 'moving_average'.
+        """
+        if method == 'moving_average':
+            values = self.recent[calendar_month]
+            return sum(values) / len(values) if values else 0.0
+        if method == 'smoothing':
+            return self.smoothed[calendar_month] or 0.0
+        raise ValueError(f"Unknown forecast method: {method}")
+
+    def forecast(self, months=12, method='smoothing'):
+        """
+        Forecast the months following the last month seen.
+        Return:
+            A list of ((year, month), amount) tuples.
+        """
+        if self.last_index is None:
+            return []
+        result = []
+        for index in range(self.last_index + 1, self.last_index + 1 + months):
+            result.append(((index // 12, index % 12 + 1), round(self.baseline(index % 12, method), 2)))
+        return result
+
+
+class Forecaster:
+    """
+    Keeps one SeasonalForecast per client, plus one overall, and brings each up to date with the months
+    that closed since it was last used. Until the database changes or another month closes, forecasts come
+    straight from the cached model. A model is refit from the monthly totals only when a month it already
+    holds has changed, e.g. after a back-dated record.
+    Changes made through the model write methods arrive as change events, whose amounts are applied to the
+    months each model holds without a query. Only after a commit from another connection are a model's
+    months re-summed from the database.
+    """
+
+    def __init__(self, db_manager, window=3, alpha=0.3):
+        """
+        Args:
+            db_manager (DatabaseManager): Instance to interact with the database.
+            window (int): See SeasonalForecast.
+            alpha (float): See SeasonalForecast.
+        """
+        self.db_manager = db_manager
+        self.window = window
+        self.alpha = alpha
+        self._models = {}
+        # Per cached model: month index -> change in that month's total, for the months it holds
+        self._held_changes = {}
+        self._subscription = db_manager.events.subscribe(self._on_change, entity='income_record')
+
+    def close(self):
+        """Stop following the database's change events."""
+        self.db_manager.events.unsubscribe(self._subscription)
+
+    def _on_change(self, event):
+        for row, sign in ((event.before, -1), (event.after, 1)):
+            if row is None or not is_iso_date(row['date']):
+                continue
+            index = month_index(row['date'][:4], row['date'][5:7])
+            for client_id in (None, row['client_id']):
+                entry = self._models.get(client_id)
+                if entry is not None and entry[1].last_index is not None and index <= entry[1].last_index:
+                    changes = self._held_changes.setdefault(client_id, {})
+                    changes[index] = changes.get(index, 0.0) + sign * row['amount']
+
+    def forecast(self, client_id=None, months=12, method='smoothing', today=None):
+        """
+        Forecast monthly income, overall or for one client, starting after the last closed month.
+        Args:
+            client_id: Optional client ID; None forecasts total income.
+            months: Number of months to forecast.
+            method: 'smoothing' or 'moving_average'.
+            today (datetime.date, optional): Defines the last closed month (the one before today's).
+        Return:
+            A list of ((year, month), amount) tuples.
+        """
+        return self.model(client_id, today).forecast(months, method)
+
+    def model(self, client_id=None, today=None):
+        """Return the up to date SeasonalForecast for a client, or overall when client_id is None."""
+        today = today or date.today()
+        closed_index = month_index(today.year, today.month) - 1
+        stamp = (self.db_manager.data_stamp(), closed_index)
+        entry = self._models.get(client_id)
+        if entry is not None and entry[0] == stamp:
+            return entry[1]
+
+        model = entry[1] if entry is not None else None
+        held_changes = self._held_changes.pop(client_id, {})
+        if model is not None and model.last_index is not None:
+            # data_version moves only for commits from other connections, which publish no events here
+            external = entry[0][0][2] != stamp[0][2]
+            if model.last_index > closed_index:
+                model = None  # asked about an earlier date than the model holds
+            elif external and round(self._observed_total(client_id, model.last_index), 2) != \
+                    round(model.observed_total, 2):
+                model = None  # a month the model already holds has changed
+            elif not external and any(round(change, 2) != 0 for change in held_changes.values()):
+                model = None
+        if model is None:
+            model = SeasonalForecast(self.window, self.alpha)
+
+        start_index = model.last_index + 1 if model.last_index is not None else None
+        for index, total in self._monthly_totals(client_id, start_index, closed_index):
+            model.update(index // 12, index % 12 + 1, total)
+        if model.last_index is not None and model.last_index < closed_index:
+            model.update(closed_index // 12, closed_index % 12 + 1, 0.0)
+        self._models[client_id] = (stamp, model)
+        return model
+
+    def _monthly_totals(self, client_id, first_index, last_index):
+        """(month index, total) for the months with income in [first_index, last_index], in order."""
+        if client_id is None:
+            cursor = self.db_manager.execute_query(
+                '''SELECT year * 12 + month - 1 AS month_index, total
+                   FROM income_month_totals
+                   WHERE month BETWEEN 1 AND 12 AND month_index BETWEEN ? AND ? AND records > 0
+                   ORDER BY month_index''',
+                (first_index if first_index is not None else 0, last_index))
+            return [(index, total) for index, total in cursor.fetchall()]
+
+        if first_index is None:
+            first_year, _ = IncomeRecord.get_date_bounds(self.db_manager)
+            first_year = int(first_year[:4]) if first_year else last_index // 12
+            first_index = month_index(first_year, 1)
+            archived = IncomeRecord.get_archived_years(self.db_manager)
+            if archived:
+                first_index = min(first_index, month_index(min(archived), 1))
+        if first_index > last_index:
+            return []
+        first_date = f"{first_index // 12:04d}-{first_index % 12 + 1:02d}"
+        end_index = last_index + 1
+        end_date = f"{end_index // 12:04d}-{end_index % 12 + 1:02d}"
+        source = IncomeRecord.records_source(first_index // 12, self.db_manager, last_index // 12)
+        cursor = self.db_manager.execute_query(
+            f'''SELECT CAST(substr(date, 1, 4) AS integer) * 12 + CAST(substr(date, 6, 2) AS integer) - 1
+                           AS month_index, SUM(amount)
+                FROM {source}
+                WHERE client_id = ? AND date >= ? AND date < ?
+                GROUP BY month_index
+                ORDER BY month_index''',
+            (client_id, first_date, end_date))
+        return cursor.fetchall()
+
+    def _observed_total(self, client_id, last_index):
+        """Income up to and including month last_index, as stored now."""
+        if client_id is None:
+            cursor = self.db_manager.execute_query(
+                '''SELECT COALESCE(SUM(total), 0) FROM income_month_totals
+                   WHERE month BETWEEN 1 AND 12 AND year * 12 + month - 1 <= ?''', (last_index,))
+            return cursor.fetchone()[0]
+        end_index = last_index + 1
+        end_date = f"{end_index // 12:04d}-{end_index % 12 + 1:02d}"
+        archived = IncomeRecord.get_archived_years(self.db_manager)
+        first_year = min(archived) if archived else last_index // 12
+        source = IncomeRecord.records_source(first_year, self.db_manager, last_index // 12)
+        cursor = self.db_manager.execute_query(
+            f"SELECT COALESCE(SUM(amount), 0) FROM {source} WHERE client_id = ? AND date < ?", (client_id, end_date))
+        return cursor.fetchone()[0]
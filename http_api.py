@@ -0,0 +1,247 @@
+"""
+Read-only JSON HTTP API over the models, for other tools on the same host.
+
+Endpoints (GET only):
+    /clients                            every client, streamed
+    /clients/<id>                       one client
+    /totals                             yearly totals
+    /totals/<year>                      monthly totals of a year
+    /records/<year>/<month>             records of a month grouped by day
+    /search?q=TEXT[&client_id=ID][&from=DATE][&to=DATE][&limit=N]
+                                        records whose description contains TEXT, newest first, streamed
+    /metrics                            metrics.REGISTRY in the Prometheus text format
+
+Requests are served on threads, each borrowing a read-only DatabaseManager from a fixed-size pool, so
+readers run concurrently. A streamed listing keeps its read lock until its last row is sent, so writers
+may wait for slow clients (up to sqlite3's 5 second busy timeout). Every response carries an ETag built from
+the change log's latest seq (see migration 8), which grows with every write; a request whose
+If-None-Match still matches gets 304 without running its query. Listings are sent with chunked transfer
+encoding as rows are read, so large results never sit in memory.
+"""
+import json
+import queue
+import re
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+from database import DatabaseManager
+from events import CLIENT_COLUMNS
+from metrics import REGISTRY
+from models import IncomeRecord, is_iso_date
+
+DEFAULT_PORT = 8765
+
+# Rows fetched from the cursor per chunk of a streamed listing
+STREAM_BATCH = 500
+
+SEARCH_COLUMNS = ('id', 'client_id', 'client_name', 'amount', 'date', 'description')
+
+
+class ReaderPool:
+    """
+    Fixed set of read-only DatabaseManagers shared by the request threads.
+    """
+    def __init__(self, db_path, size=4):
+        """
+        Args:
+            db_path: Path of the SQLite database file; it must exist and be migrated.
+            size: Number of connections, and so of requests querying at the same time.
+        """
+        self._idle = queue.Queue()
+        self._managers = []
+        for _ in range(size):
+            db_manager = DatabaseManager(db_path, verbose=False, check_same_thread=False, read_only=True)
+            if db_manager.conn is None:
+                self.close()
+                raise OSError(f"Cannot open {db_path} read-only")
+            self._managers.append(db_manager)
+            self._idle.put(db_manager)
+
+    @contextmanager
+    def reader(self):
+        """Borrow a DatabaseManager, waiting for one when all are busy."""
+        db_manager = self._idle.get()
+        try:
+            yield db_manager
+        finally:
+            self._idle.put(db_manager)
+
+    def close(self):
+        for db_manager in self._managers:
+            db_manager.close_connection()
+
+
+def data_etag(db_manager):
+    """
+    ETag of the database's current data: the change log's latest seq, plus the archived years, since
+    archiving moves rows without logging them.
+    """
+    seq, archived = db_manager.conn.execute('''SELECT (SELECT MAX(seq) FROM change_log),
+                                                      (SELECT COUNT(*) FROM archived_years)''').fetchone()
+    return f'"{seq or 0}-{archived}"'
+
+
+class ApiHandler(BaseHTTPRequestHandler):
+    """Routes GET requests to the methods named in ROUTES."""
+
+    protocol_version = "HTTP/1.1"  # keep-alive and chunked bodies
+    server_version = "MOTA"
+
+    ROUTES = [
+        (re.compile(r'/clients'), 'list_clients'),
+        (re.compile(r'/clients/(\d+)'), 'get_client'),
+        (re.compile(r'/totals'), 'yearly_totals'),
+        (re.compile(r'/totals/(\d{4})'), 'monthly_totals'),
+        (re.compile(r'/records/(\d{4})/(\d{1,2})'), 'daily_records'),
+        (re.compile(r'/search'), 'search'),
+    ]
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        if url.path == '/metrics':
+            self.send_metrics()
+            return
+        for pattern, name in self.ROUTES:
+            match = pattern.fullmatch(url.path.rstrip('/') or '/')
+            if match is not None:
+                break
+        else:
+            self.send_json(404, {"error": "Not found"})
+            return
+
+        query = {key: values[-1] for key, values in parse_qs(url.query).items()}
+        with self.server.readers.reader() as db_manager:
+            etag = data_etag(db_manager)
+            if etag in (tag.strip() for tag in self.headers.get('If-None-Match', '').split(',')):
+                self.send_response(304)
+                self.send_header('ETag', etag)
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+                return
+            try:
+                getattr(self, name)(db_manager, etag, query, *match.groups())
+            except ValueError as e:
+                self.send_json(400, {"error": str(e)})
+
+    def send_json(self, status, data, etag=None):
+        body = json.dumps(data, separators=(",", ":")).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        if etag is not None:
+            self.send_header('ETag', etag)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def send_metrics(self):
+        body = REGISTRY.render().encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain; version=0.0.4')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def stream_json_array(self, etag, cursor, columns):
+        """Send the cursor's rows as a JSON array of objects, one chunk per STREAM_BATCH rows."""
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.send_header('ETag', etag)
+        self.end_headers()
+        separator = "["
+        for rows in iter(lambda: cursor.fetchmany(STREAM_BATCH), []):
+            parts = []
+            for row in rows:
+                parts.append(separator + json.dumps(dict(zip(columns, row)), separators=(",", ":")))
+                separator = ","
+            self.write_chunk("".join(parts))
+        self.write_chunk("]" if separator == "," else "[]")
+        self.wfile.write(b"0\r\n\r\n")
+
+    def write_chunk(self, text):
+        data = text.encode()
+        self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+
+    def list_clients(self, db_manager, etag, query):
+        cursor = db_manager.execute_query(f"SELECT {', '.join(CLIENT_COLUMNS)} FROM clients ORDER BY id")
+        self.stream_json_array(etag, cursor, CLIENT_COLUMNS)
+
+    def get_client(self, db_manager, etag, query, client_id):
+        cursor = db_manager.execute_query(f"SELECT {', '.join(CLIENT_COLUMNS)} FROM clients WHERE id = ?",
+                                          (int(client_id),))
+        row = cursor.fetchone()
+        if row is None:
+            self.send_json(404, {"error": f"Client {client_id} not found"})
+        else:
+            self.send_json(200, dict(zip(CLIENT_COLUMNS, row)), etag)
+
+    def yearly_totals(self, db_manager, etag, query):
+        totals = IncomeRecord.get_yearly_totals(db_manager)
+        self.send_json(200, {str(year): total for year, total in totals.items()}, etag)
+
+    def monthly_totals(self, db_manager, etag, query, year):
+        self.send_json(200, IncomeRecord.get_monthly_totals(int(year), db_manager), etag)
+
+    def daily_records(self, db_manager, etag, query, year, month):
+        if not 1 <= int(month) <= 12:
+            raise ValueError("Month must be between 1 and 12.")
+        days = IncomeRecord.get_daily_records(int(year), int(month), db_manager)
+        self.send_json(200, {day: [dict(zip(('id', 'client_id', 'amount', 'description', 'client_name'), record))
+                                   for record in records]
+                             for day, records in days.items()}, etag)
+
+    def search(self, db_manager, etag, query):
+        text = query.get('q', '')
+        conditions = ["r.description LIKE ? ESCAPE '\\'"]
+        params = ["%" + re.sub(r'([\\%_])', r'\\\1', text) + "%"]
+        if 'client_id' in query:
+            conditions.append("r.client_id = ?")
+            params.append(int(query['client_id']))
+        for key, operator in (('from', '>='), ('to', '<=')):
+            if key in query:
+                if not is_iso_date(query[key]):
+                    raise ValueError(f"'{key}' must be a YYYY-MM-DD date.")
+                conditions.append(f"r.date {operator} ?")
+                params.append(query[key])
+        limit = int(query.get('limit', 1000))
+        if limit < 0:
+            raise ValueError("'limit' cannot be negative.")
+        cursor = db_manager.execute_query(f'''SELECT r.id, r.client_id, c.name, r.amount, r.date, r.description
+                                              FROM income_records r
+                                              LEFT JOIN clients c ON c.id = r.client_id
+                                              WHERE {" AND ".join(conditions)}
+                                              ORDER BY r.date DESC, r.id DESC
+                                              LIMIT ?''', (*params, limit))
+        self.stream_json_array(etag, cursor, SEARCH_COLUMNS)
+
+
+class ApiServer(ThreadingHTTPServer):
+    """ThreadingHTTPServer owning the ReaderPool its handlers query."""
+
+    daemon_threads = True
+
+    def __init__(self, db_path, host="127.0.0.1", port=DEFAULT_PORT, readers=4, verbose=False):
+        """
+        Args:
+            db_path: Path of the SQLite database file.
+            host: Interface to listen on; the default only accepts local connections.
+            port: TCP port; 0 picks a free one (see server_address).
+            readers: Read-only connections shared by the request threads.
+            verbose: Log each request to stderr.
+        """
+        self.readers = ReaderPool(db_path, readers)
+        self.verbose = verbose
+        try:
+            super().__init__((host, port), ApiHandler)
+        except OSError:
+            self.readers.close()
+            raise
+
+    def server_close(self):
+        super().server_close()
+        self.readers.close()
@@ -0,0 +1,287 @@
+"""
+Background upkeep of a database file: planner statistics, free pages and the write-ahead log.
+
+Databases use auto_vacuum=INCREMENTAL (migration 10), so pages freed by deletes and updates stay on the
+freelist until PRAGMA incremental_vacuum returns them to the file system. Each maintenance run does
+bounded work on its own connection:
+
+    checkpoint()          in WAL mode, checkpoints and truncates the -wal file once it is over a threshold
+    enable_incremental_auto_vacuum()
+                          once per file: rebuilds a file that does not use incremental auto-vacuum yet
+    incremental_vacuum()  frees 'slice_pages' pages per write transaction until the freelist is empty or
+                          the time budget is spent, so a writer never waits on more than one slice
+    optimize()            ANALYZE the first time, PRAGMA optimize afterwards, with PRAGMA analysis_limit
+                          capping the rows read per index
+
+MaintenanceScheduler runs these on a thread once the database has been idle (no commits from other
+connection) for 'idle_after' seconds. Steps that find the database locked are skipped until the next run.
+"""
+import os
+import sqlite3
+import threading
+import time
+import traceback
+
+from metrics import REGISTRY, database_label
+from write_queue import is_busy_error
+
+# Rows PRAGMA optimize / ANALYZE read per index; 0 reads everything
+DEFAULT_ANALYSIS_LIMIT = 1000
+
+
+def optimize(conn, analysis_limit=DEFAULT_ANALYSIS_LIMIT):
+    """
+    Refresh the query planner's statistics.
+    Runs a full ANALYZE when the database has never been analyzed, otherwise PRAGMA optimize, which only
+    re-analyzes tables whose statistics SQLite considers stale.
+    :param conn: sqlite3.Connection.
+    :param analysis_limit: Approximate rows read per index (PRAGMA analysis_limit).
+    :return: 'analyze' or 'optimize'.
+    """
+    conn.execute(f"PRAGMA analysis_limit = {int(analysis_limit)}")
+    analyzed = conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'sqlite_stat1'").fetchone()
+    if analyzed is None:
+        conn.execute("ANALYZE")
+        return 'analyze'
+    conn.execute("PRAGMA optimize")
+    return 'optimize'
+
+
+def enable_incremental_auto_vacuum(conn):
+    """
+    Switch the file to auto_vacuum=INCREMENTAL. A file with tables only switches when VACUUM rebuilds it,
+    which rewrites every page while holding the write lock, so this is done once, when PRAGMA auto_vacuum
+    does not report incremental yet.
+    :param conn: sqlite3.Connection with isolation_level None, outside a transaction.
+    :return: True when the file was rebuilt.
+    """
+    if conn.execute("PRAGMA auto_vacuum").fetchone()[0] == 2:
+        return False
+    conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+    conn.execute("VACUUM")
+    return True
+
+
+def incremental_vacuum(conn, slice_pages=256, time_budget=None):
+    """
+    Return free pages to the file system in slices of slice_pages, each its own write transaction.
+    At least one slice runs; more follow until the freelist is empty or time_budget seconds have passed.
+    Does nothing unless the database uses auto_vacuum=INCREMENTAL.
+    :param conn: sqlite3.Connection with isolation_level None, outside a transaction.
+    :param slice_pages: Pages freed per slice.
+    :param time_budget: Seconds to keep freeing slices; None frees the whole freelist.
+    :return: dict with 'pages_freed', 'free_pages' (left on the freelist) and 'slices'.
+    """
+    started = time.perf_counter()
+    report = {'pages_freed': 0, 'free_pages': conn.execute("PRAGMA freelist_count").fetchone()[0], 'slices': 0}
+    if conn.execute("PRAGMA auto_vacuum").fetchone()[0] != 2:
+        return report
+    while report['free_pages'] > 0:
+        # sqlite3 steps a statement without result columns once, and each step frees one page, so a slice
+        # repeats the pragma inside one transaction
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            for _ in range(min(slice_pages, report['free_pages'])):
+                conn.execute("PRAGMA incremental_vacuum(1)")
+            conn.execute("COMMIT")
+        except sqlite3.Error:
+            conn.execute("ROLLBACK")
+            raise
+        free_pages = conn.execute("PRAGMA freelist_count").fetchone()[0]
+        report['pages_freed'] += report['free_pages'] - free_pages
+        report['free_pages'] = free_pages
+        report['slices'] += 1
+        if time_budget is not None and time.perf_counter() - started >= time_budget:
+            break
+    return report
+
+
+def wal_size(db_path):
+    try:
+        return os.path.getsize(db_path + "-wal")
+    except OSError:
+        return 0
+
+
+def checkpoint(conn, db_path, threshold_bytes=4 * 1024 * 1024):
+    """
+    Checkpoint the write-ahead log and truncate it once it has grown past threshold_bytes.
+    Readers still using old frames make SQLite stop early; the report's 'busy' is then true.
+    :param conn: sqlite3.Connection to db_path.
+    :param db_path: Path of the database file.
+    :param threshold_bytes: Size of the -wal file below which nothing is done.
+    :return: None when the database is not in WAL mode, else a dict with 'wal_bytes_before',
+        'wal_bytes_after', 'checkpointed' (whether it was over the threshold) and 'busy'.
+    """
+    if conn.execute("PRAGMA journal_mode").fetchone()[0] != 'wal':
+        return None
+    before = wal_size(db_path)
+    report = {'wal_bytes_before': before, 'wal_bytes_after': before, 'checkpointed': False, 'busy': False}
+    if before < threshold_bytes:
+        return report
+    busy = conn.execute("PRAGMA wal_checkpoint(TRUNCATE)").fetchone()[0]
+    report.update(wal_bytes_after=wal_size(db_path), checkpointed=True, busy=bool(busy))
+    return report
+
+
+class MaintenanceScheduler:
+    """
+    Runs checkpoint(), enable_incremental_auto_vacuum(), incremental_vacuum() and optimize() on a database
+    file while it is idle.
+    Use start()/stop() for a background thread, or call run_once() from an existing loop.
+    """
+    def __init__(self, db_path, interval=60.0, idle_after=5.0, slice_pages=256, time_budget=0.5,
+                 wal_threshold=4 * 1024 * 1024, analyze_every=24 * 3600.0, analysis_limit=DEFAULT_ANALYSIS_LIMIT,
+                 busy_timeout=0.05, on_report=None, metrics=None):
+        """
+        Args:
+            db_path: Path of a migrated SQLite database file.
+            interval: Seconds between checks of whether maintenance is due.
+            idle_after: Seconds without a commit from any connection before the thread runs maintenance.
+            slice_pages: Pages freed per incremental vacuum transaction.
+            time_budget: Seconds one run may spend freeing pages.
+            wal_threshold: Size in bytes of the -wal file that triggers a checkpoint.
+            analyze_every: Seconds between optimize() calls.
+            analysis_limit: See optimize().
+            busy_timeout: Seconds to wait for a lock before skipping a step; short, so the application's
+                writers keep priority.
+            on_report: Called with the report dict of each run the thread makes.
+            metrics: MetricsRegistry for the run and reclaimed-bytes counters. Defaults to metrics.REGISTRY.
+        """
+        self.db_path = db_path
+        self.interval = interval
+        self.idle_after = idle_after
+        self.slice_pages = slice_pages
+        self.time_budget = time_budget
+        self.wal_threshold = wal_threshold
+        self.analyze_every = analyze_every
+        self.analysis_limit = analysis_limit
+        self.busy_timeout = busy_timeout
+        self.on_report = on_report
+        self.last_report = None
+
+        registry = metrics if metrics is not None else REGISTRY
+        label = database_label(db_path)
+        self._runs = registry.counter('mota_maintenance_runs_total', 'Maintenance runs.', ('database',)).labels(label)
+        self._reclaimed = registry.counter('mota_maintenance_reclaimed_bytes_total',
+                                           'Bytes returned to the file system by incremental vacuum.',
+                                           ('database',)).labels(label)
+
+        self._conn = None
+        self._last_optimize = None
+        self._data_version = None
+        self._last_change = time.monotonic()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _connection(self):
+        if self._conn is None:
+            # isolation_level=None: every pragma runs in its own transaction, so each vacuum slice commits alone
+            self._conn = sqlite3.connect(self.db_path, timeout=self.busy_timeout, isolation_level=None,
+                                         check_same_thread=False)
+        return self._conn
+
+    def is_idle(self):
+        """
+        Whether no other connection has committed for idle_after seconds. PRAGMA data_version changes when
+        another connection commits (never for this one's own maintenance), so polling it is cheap.
+        """
+        data_version = self._connection().execute("PRAGMA data_version").fetchone()[0]
+        now = time.monotonic()
+        if data_version != self._data_version:
+            self._data_version = data_version
+            self._last_change = now
+        return now - self._last_change >= self.idle_after
+
+    def run_once(self, force_optimize=False):
+        """
+        Run one bounded round of maintenance.
+        Args:
+            force_optimize: Run optimize() even if analyze_every has not passed since the last one.
+
+        Returns:
+            dict: 'elapsed' seconds; 'checkpoint' (see checkpoint()); 'rebuild' (see
+            enable_incremental_auto_vacuum()); 'vacuum' (see incremental_vacuum())
+            plus 'bytes_reclaimed', the shrinkage of the database file; 'optimize' ('analyze', 'optimize'
+            or None when not due); and 'skipped', the steps that found the database locked.
+        """
+        conn = self._connection()
+        started = time.perf_counter()
+        report = {'checkpoint': None, 'rebuild': None, 'vacuum': None, 'optimize': None, 'skipped': []}
+        steps = [
+            ('checkpoint', lambda: checkpoint(conn, self.db_path, self.wal_threshold)),
+            ('rebuild', lambda: enable_incremental_auto_vacuum(conn)),
+            ('vacuum', self._vacuum),
+        ]
+        now = time.monotonic()
+        if force_optimize or self._last_optimize is None or now - self._last_optimize >= self.analyze_every:
+            steps.append(('optimize', lambda: optimize(conn, self.analysis_limit)))
+        for name, step in steps:
+            try:
+                report[name] = step()
+            except sqlite3.OperationalError as e:
+                if not is_busy_error(e):
+                    raise
+                report['skipped'].append(name)
+        if report['optimize'] is not None:
+            self._last_optimize = now
+        report['elapsed'] = time.perf_counter() - started
+
+        self._runs.inc()
+        if report['vacuum'] is not None and report['vacuum']['bytes_reclaimed'] > 0:
+            self._reclaimed.inc(report['vacuum']['bytes_reclaimed'])
+        self.last_report = report
+        return report
+
+    def _vacuum(self):
+        size_before = os.path.getsize(self.db_path)
+        report = incremental_vacuum(self._connection(), self.slice_pages, self.time_budget)
+        report['bytes_reclaimed'] = size_before - os.path.getsize(self.db_path)
+        return report
+
+    def _due(self):
+        if not self.is_idle():
+            return False
+        conn = self._connection()
+        if conn.execute("PRAGMA auto_vacuum").fetchone()[0] != 2:
+            return True
+        if conn.execute("PRAGMA freelist_count").fetchone()[0] > 0:
+            return True
+        if self._last_optimize is None or time.monotonic() - self._last_optimize >= self.analyze_every:
+            return True
+        return wal_size(self.db_path) >= self.wal_threshold
+
+    def _loop(self):
+        while not self._stop.wait(self.interval):
+            try:
+                if not self._due():
+                    continue
+                report = self.run_once()
+            except sqlite3.Error as e:
+                # A locked or vanished file is retried on the next tick
+                if not is_busy_error(e):
+                    print(e)
+                continue
+            if self.on_report is not None:
+                try:
+                    self.on_report(report)
+                except Exception:
+                    # A failing callback must not stop maintenance
+                    traceback.print_exc()
+
+    def start(self):
+        """Start the maintenance thread."""
+        if self._thread is None:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._loop, name="mota-maintenance", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        """Stop the thread, letting a run in progress finish, and close the connection."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
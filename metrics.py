@@ -0,0 +1,283 @@
+"""
+Process-wide metrics in the Prometheus text exposition format.
+
+DatabaseManager records query latency, commits, changed rows and cache hits into REGISTRY as it runs;
+each of those costs a clock read and a few additions. Gauges that need the file system or a query
+(file, WAL and page-cache sizes, row counts) are only computed by collectors when the metrics are
+rendered, on their own short-lived read-only connection, so they never touch a caller's connection or
+thread. Render with REGISTRY.render(), write a file for a textfile collector with REGISTRY.write(), or
+scrape /metrics from the JSON API server.
+"""
+import bisect
+import math
+import os
+import sqlite3
+import threading
+
+# Seconds; the upper bounds of the latency histogram buckets
+DEFAULT_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+
+# Tables counted by the database collector
+COUNTED_TABLES = ('clients', 'income_records', 'recurring_schedules', 'change_log')
+
+
+def escape_label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def format_labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{escape_label(value)}"' for name, value in pairs) + "}"
+
+
+def format_value(value):
+    if value == math.inf:
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    """A metric family: one child per combination of label values."""
+
+    kind = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children = {}
+        self._lock = threading.Lock()
+
+    def labels(self, *values):
+        """
+        Return the child for these label values, creating it on first use.
+        Hot paths should call this once and keep the child.
+        """
+        if len(values) != len(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}")
+        values = tuple(str(value) for value in values)
+        child = self._children.get(values)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(values, self._new_child())
+        return child
+
+    def samples(self):
+        for values, child in list(self._children.items()):
+            yield from child.samples(self.name, self.labelnames, values)
+
+
+class _ValueChild:
+    def __init__(self):
+        self.value = 0
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1):
+        with self._lock:
+            self.value += amount
+
+    def set(self, value):
+        self.value = value
+
+    def samples(self, name, labelnames, values):
+        yield f"{name}{format_labels(labelnames, values)} {format_value(self.value)}"
+
+
+class Counter(_Metric):
+    """Monotonic count; names end in _total."""
+
+    kind = 'counter'
+
+    def _new_child(self):
+        return _ValueChild()
+
+
+class Gauge(_Metric):
+    """Value that goes up and down."""
+
+    kind = 'gauge'
+
+    def _new_child(self):
+        return _ValueChild()
+
+
+class _HistogramChild:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # the last one is +Inf
+        self.sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.sum += value
+
+    def samples(self, name, labelnames, values):
+        cumulative = 0
+        for bound, count in zip(self.buckets + (math.inf,), self.counts):
+            cumulative += count
+            yield f"{name}_bucket{format_labels(labelnames, values, [('le', format_value(bound))])} {cumulative}"
+        yield f"{name}_sum{format_labels(labelnames, values)} {format_value(self.sum)}"
+        yield f"{name}_count{format_labels(labelnames, values)} {cumulative}"
+
+
+class Histogram(_Metric):
+    """Distribution of observed values over fixed buckets."""
+
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def _new_child(self):
+        return _HistogramChild(self.buckets)
+
+
+class MetricsRegistry:
+    """
+    Named metrics plus collectors that compute gauges when rendering.
+    """
+    def __init__(self):
+        self._metrics = {}
+        self._collectors = {}  # key -> [collector, number of registrations]
+        self._lock = threading.Lock()
+
+    def _get_or_create(self, cls, name, documentation, labelnames, **options):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(name, documentation, labelnames, **options)
+            elif not isinstance(metric, cls) or metric.labelnames != tuple(labelnames):
+                raise ValueError(f"Metric {name} is already registered differently")
+            return metric
+
+    def counter(self, name, documentation, labelnames=()):
+        return self._get_or_create(Counter, name, documentation, labelnames)
+
+    def gauge(self, name, documentation, labelnames=()):
+        return self._get_or_create(Gauge, name, documentation, labelnames)
+
+    def histogram(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self._get_or_create(Histogram, name, documentation, labelnames, buckets=buckets)
+
+    def add_collector(self, key, collector):
+        """
+        Register collector() under key; it returns (name, kind, help, [(labels dict, value)]) tuples when
+        the metrics are rendered. Registering a key again only counts one more user of it.
+        """
+        with self._lock:
+            entry = self._collectors.setdefault(key, [collector, 0])
+            entry[1] += 1
+
+    def remove_collector(self, key):
+        """Drop one registration of key; the collector stops once every user has removed it."""
+        with self._lock:
+            entry = self._collectors.get(key)
+            if entry is not None:
+                entry[1] -= 1
+                if entry[1] <= 0:
+                    del self._collectors[key]
+
+    def render(self):
+        """
+        Return every metric in the Prometheus text exposition format (version 0.0.4).
+        """
+        lines = []
+        with self._lock:
+            metrics = sorted(self._metrics.values(), key=lambda metric: metric.name)
+            collectors = [entry[0] for entry in self._collectors.values()]
+        for metric in metrics:
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.samples())
+
+        families = {}
+        for collector in collectors:
+            for name, kind, documentation, samples in collector():
+                families.setdefault(name, (kind, documentation, []))[2].extend(samples)
+        for name in sorted(families):
+            kind, documentation, samples = families[name]
+            lines.append(f"# HELP {name} {documentation}")
+            lines.append(f"# TYPE {name} {kind}")
+            for labels, value in samples:
+                lines.append(f"{name}{format_labels(labels, labels.values())} {format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+    def write(self, path):
+        """
+        Write render() to path atomically, e.g. for node_exporter's textfile collector.
+        :return: path
+        """
+        partial_path = path + ".part"
+        with open(partial_path, "w") as out:
+            out.write(self.render())
+        os.replace(partial_path, path)
+        return path
+
+
+REGISTRY = MetricsRegistry()
+
+
+def database_label(db_path):
+    return os.path.basename(db_path)
+
+
+def database_collector(db_path):
+    """
+    Collector of one database file's gauges: file, WAL and shared-memory sizes, page counts, the page
+    cache size and row counts. Counting rows walks each table's smallest index, so it costs a scan per
+    render, never per query.
+    """
+    label = database_label(db_path)
+
+    def file_size(path):
+        try:
+            return os.path.getsize(path)
+        except OSError:
+            return 0
+
+    def collect():
+        labels = {'database': label}
+        if not os.path.exists(db_path):
+            return []
+        families = [
+            ('mota_database_file_bytes', 'gauge', 'Size of the database file.', [(labels, file_size(db_path))]),
+            ('mota_database_wal_bytes', 'gauge', 'Size of the write-ahead log file.',
+             [(labels, file_size(db_path + "-wal"))]),
+            ('mota_database_shm_bytes', 'gauge', 'Size of the WAL shared-memory file.',
+             [(labels, file_size(db_path + "-shm"))]),
+        ]
+        try:
+            conn = sqlite3.connect(f"file:{os.path.abspath(db_path)}?mode=ro", uri=True)
+        except sqlite3.Error:
+            return families
+        try:
+            page_size = conn.execute("PRAGMA page_size").fetchone()[0]
+            cache_size = conn.execute("PRAGMA cache_size").fetchone()[0]
+            families += [
+                ('mota_database_pages', 'gauge', 'Pages in the database file.',
+                 [(labels, conn.execute("PRAGMA page_count").fetchone()[0])]),
+                ('mota_database_free_pages', 'gauge', 'Unused pages in the database file.',
+                 [(labels, conn.execute("PRAGMA freelist_count").fetchone()[0])]),
+                ('mota_database_page_size_bytes', 'gauge', 'Database page size.', [(labels, page_size)]),
+                # A negative cache_size is in KiB, a positive one in pages
+                ('mota_database_page_cache_bytes', 'gauge', 'Page cache size of a connection.',
+                 [(labels, -cache_size * 1024 if cache_size < 0 else cache_size * page_size)]),
+            ]
+            existing = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+            families.append(('mota_database_rows', 'gauge', 'Rows per table.',
+                             [({'database': label, 'table': table},
+                               conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0])
+                              for table in COUNTED_TABLES if table in existing]))
+        except sqlite3.Error:
+            pass
+        finally:
+            conn.close()
+        return families
+
+    return collect
@@ -0,0 +1,360 @@
+"""
+Schema migrations keyed on PRAGMA user_version.
+
+Each Migration brings the schema from version - 1 to its version. Steps run in order inside their own
+transaction together with the user_version bump, so a failed step leaves the database at the previous
+version. When the stored version is already the latest, migrate() reads one integer and returns.
+"""
+import sqlite3
+import time
+
+
+class Migration:
+    """One schema change."""
+
+    def __init__(self, version, description, statements=(), function=None, transactional=True):
+        """
+        Args:
+            version (int): Schema version after this migration.
+            description (str): Short human-readable summary, reported through progress callbacks.
+            statements (sequence of str): SQL statements to run, in order.
+            function (callable, optional): Called with the connection after the statements, for steps
+                that need Python (backfills, data rewrites).
+            transactional (bool): Run inside BEGIN/COMMIT. Statements that cannot run in a transaction,
+                such as VACUUM, need False.
+        """
+        self.version = version
+        self.description = description
+        self.statements = statements
+        self.function = function
+        self.transactional = transactional
+
+
+def get_version(conn):
+    """
+    Read the schema version stored in the database header.
+    :param conn: sqlite3.Connection.
+    :return: Integer version; 0 for a new or unversioned database.
+    """
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+def migrate(conn, migrations=None, progress=None, progress_interval=0.5):
+    """
+    Apply every migration newer than the database's user_version.
+    Args:
+        conn (sqlite3.Connection): Connection to migrate.
+        migrations (list of Migration, optional): Ordered migrations. Defaults to MIGRATIONS.
+        progress (callable, optional): Called with a dict of 'version', 'description', 'stage'
+            ('start', 'running' or 'done'), 'elapsed' seconds and 'steps' (SQLite VM progress ticks).
+            'running' is reported at most every progress_interval seconds while a step is busy,
+            e.g. while an index is built over a large table.
+        progress_interval (float): Seconds between 'running' reports.
+
+    Returns:
+        int: The schema version after migrating.
+    """
+    migrations = MIGRATIONS if migrations is None else migrations
+    current = get_version(conn)
+    if not migrations or current >= migrations[-1].version:
+        return current
+
+    isolation_level = conn.isolation_level
+    conn.isolation_level = None  # explicit transaction control
+    try:
+        for migration in migrations:
+            if migration.version > current:
+                current = _apply(conn, migration, progress, progress_interval)
+    finally:
+        conn.set_progress_handler(None, 0)
+        conn.isolation_level = isolation_level
+    return current
+
+
+def _apply(conn, migration, progress, progress_interval):
+    """Apply one migration unless another connection already has; return the version afterwards."""
+    started = time.perf_counter()
+    state = {'steps': 0, 'reported': started}
+
+    def report(stage):
+        if progress is not None:
+            progress({'version': migration.version, 'description': migration.description, 'stage': stage,
+                      'elapsed': time.perf_counter() - started, 'steps': state['steps']})
+
+    def on_progress():
+        state['steps'] += 1
+        now = time.perf_counter()
+        if now - state['reported'] >= progress_interval:
+            state['reported'] = now
+            report('running')
+        return 0
+
+    if migration.transactional:
+        conn.execute("BEGIN IMMEDIATE")
+    # Another connection may have migrated while we waited for the write lock
+    version = get_version(conn)
+    if version >= migration.version:
+        if conn.in_transaction:
+            conn.execute("ROLLBACK")
+        return version
+
+    report('start')
+    if progress is not None:
+        conn.set_progress_handler(on_progress, 10000)
+    try:
+        for statement in migration.statements:
+            conn.execute(statement)
+        if migration.function is not None:
+            migration.function(conn)
+        # PRAGMA values cannot be bound parameters; version is an int from the migration list
+        conn.execute(f"PRAGMA user_version = {int(migration.version)}")
+        if migration.transactional:
+            conn.execute("COMMIT")
+    except sqlite3.Error:
+        if conn.in_transaction:
+            conn.execute("ROLLBACK")
+        raise
+    finally:
+        conn.set_progress_handler(None, 0)
+    report('done')
+    return migration.version
+
+
+# SQL for creating tables
+sql_create_clients_table = """ CREATE TABLE IF NOT EXISTS clients (
+                                    id integer PRIMARY KEY,
+                                    name text NOT NULL,
+                                    phone_number text,
+                                    email text,
+                                    notes text
+                                ); """
+
+sql_create_income_records_table = """ CREATE TABLE IF NOT EXISTS income_records (
+                                    id integer PRIMARY KEY,
+                                    client_id integer NOT NULL,
+                                    amount real NOT NULL,
+                                    date text NOT NULL,
+                                    description text,
+                                    FOREIGN KEY (client_id) REFERENCES clients (id)
+                                ); """
+
+# Covers the date range scans behind the yearly/monthly aggregates
+sql_create_income_records_date_index = """ CREATE INDEX IF NOT EXISTS idx_income_records_date
+                                    ON income_records (date, amount); """
+
+# One row per year moved out of income_records into its own file; see IncomeRecord.archive_year()
+sql_create_archived_years_table = """ CREATE TABLE IF NOT EXISTS archived_years (
+                                    year integer PRIMARY KEY,
+                                    file_name text NOT NULL,
+                                    records integer NOT NULL,
+                                    total real NOT NULL,
+                                    archived_at text NOT NULL
+                                ); """
+
+sql_add_income_records_content_hash = "ALTER TABLE income_records ADD COLUMN content_hash text"
+
+sql_create_income_records_content_hash_index = """ CREATE INDEX IF NOT EXISTS idx_income_records_content_hash
+                                    ON income_records (content_hash); """
+
+# Application settings, e.g. the fiscal year's start month
+sql_create_settings_table = """ CREATE TABLE IF NOT EXISTS settings (
+                                    key text PRIMARY KEY,
+                                    value text
+                                ); """
+
+# One row per date; filled on demand by calendar_dim.ensure_calendar()
+sql_create_calendar_dim_table = """ CREATE TABLE IF NOT EXISTS calendar_dim (
+                                    date text PRIMARY KEY,
+                                    year integer NOT NULL,
+                                    quarter integer NOT NULL,
+                                    month integer NOT NULL,
+                                    iso_year integer NOT NULL,
+                                    iso_week integer NOT NULL,
+                                    weekday integer NOT NULL,
+                                    fiscal_year integer NOT NULL,
+                                    fiscal_quarter integer NOT NULL
+                                ) WITHOUT ROWID; """
+
+# Running totals per month, kept current by triggers on every insert, update and delete so year-to-date
+# figures never rescan income_records. Rows moved out by IncomeRecord.archive_year() stay counted: the
+# delete triggers skip while the 'archiving' setting exists, which is only inside that transaction.
+sql_create_income_month_totals_table = """ CREATE TABLE IF NOT EXISTS income_month_totals (
+                                    year integer NOT NULL,
+                                    month integer NOT NULL,
+                                    total real NOT NULL,
+                                    records integer NOT NULL,
+                                    PRIMARY KEY (year, month)
+                                ) WITHOUT ROWID; """
+
+# CAST reads the leading digits, so unpadded dates such as 2024-2-5 land in the right month
+sql_income_month_add = """ INSERT INTO income_month_totals(year, month, total, records)
+                                VALUES (CAST(substr(NEW.date, 1, 4) AS integer), CAST(substr(NEW.date, 6, 2) AS integer),
+                                        NEW.amount, 1)
+                                ON CONFLICT(year, month) DO UPDATE SET total = total + excluded.total,
+                                                                       records = records + 1; """
+
+sql_income_month_remove = """ UPDATE income_month_totals SET total = total - OLD.amount, records = records - 1
+                                WHERE year = CAST(substr(OLD.date, 1, 4) AS integer)
+                                AND month = CAST(substr(OLD.date, 6, 2) AS integer)
+                                AND NOT EXISTS (SELECT 1 FROM settings WHERE key = 'archiving'); """
+
+sql_create_income_month_triggers = [
+    f""" CREATE TRIGGER IF NOT EXISTS income_month_totals_insert AFTER INSERT ON income_records
+         BEGIN {sql_income_month_add} END; """,
+    f""" CREATE TRIGGER IF NOT EXISTS income_month_totals_delete AFTER DELETE ON income_records
+         BEGIN {sql_income_month_remove} END; """,
+    f""" CREATE TRIGGER IF NOT EXISTS income_month_totals_update AFTER UPDATE OF amount, date ON income_records
+         BEGIN {sql_income_month_remove} {sql_income_month_add} END; """,
+]
+
+sql_fill_income_month_totals = """ INSERT INTO income_month_totals(year, month, total, records)
+                                SELECT CAST(substr(date, 1, 4) AS integer), CAST(substr(date, 6, 2) AS integer),
+                                       SUM(amount), COUNT(*)
+                                FROM income_records
+                                GROUP BY 1, 2; """
+
+# Per-client lookups: Client.has_records() and the per-client monthly series behind forecasts
+sql_create_income_records_client_index = """ CREATE INDEX IF NOT EXISTS idx_income_records_client
+                                    ON income_records (client_id, date, amount); """
+
+
+# Change log for multi-device sync (see sync.py). Every insert, update and delete on clients and
+# income_records appends a row; seq never goes back or gets reused. origin is the database that made the
+# change and origin_seq its seq there. The triggers stay quiet while sync.apply_changes() writes (it logs
+# remote changes itself) and while archive_year() moves rows out.
+sql_create_change_log_table = """ CREATE TABLE IF NOT EXISTS change_log (
+                                    seq integer PRIMARY KEY AUTOINCREMENT,
+                                    origin text NOT NULL,
+                                    origin_seq integer NOT NULL,
+                                    table_name text NOT NULL,
+                                    row_id integer NOT NULL,
+                                    action text NOT NULL,
+                                    changed_at text NOT NULL,
+                                    data text
+                                ); """
+
+# Latest change per row, for conflict checks
+sql_create_change_log_row_index = """ CREATE INDEX IF NOT EXISTS idx_change_log_row
+                                    ON change_log (table_name, row_id, seq); """
+
+# Highest origin_seq held per origin: what this database has seen from each device
+sql_create_sync_versions_table = """ CREATE TABLE IF NOT EXISTS sync_versions (
+                                    origin text PRIMARY KEY,
+                                    seq integer NOT NULL
+                                ) WITHOUT ROWID; """
+
+# Highest local seq already sent to each peer by sync.sync_databases()
+sql_create_sync_peers_table = """ CREATE TABLE IF NOT EXISTS sync_peers (
+                                    origin text PRIMARY KEY,
+                                    sent_seq integer NOT NULL
+                                ) WITHOUT ROWID; """
+
+sql_create_origin_id = """ INSERT OR IGNORE INTO settings(key, value)
+                                VALUES ('origin_id', lower(hex(randomblob(8)))); """
+
+sql_change_log_now = "strftime('%Y-%m-%dT%H:%M:%fZ', 'now')"
+
+sql_client_json = "json_object('id', {0}.id, 'name', {0}.name, 'phone_number', {0}.phone_number, " \
+                  "'email', {0}.email, 'notes', {0}.notes)"
+
+sql_income_record_json = "json_object('id', {0}.id, 'client_id', {0}.client_id, 'amount', {0}.amount, " \
+                         "'date', {0}.date, 'description', {0}.description)"
+
+# Existing rows enter the log as upserts so the first sync carries them; origin_seq is set to seq after
+sql_fill_change_log = [
+    f""" INSERT INTO change_log(origin, origin_seq, table_name, row_id, action, changed_at, data)
+         SELECT (SELECT value FROM settings WHERE key = 'origin_id'), 0, 'clients', id, 'upsert',
+                {sql_change_log_now}, {sql_client_json.format('clients')}
+         FROM clients ORDER BY id; """,
+    f""" INSERT INTO change_log(origin, origin_seq, table_name, row_id, action, changed_at, data)
+         SELECT (SELECT value FROM settings WHERE key = 'origin_id'), 0, 'income_records', id, 'upsert',
+                {sql_change_log_now}, {sql_income_record_json.format('income_records')}
+         FROM income_records ORDER BY id; """,
+    "UPDATE change_log SET origin_seq = seq",
+    "INSERT INTO sync_versions(origin, seq) SELECT origin, MAX(origin_seq) FROM change_log GROUP BY origin",
+]
+
+
+# Recurring income (retainers). Occurrences are computed when a period is queried and only written to
+# income_records by RecurringSchedule.materialize(); materialized_through is the last date written.
+sql_create_recurring_schedules_table = """ CREATE TABLE IF NOT EXISTS recurring_schedules (
+                                    id integer PRIMARY KEY,
+                                    client_id integer NOT NULL,
+                                    amount real NOT NULL,
+                                    description text,
+                                    cadence text NOT NULL,
+                                    start_date text NOT NULL,
+                                    end_date text,
+                                    materialized_through text,
+                                    FOREIGN KEY (client_id) REFERENCES clients (id)
+                                ); """
+
+
+# auto_vacuum only changes on an existing file when a VACUUM rebuilds it. That rewrites every page under the
+# write lock, so it is left to maintenance.enable_incremental_auto_vacuum() instead of blocking startup.
+sql_set_incremental_auto_vacuum = "PRAGMA auto_vacuum = INCREMENTAL"
+
+
+def _change_log_insert(table_name, action, row, data):
+    # With AUTOINCREMENT the new seq is always sqlite_sequence + 1
+    return f""" INSERT INTO change_log(origin, origin_seq, table_name, row_id, action, changed_at, data)
+                VALUES ((SELECT value FROM settings WHERE key = 'origin_id'),
+                        COALESCE((SELECT seq FROM sqlite_sequence WHERE name = 'change_log'), 0) + 1,
+                        '{table_name}', {row}.id, '{action}', {sql_change_log_now}, {data}); """
+
+
+def _change_log_triggers(table_name, json_template, update_columns):
+    quiet = "NOT EXISTS (SELECT 1 FROM settings WHERE key IN ('sync_applying', 'archiving'))"
+    upsert_new = _change_log_insert(table_name, 'upsert', 'NEW', json_template.format('NEW'))
+    return [
+        f""" CREATE TRIGGER IF NOT EXISTS change_log_{table_name}_insert AFTER INSERT ON {table_name}
+             WHEN {quiet} BEGIN {upsert_new} END; """,
+        f""" CREATE TRIGGER IF NOT EXISTS change_log_{table_name}_update
+             AFTER UPDATE OF {update_columns} ON {table_name}
+             WHEN {quiet} BEGIN {upsert_new} END; """,
+        f""" CREATE TRIGGER IF NOT EXISTS change_log_{table_name}_delete AFTER DELETE ON {table_name}
+             WHEN {quiet} BEGIN {_change_log_insert(table_name, 'delete', 'OLD', 'NULL')} END; """,
+    ]
+
+
+sql_create_change_log_triggers = [
+    *_change_log_triggers('clients', sql_client_json, "id, name, phone_number, email, notes"),
+    # content_hash is derived, so filling it in is not a change
+    *_change_log_triggers('income_records', sql_income_record_json, "id, client_id, amount, date, description"),
+    """ CREATE TRIGGER IF NOT EXISTS sync_versions_advance AFTER INSERT ON change_log
+        BEGIN
+            INSERT INTO sync_versions(origin, seq) VALUES (NEW.origin, NEW.origin_seq)
+            ON CONFLICT(origin) DO UPDATE SET seq = max(seq, excluded.seq);
+        END; """,
+]
+
+
+def _fill_content_hashes(conn):
+    from models import fill_content_hashes
+
+    fill_content_hashes(conn)
+
+
+# Databases created before versioning have user_version 0; IF NOT EXISTS lets them adopt version 1
+MIGRATIONS = [
+    Migration(1, "Create clients and income_records tables",
+              [sql_create_clients_table, sql_create_income_records_table]),
+    Migration(2, "Index income_records by date", [sql_create_income_records_date_index]),
+    Migration(3, "Track archived years", [sql_create_archived_years_table]),
+    Migration(4, "Add content hashes for duplicate detection",
+              [sql_add_income_records_content_hash, sql_create_income_records_content_hash_index],
+              function=_fill_content_hashes),
+    Migration(5, "Add settings and calendar_dim tables", [sql_create_settings_table, sql_create_calendar_dim_table]),
+    Migration(6, "Keep monthly running totals for year-to-date figures",
+              [sql_create_income_month_totals_table, *sql_create_income_month_triggers, sql_fill_income_month_totals]),
+    Migration(7, "Index income_records by client", [sql_create_income_records_client_index]),
+    Migration(8, "Add the change log for multi-device sync",
+              [sql_create_change_log_table, sql_create_change_log_row_index, sql_create_sync_versions_table,
+               sql_create_sync_peers_table, sql_create_origin_id, *sql_fill_change_log,
+               *sql_create_change_log_triggers]),
+    Migration(9, "Add recurring income schedules", [sql_create_recurring_schedules_table]),
+    Migration(10, "Switch to incremental auto-vacuum (takes effect when maintenance rebuilds the file)",
+              [sql_set_incremental_auto_vacuum], transactional=False),
+]
+
+LATEST_VERSION = MIGRATIONS[-1].version
@@ -1,6 +1,109 @@
+import calendar
+import hashlib
+import os
 import re
 import sqlite3
-from datetime import datetime
+import time
+from datetime import date as Date, datetime, timedelta
+
+from calendar_dim import ensure_calendar, fiscal_year_bounds, get_fiscal_start_month
+from events import CLIENT_COLUMNS, INCOME_RECORD_COLUMNS, ChangeEvent, row_dict
+
+EMAIL_PATTERN = re.compile(r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b')
+
+# The fields datetime.strptime accepts for '%Y-%m-%d', including unpadded months and days
+_DATE_PATTERN = re.compile(r'(\d\d\d\d)-(1[0-2]|0[1-9]|[1-9])-(3[01]|[12]\d|0[1-9]|[1-9]| [1-9])')
+_DAYS_IN_MONTH = (31, 28, 31, 30, 31, 30, 31, 31, 30, 31, 30, 31)
+
+
+def is_iso_date(text):
+    """
+    Check a date string the way datetime.strptime(text, '%Y-%m-%d') does, without building a datetime.
+    :param text: Date string.
+    :return: Boolean.
+    """
+    match = _DATE_PATTERN.fullmatch(text)
+    if match is None:
+        return False
+    year, month, day = int(match[1]), int(match[2]), int(match[3])
+    if year == 0:
+        return False
+    if month == 2 and day == 29:
+        return calendar.isleap(year)
+    return day <= _DAYS_IN_MONTH[month - 1]
+
+
+def content_hash(client_id, amount, date, description):
+    """
+    Hash of a record's content, used to recognise the same record imported twice.
+    Amounts are compared to the cent and descriptions ignore case and surrounding or repeated whitespace.
+    :return: 16 hex characters.
+    """
+    description = " ".join(str(description or "").split()).casefold()
+    content = f"{int(client_id)}|{float(amount):.2f}|{date}|{description}"
+    return hashlib.blake2b(content.encode(), digest_size=8).hexdigest()
+
+
+# Recurring schedule cadences: (days, months) between occurrences
+CADENCES = {
+    'weekly': (7, 0),
+    'biweekly': (14, 0),
+    'monthly': (0, 1),
+    'quarterly': (0, 3),
+    'yearly': (0, 12),
+}
+
+
+def add_months(day, months):
+    """
+    Move a date by whole months, clipping the day to the end of shorter months (Jan 31 + 1 = Feb 28/29).
+    :param day: datetime.date.
+    :param months: Number of months; may be negative.
+    :return: datetime.date.
+    """
+    month_index = day.year * 12 + day.month - 1 + months
+    year, month = divmod(month_index, 12)
+    return Date(year, month + 1, min(day.day, calendar.monthrange(year, month + 1)[1]))
+
+
+def occurrence_dates(start, cadence, first, last):
+    """
+    Dates of a schedule's occurrences between first and last, inclusive. Occurrence n is always computed
+    from the start date, so clipped month ends do not drift, and dates before 'first' are skipped
+    arithmetically rather than generated.
+    :param start: datetime.date of the first occurrence.
+    :param cadence: Key of CADENCES.
+    :param first: datetime.date.
+    :param last: datetime.date.
+    :return: Iterator of datetime.date.
+    """
+    days, months = CADENCES[cadence]
+    if days:
+        index = max(0, -(-(first - start).days // days))
+        step = lambda n: start + timedelta(days=days * n)
+    else:
+        index = max(0, ((first.year - start.year) * 12 + first.month - start.month) // months - 1)
+        step = lambda n: add_months(start, months * n)
+    while True:
+        day = step(index)
+        if day > last:
+            return
+        if day >= first:
+            yield day
+        index += 1
+
+
+def _row_before_write(entity, row_id, db_manager):
+    """
+    Read a row about to be updated or deleted, for its change event's 'before' value.
+    Skipped (returns None) when no subscriber listens to the entity.
+    """
+    if not db_manager.events.wants(entity):
+        return None
+    table, columns = (('clients', CLIENT_COLUMNS) if entity == 'client'
+                      else ('income_records', INCOME_RECORD_COLUMNS))
+    cursor = db_manager.execute_query(f"SELECT {', '.join(columns)} FROM {table} WHERE id=?", (row_id,))
+    return row_dict(columns, cursor.fetchone())
 
 
 class Client:
@@ -22,10 +125,28 @@ class Client:
         self.notes = notes
 
     def validate_email(self):
-        regex = r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b'
-        if not re.fullmatch(regex, self.email):
+        if not EMAIL_PATTERN.fullmatch(self.email):
             raise ValueError("Invalid email format.")
 
+    @staticmethod
+    def validate_clients(clients):
+        """
+        Validate many clients with the same rules as add_client().
+        Args:
+            clients (iterable of Client): Clients to check.
+
+        Returns:
+            list: (index, message) tuples for the invalid clients only, in order.
+        """
+        errors = []
+        fullmatch = EMAIL_PATTERN.fullmatch
+        for index, client in enumerate(clients):
+            if not client.name:
+                errors.append((index, "Client name cannot be empty."))
+            elif not fullmatch(client.email):
+                errors.append((index, "Invalid email format."))
+        return errors
+
     def add_client(self, db_manager):
         """
         Add a new client to the clients table.
@@ -47,8 +168,12 @@ class Client:
 
         cursor = db_manager.execute_query(sql, params)
         self.client_id = cursor.lastrowid  # Assign generated ID to self
+        db_manager.events.publish(ChangeEvent('client', 'insert', self.client_id, None, self._row()))
         return self.client_id
 
+    def _row(self):
+        return row_dict(CLIENT_COLUMNS, (self.client_id, self.name, self.phone_number, self.email, self.notes))
+
     @staticmethod
     def get_client(client_id, db_manager):
         """
@@ -93,7 +218,10 @@ class Client:
                      notes = ?
                  WHERE id = ?"""
         params = (self.name, self.phone_number, self.email, self.notes, self.client_id)
-        db_manager.execute_query(sql, params)
+        before = _row_before_write('client', self.client_id, db_manager)
+        cursor = db_manager.execute_query(sql, params)
+        if cursor.rowcount:
+            db_manager.events.publish(ChangeEvent('client', 'update', self.client_id, before, self._row()))
 
     @staticmethod
     def has_records(client_id, db_manager):
@@ -104,7 +232,15 @@ class Client:
         :return: Boolean indicating whether the client has records.
         """
         cursor = db_manager.execute_query("SELECT COUNT(*) FROM income_records WHERE client_id = ?", (client_id,))
-        return cursor.fetchone()[0] > 0
+        if cursor.fetchone()[0] > 0:
+            return True
+        for year in IncomeRecord.get_archived_years(db_manager):
+            schema = IncomeRecord.attach_archive(year, db_manager)
+            cursor = db_manager.execute_query(f"SELECT 1 FROM {schema}.income_records WHERE client_id = ? LIMIT 1",
+                                              (client_id,))
+            if cursor.fetchone() is not None:
+                return True
+        return False
 
     @staticmethod
     def delete_client(client_id, db_manager):
@@ -114,7 +250,62 @@ class Client:
         :param client_id: Integer representing the client's unique ID.
         """
         sql = 'DELETE FROM clients WHERE id=?'
-        db_manager.execute_query(sql, (client_id,))
+        before = _row_before_write('client', client_id, db_manager)
+        cursor = db_manager.execute_query(sql, (client_id,))
+        if cursor.rowcount:
+            db_manager.events.publish(ChangeEvent('client', 'delete', client_id, before, None))
+
+    @staticmethod
+    def get_client_analytics(db_manager):
+        """
+        Invoice statistics for every client with records, computed in two queries ordered by client:
+        per-client aggregates straight from the (client_id, date) index, and the ranked amounts at the
+        median and 90th percentile positions from a window function. The two streams are merged here.
+        Cached until the database changes.
+        :param db_manager: (DatabaseManager) Instance to interact with the database.
+        :return: A dictionary with client_id as key and a dictionary of 'invoices', 'total', 'median',
+            'p90' (nearest rank), 'avg_days_between' (None for a single invoice) and 'share' of all
+            revenue as value.
+        """
+        def load():
+            archived = IncomeRecord.get_archived_years(db_manager)
+            source = IncomeRecord.records_source(min(archived), db_manager, max(archived)) if archived \
+                else "income_records"
+            # The average gap between consecutive payments telescopes to (last - first) / (invoices - 1)
+            totals = db_manager.execute_query(f'''SELECT client_id, COUNT(*), SUM(amount),
+                                                         julianday(MAX(date)) - julianday(MIN(date))
+                                                  FROM {source}
+                                                  GROUP BY client_id
+                                                  ORDER BY client_id''').fetchall()
+            ranked = db_manager.execute_query(f'''SELECT client_id, rank, invoices, amount
+                                                  FROM (SELECT client_id, amount,
+                                                               ROW_NUMBER() OVER (PARTITION BY client_id
+                                                                                  ORDER BY amount) AS rank,
+                                                               COUNT(*) OVER (PARTITION BY client_id) AS invoices
+                                                        FROM {source})
+                                                  WHERE rank IN ((invoices + 1) / 2, (invoices + 2) / 2,
+                                                                 (9 * invoices + 9) / 10)
+                                                  ORDER BY client_id, rank''')
+            grand_total = sum(row[2] for row in totals)
+
+            analytics = {}
+            pending = ranked.fetchone()
+            for client_id, invoices, total, span in totals:
+                amounts = {}
+                while pending is not None and pending[0] == client_id:
+                    amounts[pending[1]] = pending[3]
+                    pending = ranked.fetchone()
+                analytics[client_id] = {
+                    'invoices': invoices,
+                    'total': total,
+                    'median': (amounts[(invoices + 1) // 2] + amounts[(invoices + 2) // 2]) / 2,
+                    'p90': amounts[(9 * invoices + 9) // 10],
+                    'avg_days_between': span / (invoices - 1) if invoices > 1 and span is not None else None,
+                    'share': total / grand_total if grand_total else 0.0,
+                }
+            return analytics
+
+        return {client_id: dict(stats) for client_id, stats in db_manager.cached('clients.analytics', load).items()}
 
 
 MAX_TRANSACTION_AMOUNT = 10000
@@ -162,6 +353,38 @@ class IncomeRecord:
         except ValueError:
             return False
 
+    @staticmethod
+    def validate_records(records):
+        """
+        Validate many records with the same rules as add_record(), much faster than calling
+        is_valid_amount() and is_valid_date() per record: dates are checked without strptime and
+        each distinct date string is checked once.
+        Args:
+            records (iterable of IncomeRecord): Records to check.
+
+        Returns:
+            list: (index, message) tuples for the invalid records only, in order.
+        """
+        errors = []
+        checked_dates = {}
+        for index, record in enumerate(records):
+            if not record.client_id:
+                errors.append((index, "Client is required."))
+                continue
+            try:
+                amount = float(record.amount)
+            except ValueError:
+                amount = None
+            if amount is None or not 0 <= amount <= MAX_TRANSACTION_AMOUNT:
+                errors.append((index, "Invalid amount."))
+                continue
+            valid_date = checked_dates.get(record.date)
+            if valid_date is None:
+                valid_date = checked_dates[record.date] = is_iso_date(record.date)
+            if not valid_date:
+                errors.append((index, "Invalid date format."))
+        return errors
+
     def add_record(self, db_manager):
         """
         Add a new record to the income_records table.
@@ -179,11 +402,79 @@ class IncomeRecord:
         if not self.is_valid_date():
             raise ValueError("Invalid date format.")
 
-        sql = '''INSERT INTO income_records(client_id, amount, date, description)
-                    VALUES(?, ?, ?, ?) '''
-        cursor = db_manager.execute_query(sql, (self.client_id, self.amount, self.date, self.description))
+        sql = '''INSERT INTO income_records(client_id, amount, date, description, content_hash)
+                    VALUES(?, ?, ?, ?, ?) '''
+        cursor = db_manager.execute_query(sql, (self.client_id, self.amount, self.date, self.description,
+                                                self.content_hash()))
+        db_manager.events.publish(ChangeEvent('income_record', 'insert', cursor.lastrowid, None,
+                                              self._row(cursor.lastrowid)))
         return cursor.lastrowid
 
+    def _row(self, income_id):
+        # Values as stored: the columns' integer and real affinity converts numeric strings
+        return row_dict(INCOME_RECORD_COLUMNS, (income_id, int(self.client_id), float(self.amount), self.date,
+                                                self.description))
+
+    def content_hash(self):
+        """Content hash of this record; see content_hash()."""
+        return content_hash(self.client_id, self.amount, self.date, self.description)
+
+    @staticmethod
+    def add_records(records, db_manager, skip_duplicates=True):
+        """
+        Insert many records in one transaction, recognising records that are already stored.
+        A record is a duplicate when a stored record has the same content hash (see content_hash()); each
+        check is a single index lookup. Records are expected to be valid (see validate_records()).
+        Args:
+            records (iterable of IncomeRecord): Records to insert.
+            db_manager (DatabaseManager): Instance to interact with the database.
+            skip_duplicates (bool): Leave duplicates out. When False they are inserted and only reported.
+
+        Returns:
+            tuple: (number of records inserted, list of (index, id of the stored record) per duplicate)
+        """
+        conn = db_manager.conn
+        rows = []
+        duplicates = []
+        started = time.perf_counter()
+        with conn:
+            # Take the write lock first so no other writer can add a duplicate between lookup and insert
+            conn.execute("BEGIN IMMEDIATE")
+            for index, record in enumerate(records):
+                digest = record.content_hash()
+                existing = conn.execute("SELECT id FROM income_records WHERE content_hash = ? LIMIT 1",
+                                        (digest,)).fetchone()
+                if existing is not None:
+                    duplicates.append((index, existing[0]))
+                    if skip_duplicates:
+                        continue
+                rows.append((int(record.client_id), float(record.amount), record.date, record.description, digest))
+            conn.executemany('''INSERT INTO income_records(client_id, amount, date, description, content_hash)
+                                VALUES(?, ?, ?, ?, ?) ''', rows)
+        db_manager.record_transaction(started, len(rows))
+        return len(rows), duplicates
+
+    @staticmethod
+    def find_duplicates(db_manager):
+        """
+        Find groups of stored records with the same content hash.
+        Records inserted without a hash (e.g. by raw SQL) are hashed first.
+        Args:
+            db_manager (DatabaseManager): Instance to interact with the database.
+
+        Returns:
+            list: Ascending lists of record ids, one per group, ordered by their first id.
+        """
+        with db_manager.conn:
+            fill_content_hashes(db_manager.conn)
+        sql = '''SELECT GROUP_CONCAT(id)
+                 FROM (SELECT id, content_hash FROM income_records
+                       WHERE content_hash IS NOT NULL ORDER BY content_hash, id)
+                 GROUP BY content_hash
+                 HAVING COUNT(*) > 1'''
+        cursor = db_manager.execute_query(sql)
+        return sorted([int(income_id) for income_id in row[0].split(",")] for row in cursor.fetchall())
+
     def get_record(self, db_manager):
         """
         Retrieve a record by its ID.
@@ -194,7 +485,8 @@ class IncomeRecord:
              A tuple containing the record's data.
         """
 
-        cursor = db_manager.execute_query("SELECT * FROM income_records WHERE id=?", (self.income_id,))
+        cursor = db_manager.execute_query("SELECT id, client_id, amount, date, description FROM income_records "
+                                          "WHERE id=?", (self.income_id,))
         return cursor.fetchone()
 
     def update_record(self, db_manager):
@@ -214,9 +506,15 @@ class IncomeRecord:
                 SET client_id = ?,
                     amount = ?,
                     date = ?,
-                    description = ?
+                    description = ?,
+                    content_hash = ?
                 WHERE id = ? '''
-        db_manager.execute_query(sql, (self.client_id, self.amount, self.date, self.description, self.income_id))
+        before = _row_before_write('income_record', self.income_id, db_manager)
+        cursor = db_manager.execute_query(sql, (self.client_id, self.amount, self.date, self.description,
+                                                self.content_hash(), self.income_id))
+        if cursor.rowcount:
+            db_manager.events.publish(ChangeEvent('income_record', 'update', self.income_id, before,
+                                                  self._row(self.income_id)))
 
     @staticmethod
     def delete_record(income_id, db_manager):
@@ -228,32 +526,193 @@ class IncomeRecord:
         """
         try:
             sql = 'DELETE FROM income_records WHERE id=?'
-            db_manager.execute_query(sql, (income_id,))
+            before = _row_before_write('income_record', income_id, db_manager)
+            cursor = db_manager.execute_query(sql, (income_id,))
         except sqlite3.Error as e:
             raise e
+        if cursor.rowcount:
+            db_manager.events.publish(ChangeEvent('income_record', 'delete', income_id, before, None))
 
     @staticmethod
-    def get_monthly_totals(year, db_manager):
+    def get_monthly_totals(year, db_manager, include_scheduled=False):
         """
         Retrieve the total amount transacted for each month of the given year.
         Args:
             db_manager (DatabaseManager): Instance to interact with the database.
 
             year: Integer representing the year.
+
+            include_scheduled: Also count recurring schedules' occurrences that are not materialized yet.
         Return:
             A dictionary with month as key and total amount as value.
         """
 
-        sql = ''' SELECT strftime('%m', date) AS month, SUM(amount) AS total
-                    FROM income_records
-                    WHERE strftime('%Y', date) = ?
+        sql = f''' SELECT strftime('%m', date) AS month, SUM(amount) AS total
+                    FROM {IncomeRecord.records_source(year, db_manager)}
+                    WHERE date >= ? AND date < ?
                     GROUP BY month '''
-        cursor = db_manager.execute_query(sql, (str(year),))
+        cursor = db_manager.execute_query(sql, (str(year), str(int(year) + 1)))
         monthly_totals = {row[0]: row[1] for row in cursor.fetchall()}
+        if include_scheduled:
+            for occurrence in RecurringSchedule.occurrences(f"{int(year):04d}-01-01", f"{int(year):04d}-12-31",
+                                                            db_manager):
+                month = occurrence[0][5:7]
+                monthly_totals[month] = monthly_totals.get(month, 0) + occurrence[3]
+            monthly_totals = dict(sorted(monthly_totals.items()))
         return monthly_totals
 
     @staticmethod
-    def get_daily_records(year, month, db_manager):
+    def _calendar_totals(columns, first_date, end_date, db_manager):
+        """
+        Sum amounts between two dates (end exclusive), grouped by calendar_dim columns.
+        One range scan on the date index, with one calendar_dim primary key lookup per record.
+        """
+        first_year, last_year = int(first_date[:4]), int(end_date[:4])
+        ensure_calendar(db_manager.conn, first_year, last_year)
+        source = IncomeRecord.records_source(first_year, db_manager, last_year)
+        select = ", ".join(f"c.{column}" for column in columns)
+        sql = f'''SELECT {select}, SUM(r.amount)
+                  FROM {source} r
+                  JOIN calendar_dim c ON c.date = r.date
+                  WHERE r.date >= ? AND r.date < ?
+                  GROUP BY {select}
+                  ORDER BY {select}'''
+        cursor = db_manager.execute_query(sql, (first_date, end_date))
+        if len(columns) == 1:
+            return {row[0]: row[1] for row in cursor.fetchall()}
+        return {tuple(row[:-1]): row[-1] for row in cursor.fetchall()}
+
+    @staticmethod
+    def get_quarterly_totals(year, db_manager):
+        """
+        Retrieve the total amount transacted in each calendar quarter of the given year.
+        Args:
+            year: Integer representing the year.
+            db_manager (DatabaseManager): Instance to interact with the database.
+        Return:
+            A dictionary with quarter (1-4) as key and total amount as value.
+        """
+        def load():
+            return IncomeRecord._calendar_totals(("quarter",), str(year), str(int(year) + 1), db_manager)
+
+        return dict(db_manager.cached(('income_records.quarterly_totals', int(year)), load))
+
+    @staticmethod
+    def get_weekly_totals(year, db_manager):
+        """
+        Retrieve the total amount transacted in each ISO week with records dated in the given year.
+        Weeks at either end may belong to the previous or next ISO year.
+        Args:
+            year: Integer representing the year.
+            db_manager (DatabaseManager): Instance to interact with the database.
+        Return:
+            A dictionary with (iso_year, iso_week) as key and total amount as value.
+        """
+        def load():
+            return IncomeRecord._calendar_totals(("iso_year", "iso_week"), str(year), str(int(year) + 1), db_manager)
+
+        return dict(db_manager.cached(('income_records.weekly_totals', int(year)), load))
+
+    @staticmethod
+    def get_weekday_totals(year, db_manager):
+        """
+        Retrieve the total amount transacted on each day of the week in the given year.
+        Args:
+            year: Integer representing the year.
+            db_manager (DatabaseManager): Instance to interact with the database.
+        Return:
+            A dictionary with ISO weekday (1 = Monday to 7 = Sunday) as key and total amount as value.
+        """
+        def load():
+            return IncomeRecord._calendar_totals(("weekday",), str(year), str(int(year) + 1), db_manager)
+
+        return dict(db_manager.cached(('income_records.weekday_totals', int(year)), load))
+
+    @staticmethod
+    def get_fiscal_quarter_totals(fiscal_year, db_manager):
+        """
+        Retrieve the total amount transacted in each quarter of a fiscal year.
+        Fiscal years start in the month set with set_fiscal_start_month() and are named after the calendar
+        year they end in.
+        Args:
+            fiscal_year: Integer representing the fiscal year.
+            db_manager (DatabaseManager): Instance to interact with the database.
+        Return:
+            A dictionary with fiscal quarter (1-4) as key and total amount as value.
+        """
+        def load():
+            first_date, end_date = fiscal_year_bounds(int(fiscal_year), get_fiscal_start_month(db_manager.conn))
+            return IncomeRecord._calendar_totals(("fiscal_quarter",), first_date, end_date, db_manager)
+
+        return dict(db_manager.cached(('income_records.fiscal_quarter_totals', int(fiscal_year)), load))
+
+    @staticmethod
+    def get_date_bounds(db_manager):
+        """
+        Retrieve the earliest and latest record dates, archived years included.
+        Args:
+            db_manager (DatabaseManager): Instance to interact with the database.
+        Return:
+            A tuple (first_date, last_date) of YYYY-MM-DD strings, or (None, None) if there are no records.
+        """
+        def load():
+            # One index lookup per file instead of a scan over their union
+            tables = ["main.income_records"] + [f"{IncomeRecord.attach_archive(year, db_manager)}.income_records"
+                                                for year in sorted(IncomeRecord.get_archived_years(db_manager))]
+            dates = [value for table in tables
+                     for value in db_manager.execute_query(f"SELECT MIN(date), MAX(date) FROM {table}").fetchone()
+                     if value is not None]
+            return (min(dates), max(dates)) if dates else (None, None)
+
+        return db_manager.cached('income_records.date_bounds', load)
+
+    @staticmethod
+    def get_active_years(db_manager):
+        """
+        Retrieve the years that have at least one record, in ascending order.
+        Each year is found with one lookup on the date index, jumping straight to the next year.
+        Args:
+            db_manager (DatabaseManager): Instance to interact with the database.
+        Return:
+            A list of integers.
+        """
+        def load():
+            years = []
+            first_date, _ = IncomeRecord.get_date_bounds(db_manager)
+            while first_date is not None:
+                year = int(first_date[:4])
+                years.append(year)
+                cursor = db_manager.execute_query("SELECT MIN(date) FROM income_records WHERE date >= ?",
+                                                  (str(year + 1),))
+                first_date = cursor.fetchone()[0]
+            return sorted(set(years).union(IncomeRecord.get_archived_years(db_manager)))
+
+        return list(db_manager.cached('income_records.active_years', load))
+
+    @staticmethod
+    def get_yearly_totals(db_manager):
+        """
+        Retrieve the total amount transacted in each year that has records.
+        Args:
+            db_manager (DatabaseManager): Instance to interact with the database.
+        Return:
+            A dictionary with year (int) as key and total amount as value, in ascending year order.
+        """
+        def load():
+            sql = ''' SELECT substr(date, 1, 4) AS year, SUM(amount) AS total
+                        FROM income_records
+                        GROUP BY year
+                        ORDER BY year '''
+            cursor = db_manager.execute_query(sql)
+            totals = {int(row[0]): row[1] for row in cursor.fetchall()}
+            for year, (_, _, total) in IncomeRecord.get_archived_years(db_manager).items():
+                totals[year] = totals.get(year, 0) + total
+            return dict(sorted(totals.items()))
+
+        return dict(db_manager.cached('income_records.yearly_totals', load))
+
+    @staticmethod
+    def get_daily_records(year, month, db_manager, include_scheduled=False):
         """
         Retrieve records for each day in a selected month of a particular year, including client names.
         Args:
@@ -262,20 +721,327 @@ class IncomeRecord:
             year: Integer representing the year.
 
             month: Integer representing the month.
+
+            include_scheduled: Add recurring schedules' occurrences that are not materialized yet, with
+                None as their record id.
         Return:
             A dictionary with date as key and a list of record tuples as value.
         """
-        sql = '''SELECT r.date, r.id, r.client_id, r.amount, r.description, c.name
-                 FROM income_records r
+        sql = f'''SELECT r.date, r.id, r.client_id, r.amount, r.description, c.name
+                 FROM {IncomeRecord.records_source(year, db_manager)} r
                  LEFT JOIN clients c ON r.client_id = c.id
-                 WHERE strftime('%Y', r.date) = ?
-                 AND strftime('%m', r.date) = ?
+                 WHERE r.date >= ? AND r.date < ?
                  ORDER BY r.date'''
-        cursor = db_manager.execute_query(sql, (str(year), str(month).zfill(2)))
+        first_day = f"{int(year):04d}-{int(month):02d}"
+        next_month = f"{int(year) + 1:04d}-01" if int(month) == 12 else f"{int(year):04d}-{int(month) + 1:02d}"
+        cursor = db_manager.execute_query(sql, (first_day, next_month))
         daily_records = {}
         for row in cursor.fetchall():
             date, income_id, client_id, amount, description, client_name = row
             if date not in daily_records:
                 daily_records[date] = []
             daily_records[date].append((income_id, client_id, amount, description, client_name))
+        if include_scheduled:
+            last_day = f"{first_day}-{calendar.monthrange(int(year), int(month))[1]:02d}"
+            for date, _, client_id, amount, description, client_name in \
+                    RecurringSchedule.occurrences(f"{first_day}-01", last_day, db_manager):
+                daily_records.setdefault(date, []).append((None, client_id, amount, description, client_name))
+            daily_records = dict(sorted(daily_records.items()))
         return daily_records
+
+    @staticmethod
+    def get_archived_years(db_manager):
+        """
+        Retrieve the years moved to archive files.
+        Args:
+            db_manager (DatabaseManager): Instance to interact with the database.
+        Return:
+            A dictionary with year (int) as key and a (file_name, records, total) tuple as value.
+        """
+        def load():
+            cursor = db_manager.execute_query("SELECT year, file_name, records, total FROM archived_years")
+            return {row[0]: tuple(row[1:]) for row in cursor.fetchall()}
+
+        return dict(db_manager.cached('income_records.archived_years', load))
+
+    @staticmethod
+    def attach_archive(year, db_manager):
+        """
+        Attach a year's archive file to the connection, if it is not attached already.
+        Args:
+            year: Integer representing the year.
+            db_manager (DatabaseManager): Instance to interact with the database.
+        Return:
+            The schema name the archive is attached as.
+        """
+        return db_manager.attach(db_manager.archive_path(year), f"archive_{int(year)}")
+
+    @staticmethod
+    def records_source(year, db_manager, last_year=None):
+        """
+        SQL table expression holding the records of a year, or of the years from 'year' to 'last_year':
+        income_records, plus the archive files of those years that have been archived (records dated in an
+        archived year may still be added afterwards).
+        Args:
+            year: Integer representing the (first) year.
+            db_manager (DatabaseManager): Instance to interact with the database.
+            last_year: Optional integer representing the last year of a range.
+        Return:
+            A string to use after FROM.
+        """
+        last_year = int(year) if last_year is None else int(last_year)
+        archived = [archived_year for archived_year in sorted(IncomeRecord.get_archived_years(db_manager))
+                    if int(year) <= archived_year <= last_year]
+        if not archived:
+            return "income_records"
+        columns = "id, client_id, amount, date, description"
+        selects = [f"SELECT {columns} FROM main.income_records"]
+        for archived_year in archived:
+            schema = IncomeRecord.attach_archive(archived_year, db_manager)
+            selects.append(f"SELECT {columns} FROM {schema}.income_records")
+        return f"({' UNION ALL '.join(selects)})"
+
+    @staticmethod
+    def all_records_source(db_manager):
+        """
+        SQL table expression holding every record: income_records plus every archive file.
+        Args:
+            db_manager (DatabaseManager): Instance to interact with the database.
+        Return:
+            A string to use after FROM.
+        """
+        archived = IncomeRecord.get_archived_years(db_manager)
+        if not archived:
+            return "income_records"
+        return IncomeRecord.records_source(min(archived), db_manager, max(archived))
+
+    @staticmethod
+    def archive_year(year, db_manager):
+        """
+        Move a closed year's records out of income_records into the year's archive file.
+        The copy and the delete run in one transaction, so a failure leaves the records where they were.
+        Archiving a year again moves records added for it since. Archived records keep their ids.
+        Args:
+            year: Integer representing the year; must be before the current year.
+            db_manager (DatabaseManager): Instance to interact with the database.
+        Return:
+            The number of records moved.
+        """
+        year = int(year)
+        if year >= datetime.now().year:
+            raise ValueError("Only past years can be archived.")
+
+        os.makedirs(db_manager.archive_dir, exist_ok=True)
+        schema = IncomeRecord.attach_archive(year, db_manager)
+        conn = db_manager.conn
+        conn.execute(f'''CREATE TABLE IF NOT EXISTS {schema}.income_records (
+                                    id integer PRIMARY KEY,
+                                    client_id integer NOT NULL,
+                                    amount real NOT NULL,
+                                    date text NOT NULL,
+                                    description text
+                                )''')
+        conn.execute(f"CREATE INDEX IF NOT EXISTS {schema}.idx_income_records_date ON income_records (date, amount)")
+
+        bounds = (str(year), str(year + 1))
+        started = time.perf_counter()
+        with conn:
+            moved = conn.execute(f'''INSERT INTO {schema}.income_records(id, client_id, amount, date, description)
+                                     SELECT id, client_id, amount, date, description FROM main.income_records
+                                     WHERE date >= ? AND date < ?''', bounds).rowcount
+            # Archived records still count towards income_month_totals; see migrations
+            conn.execute("INSERT INTO settings(key, value) VALUES ('archiving', ?)", (str(year),))
+            conn.execute("DELETE FROM main.income_records WHERE date >= ? AND date < ?", bounds)
+            conn.execute("DELETE FROM settings WHERE key = 'archiving'")
+            records, total = conn.execute(f"SELECT COUNT(*), COALESCE(SUM(amount), 0) FROM {schema}.income_records"
+                                          ).fetchone()
+            conn.execute('''INSERT OR REPLACE INTO archived_years(year, file_name, records, total, archived_at)
+                            VALUES(?, ?, ?, ?, ?)''',
+                         (year, os.path.basename(db_manager.archive_path(year)), records, total,
+                          datetime.now().isoformat(timespec='seconds')))
+        db_manager.record_transaction(started, moved * 2)
+        return moved
+
+
+class RecurringSchedule:
+    """
+    Recurring income, e.g. a monthly retainer.
+    Occurrences are not stored: queries compute the ones in the period they ask for (see occurrences()
+    and IncomeRecord.get_monthly_totals(include_scheduled=True)), so a schedule without an end date adds
+    no rows. materialize() writes the confirmed occurrences into income_records.
+    """
+    COLUMNS = "id, client_id, amount, cadence, start_date, end_date, description, materialized_through"
+
+    def __init__(self, schedule_id=None, client_id=None, amount=None, cadence='monthly', start_date=None,
+                 end_date=None, description="", materialized_through=None):
+        """
+        Initialize a RecurringSchedule object.
+
+        Args:
+            schedule_id (int, optional): ID of an existing schedule. Defaults to None.
+            client_id (int, optional): ID of the client paying. Defaults to None.
+            amount (float, optional): Amount of each occurrence. Defaults to None.
+            cadence (str, optional): One of CADENCES. Defaults to 'monthly'.
+            start_date (str, optional): Date of the first occurrence (YYYY-MM-DD). Defaults to None.
+            end_date (str, optional): Last date an occurrence may fall on; None never ends. Defaults to None.
+            description (str, optional): Description given to each occurrence. Defaults to "".
+            materialized_through (str, optional): Last date already written to income_records.
+        """
+        self.schedule_id = schedule_id
+        self.client_id = client_id
+        self.amount = amount
+        self.cadence = cadence
+        self.start_date = start_date
+        self.end_date = end_date
+        self.description = description
+        self.materialized_through = materialized_through
+
+    def add_schedule(self, db_manager):
+        """
+        Add the schedule to the recurring_schedules table.
+
+        Args:
+            db_manager (DatabaseManager): Instance to interact with the database.
+
+        Returns:
+            int: The row ID of the new schedule.
+        """
+        if not self.client_id:
+            raise ValueError("Client is required.")
+        if not IncomeRecord(amount=self.amount).is_valid_amount():
+            raise ValueError("Invalid amount.")
+        if self.cadence not in CADENCES:
+            raise ValueError(f"Cadence must be one of: {', '.join(CADENCES)}.")
+        if not is_iso_date(str(self.start_date)) or (self.end_date is not None and not is_iso_date(self.end_date)):
+            raise ValueError("Invalid date format.")
+        if self.end_date is not None and self.end_date < self.start_date:
+            raise ValueError("End date is before the start date.")
+
+        sql = '''INSERT INTO recurring_schedules(client_id, amount, cadence, start_date, end_date, description)
+                 VALUES(?, ?, ?, ?, ?, ?)'''
+        cursor = db_manager.execute_query(sql, (self.client_id, self.amount, self.cadence, self.start_date,
+                                                self.end_date, self.description))
+        self.schedule_id = cursor.lastrowid
+        return self.schedule_id
+
+    @staticmethod
+    def get_all_schedules(db_manager):
+        """
+        Retrieve every schedule.
+        :param db_manager: (DatabaseManager) Instance to interact with the database.
+        :return: A list of RecurringSchedule objects ordered by id.
+        """
+        cursor = db_manager.execute_query(f"SELECT {RecurringSchedule.COLUMNS} FROM recurring_schedules ORDER BY id")
+        return [RecurringSchedule(*row) for row in cursor.fetchall()]
+
+    @staticmethod
+    def delete_schedule(schedule_id, db_manager):
+        """
+        Delete a schedule. Occurrences already materialized stay in income_records.
+        :param schedule_id: Integer representing the schedule's unique ID.
+        :param db_manager: (DatabaseManager) Instance to interact with the database.
+        """
+        db_manager.execute_query("DELETE FROM recurring_schedules WHERE id=?", (schedule_id,))
+
+    def pending_dates(self, first_date, last_date):
+        """
+        Dates of the occurrences between first_date and last_date (inclusive, YYYY-MM-DD) that are not
+        materialized yet.
+        :return: Iterator of datetime.date.
+        """
+        first = Date.fromisoformat(first_date)
+        if self.materialized_through is not None:
+            first = max(first, Date.fromisoformat(self.materialized_through) + timedelta(days=1))
+        last = Date.fromisoformat(last_date)
+        if self.end_date is not None:
+            last = min(last, Date.fromisoformat(self.end_date))
+        return occurrence_dates(Date.fromisoformat(self.start_date), self.cadence, first, last)
+
+    @staticmethod
+    def occurrences(first_date, last_date, db_manager):
+        """
+        Compute the pending occurrences of every schedule in a period. Nothing is written.
+        Only schedules overlapping the period are read, and only the period's occurrences are generated.
+        Args:
+            first_date: First date of the period (YYYY-MM-DD).
+            last_date: Last date of the period, inclusive.
+            db_manager (DatabaseManager): Instance to interact with the database.
+
+        Returns:
+            list: (date, schedule id, client_id, amount, description, client name) tuples ordered by date.
+        """
+        sql = '''SELECT s.id, s.client_id, s.amount, s.cadence, s.start_date, s.end_date, s.description,
+                        s.materialized_through, c.name
+                 FROM recurring_schedules s
+                 LEFT JOIN clients c ON c.id = s.client_id
+                 WHERE s.start_date <= ? AND (s.end_date IS NULL OR s.end_date >= ?)
+                 AND (s.materialized_through IS NULL OR s.materialized_through < ?)'''
+        cursor = db_manager.execute_query(sql, (last_date, first_date, last_date))
+        occurrences = []
+        for row in cursor.fetchall():
+            schedule = RecurringSchedule(*row[:8])
+            for day in schedule.pending_dates(first_date, last_date):
+                occurrences.append((day.isoformat(), schedule.schedule_id, schedule.client_id, schedule.amount,
+                                    schedule.description, row[8]))
+        occurrences.sort(key=lambda occurrence: (occurrence[0], occurrence[1]))
+        return occurrences
+
+    @staticmethod
+    def materialize(through_date, db_manager):
+        """
+        Write every pending occurrence up to through_date into income_records, in one transaction, and
+        mark the schedules materialized through that date.
+        An occurrence whose content hash matches a stored record (e.g. the payment was already entered by
+        hand) is not inserted again, like IncomeRecord.add_records() does. An insert event is published for
+        each record after the commit.
+        Args:
+            through_date: Last date to confirm (YYYY-MM-DD).
+            db_manager (DatabaseManager): Instance to interact with the database.
+
+        Returns:
+            int: The number of records inserted.
+        """
+        if not is_iso_date(through_date):
+            raise ValueError("Invalid date format.")
+        conn = db_manager.conn
+        inserted = []
+        started = time.perf_counter()
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            rows = conn.execute(f'''SELECT {RecurringSchedule.COLUMNS} FROM recurring_schedules
+                                     WHERE start_date <= ?
+                                     AND (materialized_through IS NULL OR materialized_through < ?)''',
+                                (through_date, through_date)).fetchall()
+            for row in rows:
+                schedule = RecurringSchedule(*row)
+                for day in schedule.pending_dates(schedule.start_date, through_date):
+                    record = IncomeRecord(client_id=schedule.client_id, amount=schedule.amount, date=day.isoformat(),
+                                          description=schedule.description)
+                    digest = record.content_hash()
+                    if conn.execute("SELECT 1 FROM income_records WHERE content_hash = ? LIMIT 1",
+                                    (digest,)).fetchone() is not None:
+                        continue
+                    cursor = conn.execute('''INSERT INTO income_records(client_id, amount, date, description,
+                                                                        content_hash)
+                                             VALUES(?, ?, ?, ?, ?)''',
+                                          (record.client_id, record.amount, record.date, record.description, digest))
+                    inserted.append((cursor.lastrowid, record))
+            conn.executemany("UPDATE recurring_schedules SET materialized_through = ? WHERE id = ?",
+                             [(through_date, row[0]) for row in rows])
+        db_manager.record_transaction(started, len(inserted))
+        for income_id, record in inserted:
+            db_manager.events.publish(ChangeEvent('income_record', 'insert', income_id, None, record._row(income_id)))
+        return len(inserted)
+
+
+def fill_content_hashes(conn):
+    """
+    Store the content hash of every record that has none. Runs in the caller's transaction.
+    :param conn: sqlite3.Connection.
+    :return: Number of records updated.
+    """
+    rows = conn.execute("SELECT id, client_id, amount, date, description FROM income_records "
+                        "WHERE content_hash IS NULL").fetchall()
+    conn.executemany("UPDATE income_records SET content_hash = ? WHERE id = ?",
+                     [(content_hash(*row[1:]), row[0]) for row in rows])
+    return len(rows)
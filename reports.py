@@ -0,0 +1,200 @@
+"""
+Per-month and per-client income reports as plain text, CSV or HTML.
+
+Each year is summarised on its own read-only connection and written out in year order as soon as it is
+done, so the report grows on disk while the later years are still being computed. With workers > 1 the
+years are summarised in a process pool; that only pays off for large multi-year ledgers on several
+cores, so it is opt-in.
+"""
+import calendar
+import csv
+import html
+import os
+import sqlite3
+from concurrent.futures import ProcessPoolExecutor
+
+from models import IncomeRecord
+
+
+def connect_read_only(db_path):
+    """
+    Open a read-only connection to a database file.
+    :param db_path: Path of the SQLite database file.
+    :return: sqlite3.Connection.
+    """
+    return sqlite3.connect(f"file:{os.path.abspath(db_path)}?mode=ro", uri=True)
+
+
+def summarise_year(db_path, year, archive_path=None):
+    """
+    Summarise one year's income by month and by client. Runs in a worker process when workers > 1.
+    Args:
+        db_path: Path of the SQLite database file.
+        year: Integer representing the year.
+        archive_path: Path of the year's archive file, if the year has been archived.
+
+    Returns:
+        dict: 'year', 'total', 'records', 'months' as (month, total, records) and 'clients' as
+        (client_id, name, total, records) ordered by total, highest first.
+    """
+    conn = connect_read_only(db_path)
+    try:
+        source = "income_records"
+        if archive_path is not None:
+            conn.execute("ATTACH DATABASE ? AS archive", (f"file:{os.path.abspath(archive_path)}?mode=ro",))
+            columns = "id, client_id, amount, date"
+            source = (f"(SELECT {columns} FROM main.income_records "
+                      f"UNION ALL SELECT {columns} FROM archive.income_records)")
+        bounds = (str(year), str(year + 1))
+        months = conn.execute(f'''SELECT CAST(substr(date, 6, 2) AS integer) AS month, SUM(amount), COUNT(*)
+                                  FROM {source}
+                                  WHERE date >= ? AND date < ?
+                                  GROUP BY month
+                                  ORDER BY month''', bounds).fetchall()
+        clients = conn.execute(f'''SELECT r.client_id, c.name, SUM(r.amount) AS total, COUNT(*)
+                                   FROM {source} r
+                                   LEFT JOIN clients c ON c.id = r.client_id
+                                   WHERE r.date >= ? AND r.date < ?
+                                   GROUP BY r.client_id
+                                   ORDER BY total DESC, r.client_id''', bounds).fetchall()
+    finally:
+        conn.close()
+    return {
+        'year': year,
+        'total': sum(row[1] for row in months),
+        'records': sum(row[2] for row in months),
+        'months': months,
+        'clients': clients,
+    }
+
+
+class TextReportWriter:
+    """Fixed-width plain text."""
+
+    def __init__(self, out):
+        self.out = out
+
+    def begin(self, title):
+        self.out.write(f"{title}\n{'=' * len(title)}\n")
+
+    def write_year(self, section):
+        self.out.write(f"\n{section['year']}: {section['total']:,.2f} from {section['records']} records\n\n")
+        self.out.write(f"  {'Month':<12}{'Records':>10}{'Total':>16}\n")
+        for month, total, records in section['months']:
+            self.out.write(f"  {month_name(month):<12}{records:>10}{total:>16,.2f}\n")
+        self.out.write(f"\n  {'Client':<30}{'Records':>10}{'Total':>16}{'Share':>8}\n")
+        for client_id, name, total, records in section['clients']:
+            share = total / section['total'] if section['total'] else 0
+            self.out.write(f"  {client_label(client_id, name)[:29]:<30}{records:>10}{total:>16,.2f}{share:>8.1%}\n")
+
+    def end(self, total, records):
+        self.out.write(f"\nTotal: {total:,.2f} from {records} records\n")
+
+
+class CsvReportWriter:
+    """One CSV table: section, year, key, name, records, total."""
+
+    def __init__(self, out):
+        self.writer = csv.writer(out)
+
+    def begin(self, title):
+        self.writer.writerow(("section", "year", "key", "name", "records", "total"))
+
+    def write_year(self, section):
+        year = section['year']
+        for month, total, records in section['months']:
+            self.writer.writerow(("month", year, month, month_name(month), records, round(total, 2)))
+        for client_id, name, total, records in section['clients']:
+            self.writer.writerow(("client", year, client_id, name or "", records, round(total, 2)))
+        self.writer.writerow(("year", year, "", "", section['records'], round(section['total'], 2)))
+
+    def end(self, total, records):
+        self.writer.writerow(("total", "", "", "", records, round(total, 2)))
+
+
+class HtmlReportWriter:
+    """A standalone HTML page with one pair of tables per year."""
+
+    def __init__(self, out):
+        self.out = out
+
+    def begin(self, title):
+        title = html.escape(title)
+        self.out.write(f"<!DOCTYPE html>\n<html><head><meta charset=\"utf-8\"><title>{title}</title>"
+                       "<style>table{border-collapse:collapse}td,th{padding:2px 8px;border:1px solid #ccc}"
+                       "td.n{text-align:right}</style></head>\n<body>\n<h1>" + title + "</h1>\n")
+
+    def write_year(self, section):
+        self.out.write(f"<h2>{section['year']}</h2>\n"
+                       f"<p>{section['total']:,.2f} from {section['records']} records</p>\n")
+        self.out.write("<table><tr><th>Month</th><th>Records</th><th>Total</th></tr>\n")
+        for month, total, records in section['months']:
+            self.out.write(f"<tr><td>{month_name(month)}</td><td class=\"n\">{records}</td>"
+                           f"<td class=\"n\">{total:,.2f}</td></tr>\n")
+        self.out.write("</table>\n<table><tr><th>Client</th><th>Records</th><th>Total</th></tr>\n")
+        for client_id, name, total, records in section['clients']:
+            self.out.write(f"<tr><td>{html.escape(client_label(client_id, name))}</td>"
+                           f"<td class=\"n\">{records}</td><td class=\"n\">{total:,.2f}</td></tr>\n")
+        self.out.write("</table>\n")
+
+    def end(self, total, records):
+        self.out.write(f"<h2>Total</h2>\n<p>{total:,.2f} from {records} records</p>\n</body></html>\n")
+
+
+WRITERS = {'text': TextReportWriter, 'csv': CsvReportWriter, 'html': HtmlReportWriter}
+
+
+def month_name(month):
+    return calendar.month_name[month] if 1 <= month <= 12 else str(month)
+
+
+def client_label(client_id, name):
+    return name if name else f"Client #{client_id}"
+
+
+def generate_report(db_manager, output_path, years=None, report_format='text', workers=1):
+    """
+    Write a report with one section per year, then the grand total.
+    Args:
+        db_manager (DatabaseManager): Instance to interact with the database; used to list the years.
+        output_path: File to write.
+        years: Years to include. Defaults to every year with records.
+        report_format: 'text', 'csv' or 'html'.
+        workers: Worker processes for multi-year reports; 1 (the default) computes in-process, None uses
+            one per core.
+
+    Returns:
+        dict: 'years', 'records' and 'total' of the report.
+    """
+    if report_format not in WRITERS:
+        raise ValueError(f"Unknown report format: {report_format}")
+    years = sorted(IncomeRecord.get_active_years(db_manager) if years is None else {int(year) for year in years})
+    archived = IncomeRecord.get_archived_years(db_manager)
+    jobs = [(db_manager.db_path, year, db_manager.archive_path(year) if year in archived else None)
+            for year in years]
+
+    total = 0.0
+    records = 0
+    with open(output_path, "w", newline="") as out:
+        writer = WRITERS[report_format](out)
+        title = f"Income report {years[0]}-{years[-1]}" if years else "Income report"
+        writer.begin(title)
+        out.flush()
+
+        if workers == 1 or len(jobs) <= 1:
+            sections = (summarise_year(*job) for job in jobs)
+            executor = None
+        else:
+            executor = ProcessPoolExecutor(max_workers=workers)
+            sections = (future.result() for future in [executor.submit(summarise_year, *job) for job in jobs])
+        try:
+            for section in sections:
+                writer.write_year(section)
+                out.flush()
+                total += section['total']
+                records += section['records']
+        finally:
+            if executor is not None:
+                executor.shutdown(cancel_futures=True)
+        writer.end(total, records)
+    return {'years': years, 'records': records, 'total': total}
@@ -0,0 +1,257 @@
+"""
+Columnar binary snapshots of income_records for analytics that read every record.
+
+A snapshot file is a 64 byte header followed by four fixed-width little-endian columns, rows in id order:
+
+    ids         int64   record id
+    amounts     int64   amount in cents
+    dates       int32   date.toordinal() of the record's date; 0 when julianday() rejects it
+    client_ids  int32   client id
+
+Snapshot maps the file and exposes each column as a memoryview cast to its type, so opening a snapshot
+reads only the header however many rows it holds; pages are read by the OS when a column is touched.
+
+The header stores the ledger generation the snapshot was built at: the change log's latest seq (see
+migration 8) and a checksum of archived_years, since archiving deletes rows without logging them.
+update_snapshot() compares it with the database's: unchanged snapshots are kept, logged changes are
+merged into a copy of the old columns, and anything else (a new archive, a missing or foreign file) is
+rebuilt from the table. Files are replaced atomically, so readers that still have the old file mapped
+keep a consistent view. Records in archive files are not included.
+"""
+import json
+import mmap
+import os
+import struct
+import sys
+import zlib
+from array import array
+from bisect import bisect_left
+
+MAGIC = b"MOTASNAP"
+FORMAT_VERSION = 1
+
+# magic, format version, reserved, rows, change log seq, archived_years checksum; padded to 64 bytes
+HEADER = struct.Struct("<8sIIQqQ")
+HEADER_SIZE = 64
+
+# Column name, array typecode; in file order. Wider columns first keeps every column aligned.
+COLUMNS = (('ids', 'q'), ('amounts', 'q'), ('dates', 'i'), ('client_ids', 'i'))
+
+# Rows fetched per batch when building from the table
+FETCH_BATCH = 65536
+
+if sys.byteorder != 'little':
+    raise ImportError("Snapshots are mapped as little-endian columns.")
+
+
+def to_cents(amount):
+    """Round an amount to integer cents like SQLite's round(amount * 100): halves away from zero."""
+    value = amount * 100
+    return int(value + 0.5) if value >= 0 else -int(-value + 0.5)
+
+
+def ledger_generation(conn):
+    """
+    Identify the current state of income_records.
+    :param conn: sqlite3.Connection.
+    :return: (change log seq, archived_years checksum).
+    """
+    seq = conn.execute("SELECT MAX(seq) FROM change_log").fetchone()[0] or 0
+    archived = conn.execute("SELECT group_concat(year || ':' || archived_at, ',') FROM "
+                            "(SELECT year, archived_at FROM archived_years ORDER BY year)").fetchone()[0]
+    return seq, zlib.crc32((archived or "").encode())
+
+
+def read_header(path):
+    """
+    Read a snapshot's header.
+    :param path: Snapshot file.
+    :return: dict with 'rows', 'seq' and 'archived', or None when the file is missing or not a snapshot.
+    """
+    try:
+        with open(path, "rb") as snapshot_file:
+            data = snapshot_file.read(HEADER_SIZE)
+            size = os.fstat(snapshot_file.fileno()).st_size
+    except OSError:
+        return None
+    if len(data) < HEADER_SIZE:
+        return None
+    magic, version, _, rows, seq, archived = HEADER.unpack_from(data)
+    if magic != MAGIC or version != FORMAT_VERSION or size != file_size(rows):
+        return None
+    return {'rows': rows, 'seq': seq, 'archived': archived}
+
+
+def file_size(rows):
+    return HEADER_SIZE + rows * sum(array(typecode).itemsize for _, typecode in COLUMNS)
+
+
+def _write(path, columns, generation):
+    rows = len(columns[0])
+    partial_path = path + ".part"
+    with open(partial_path, "wb") as out:
+        out.write(HEADER.pack(MAGIC, FORMAT_VERSION, 0, rows, *generation).ljust(HEADER_SIZE, b"\0"))
+        for column in columns:
+            column.tofile(out)
+    os.replace(partial_path, path)
+
+
+def date_ordinal_sql(expression):
+    """
+    SQL for the date.toordinal() of a date text expression, or 0 for text julianday() rejects.
+    Full builds and merged changes both use it, so they agree on dates Python would parse differently.
+    """
+    # 1721424.5 is julianday('0001-01-01') - 1, so midnight of each date maps to its ordinal
+    return f"COALESCE(CAST(julianday({expression}) - 1721424.5 AS integer), 0)"
+
+
+def _read_table(conn):
+    columns = tuple(array(typecode) for _, typecode in COLUMNS)
+    cursor = conn.execute(f'''SELECT id, CAST(round(amount * 100) AS integer), {date_ordinal_sql('date')}, client_id
+                              FROM income_records ORDER BY id''')
+    for rows in iter(lambda: cursor.fetchmany(FETCH_BATCH), []):
+        for column, values in zip(columns, zip(*rows)):
+            column.extend(values)
+    return columns
+
+
+def write_snapshot(db_manager, path):
+    """
+    Build a snapshot of income_records from the table.
+    Args:
+        db_manager (DatabaseManager): Instance to interact with the database.
+        path: Snapshot file to write; replaced atomically.
+
+    Returns:
+        dict: 'rows', 'mode' ('full') and 'changes' (0).
+    """
+    conn = db_manager.conn
+    # One read transaction, so the generation matches the rows
+    with conn:
+        conn.execute("BEGIN")
+        generation = ledger_generation(conn)
+        columns = _read_table(conn)
+    _write(path, columns, generation)
+    return {'rows': len(columns[0]), 'mode': 'full', 'changes': 0}
+
+
+def _logged_changes(conn, since):
+    """Latest state of each income record changed after seq 'since': id -> (amount, date, client) or None."""
+    changes = {}
+    sql = f'''SELECT row_id, data, {date_ordinal_sql("json_extract(data, '$.date')")} FROM change_log
+              WHERE seq > ? AND table_name = 'income_records' ORDER BY seq'''
+    for row_id, data, ordinal in conn.execute(sql, (since,)):
+        if data is None:
+            changes[row_id] = None
+        else:
+            record = json.loads(data)
+            changes[row_id] = (to_cents(record['amount']), ordinal, record['client_id'])
+    return changes
+
+
+def _merge(old_columns, changes):
+    """Copy old_columns with changes applied, copying the unchanged runs between changed ids in bulk."""
+    ids = old_columns[0]
+    columns = tuple(array(typecode) for _, typecode in COLUMNS)
+    start = 0
+    for row_id in sorted(changes):
+        position = bisect_left(ids, row_id, start)
+        for column, old in zip(columns, old_columns):
+            column.frombytes(old[start:position].cast('B'))
+        start = position + 1 if position < len(ids) and ids[position] == row_id else position
+        values = changes[row_id]
+        if values is not None:
+            for column, value in zip(columns, (row_id,) + values):
+                column.append(value)
+    for column, old in zip(columns, old_columns):
+        column.frombytes(old[start:].cast('B'))
+    return columns
+
+
+def update_snapshot(db_manager, path):
+    """
+    Bring a snapshot up to date with the database, as cheaply as its header allows (see the module
+    docstring).
+    Args:
+        db_manager (DatabaseManager): Instance to interact with the database.
+        path: Snapshot file; created if missing.
+
+    Returns:
+        dict: 'rows'; 'mode', one of 'unchanged', 'incremental' or 'full'; and 'changes', the records
+        merged in.
+    """
+    header = read_header(path)
+    conn = db_manager.conn
+    with conn:
+        conn.execute("BEGIN")
+        generation = ledger_generation(conn)
+        if header is not None and (header['seq'], header['archived']) == generation:
+            return {'rows': header['rows'], 'mode': 'unchanged', 'changes': 0}
+        incremental = header is not None and header['archived'] == generation[1] and header['seq'] < generation[0]
+        if incremental:
+            changes = _logged_changes(conn, header['seq'])
+    if not incremental:
+        return write_snapshot(db_manager, path)
+
+    with Snapshot(path) as snapshot:
+        columns = _merge(snapshot.columns, changes)
+    _write(path, columns, generation)
+    return {'rows': len(columns[0]), 'mode': 'incremental', 'changes': len(changes)}
+
+
+class Snapshot:
+    """
+    A snapshot file mapped read-only, with one memoryview per column (ids, amounts, dates, client_ids).
+    Views taken from the columns must be released before close().
+    """
+    def __init__(self, path):
+        """
+        Args:
+            path: Snapshot file written by write_snapshot() or update_snapshot().
+
+        Raises:
+            ValueError: The file is not a snapshot of this format.
+        """
+        header = read_header(path)
+        if header is None:
+            raise ValueError(f"{path} is not a MOTA snapshot")
+        self.path = path
+        self.rows = header['rows']
+        self.generation = (header['seq'], header['archived'])
+        with open(path, "rb") as snapshot_file:
+            self._map = mmap.mmap(snapshot_file.fileno(), 0, access=mmap.ACCESS_READ)
+        self._view = memoryview(self._map)
+        self.columns = []
+        offset = HEADER_SIZE
+        for name, typecode in COLUMNS:
+            size = self.rows * array(typecode).itemsize
+            column = self._view[offset:offset + size].cast(typecode)
+            setattr(self, name, column)
+            self.columns.append(column)
+            offset += size
+
+    def __len__(self):
+        return self.rows
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        for column in self.columns:
+            column.release()
+        self.columns = []
+        self._view.release()
+        self._map.close()
+
+
+def load_snapshot(db_manager, path):
+    """
+    Update the snapshot at path (see update_snapshot()) and map it.
+    Returns:
+        Snapshot
+    """
+    update_snapshot(db_manager, path)
+    return Snapshot(path)
@@ -0,0 +1,228 @@
+"""
+Multi-device sync through the change log.
+
+Triggers append every change to clients and income_records to change_log (see migration 8), so syncing
+two databases only reads and writes the changes made since the last sync instead of copying the file.
+export_changes() returns the changes after a given seq as a JSON-serializable delta, apply_changes()
+applies a delta, and sync_databases() does both ways between two database files, remembering how far
+each side has sent.
+
+Each row keeps the change with the latest time, using the origin id to break ties (last writer wins),
+so both databases settle on the same rows. A remote change is listed as a conflict when the sender had
+not seen the row's latest change here, or when it loses. Rows are matched by id, so rows added on two
+devices before they first sync can meet as conflicts.
+"""
+import json
+import time
+
+from events import CLIENT_COLUMNS, INCOME_RECORD_COLUMNS, ChangeEvent
+from models import content_hash
+
+# Synced table: (entity name used by change events, columns)
+TABLES = {
+    'clients': ('client', CLIENT_COLUMNS),
+    'income_records': ('income_record', INCOME_RECORD_COLUMNS),
+}
+
+DELTA_FIELDS = ('origin', 'origin_seq', 'table_name', 'row_id', 'action', 'changed_at', 'data')
+
+
+def get_origin_id(conn):
+    """
+    Read this database's origin id, which tags the changes made in it.
+    :param conn: sqlite3.Connection.
+    :return: 16 hex characters.
+    """
+    return conn.execute("SELECT value FROM settings WHERE key = 'origin_id'").fetchone()[0]
+
+
+def new_origin_id(conn):
+    """
+    Give the database a fresh origin id. Needed once on a file copied from another synced database, since
+    both would otherwise tag their new changes with the same id.
+    :param conn: sqlite3.Connection.
+    :return: The new origin id.
+    """
+    with conn:
+        conn.execute("UPDATE settings SET value = lower(hex(randomblob(8))) WHERE key = 'origin_id'")
+    return get_origin_id(conn)
+
+
+def get_versions(conn):
+    """
+    Highest change seen from each origin.
+    :param conn: sqlite3.Connection.
+    :return: dict of origin id to origin_seq.
+    """
+    return dict(conn.execute("SELECT origin, seq FROM sync_versions").fetchall())
+
+
+def export_changes(db_manager, since=0, exclude_origin=None):
+    """
+    Collect the changes logged after a seq.
+    Args:
+        db_manager (DatabaseManager): Instance to interact with the database.
+        since: Local seq already exported; 0 exports the whole log.
+        exclude_origin: Leave out changes that came from this origin (the receiver's own).
+
+    Returns:
+        dict: 'origin', 'last_seq' (pass as 'since' next time), 'versions' (see get_versions()) and
+        'changes', a list of dicts with DELTA_FIELDS in seq order.
+    """
+    conn = db_manager.conn
+    sql = f'''SELECT {', '.join(DELTA_FIELDS)} FROM change_log
+              WHERE seq > ? {"AND origin != ?" if exclude_origin is not None else ""}
+              ORDER BY seq'''
+    params = (since, exclude_origin) if exclude_origin is not None else (since,)
+    # One read transaction, so the versions match the changes
+    with conn:
+        conn.execute("BEGIN")
+        changes = [dict(zip(DELTA_FIELDS, row)) for row in conn.execute(sql, params)]
+        last_seq = conn.execute("SELECT MAX(seq) FROM change_log").fetchone()[0] or 0
+        versions = get_versions(conn)
+        origin = get_origin_id(conn)
+    for change in changes:
+        if change['data'] is not None:
+            change['data'] = json.loads(change['data'])
+    return {'origin': origin, 'last_seq': max(last_seq, since), 'versions': versions, 'changes': changes}
+
+
+def apply_changes(db_manager, delta):
+    """
+    Apply a delta from export_changes() in one transaction.
+    Changes from this database or already seen are skipped. Each remaining change is applied unless the
+    row's latest change here is newer (see the module docstring), and is logged under its own origin
+    so it can be passed on to other databases. Applied changes are published on db_manager.events.
+    Args:
+        db_manager (DatabaseManager): Instance to interact with the database.
+        delta (dict): Output of export_changes() on another database.
+
+    Returns:
+        dict: 'applied', 'unchanged' (already identical here), 'skipped' (already seen) counts and
+        'conflicts', a list of dicts with 'table_name', 'row_id', 'winner' ('local' or 'remote') and the
+        local and remote 'changed_at', 'origin' and row data.
+    """
+    conn = db_manager.conn
+    remote_versions = delta.get('versions', {})
+    report = {'applied': 0, 'unchanged': 0, 'skipped': 0, 'conflicts': []}
+    events = []
+    started = time.perf_counter()
+    with conn:
+        conn.execute("BEGIN IMMEDIATE")
+        local_origin = get_origin_id(conn)
+        if delta['origin'] == local_origin:
+            raise ValueError("Both databases have the same origin id; give the copy a new one with "
+                             "new_origin_id().")
+        versions = get_versions(conn)
+        # Keeps the change log triggers quiet; apply logs each change under its remote origin instead
+        conn.execute("INSERT INTO settings(key, value) VALUES ('sync_applying', ?)", (delta['origin'],))
+        for change in delta['changes']:
+            origin = change['origin']
+            if origin == local_origin or change['origin_seq'] <= versions.get(origin, 0):
+                report['skipped'] += 1
+                continue
+            versions[origin] = change['origin_seq']
+            table_name = change['table_name']
+            entity, columns = TABLES[table_name]
+            row = conn.execute(f"SELECT {', '.join(columns)} FROM {table_name} WHERE id = ?",
+                               (change['row_id'],)).fetchone()
+            current = dict(zip(columns, row)) if row is not None else None
+            incoming = change['data'] if change['action'] == 'upsert' else None
+
+            if current == incoming:
+                report['unchanged'] += 1
+                _advance_version(conn, change)
+                continue
+
+            latest = conn.execute('''SELECT origin, origin_seq, changed_at FROM change_log
+                                     WHERE table_name = ? AND row_id = ?
+                                     ORDER BY seq DESC LIMIT 1''', (table_name, change['row_id'])).fetchone()
+            # Last writer wins against the row's latest change from another device. It is a conflict when the
+            # sender had not seen that change (both changed the row concurrently) or when the change loses.
+            if latest is not None and latest[0] != origin:
+                remote_wins = (change['changed_at'], origin) > (latest[2], latest[0])
+                if not remote_wins or latest[1] > remote_versions.get(latest[0], 0):
+                    report['conflicts'].append({
+                        'table_name': table_name, 'row_id': change['row_id'],
+                        'winner': 'remote' if remote_wins else 'local',
+                        'local': {'origin': latest[0], 'changed_at': latest[2], 'data': current},
+                        'remote': {'origin': origin, 'changed_at': change['changed_at'], 'data': incoming},
+                    })
+                if not remote_wins:
+                    _advance_version(conn, change)
+                    continue
+
+            _write_row(conn, table_name, columns, change['row_id'], incoming)
+            conn.execute('''INSERT INTO change_log(origin, origin_seq, table_name, row_id, action, changed_at, data)
+                            VALUES (?, ?, ?, ?, ?, ?, ?)''',
+                         (origin, change['origin_seq'], table_name, change['row_id'], change['action'],
+                          change['changed_at'], json.dumps(incoming) if incoming is not None else None))
+            action = 'delete' if incoming is None else 'insert' if current is None else 'update'
+            events.append(ChangeEvent(entity, action, change['row_id'], current, incoming))
+            report['applied'] += 1
+        conn.execute("DELETE FROM settings WHERE key = 'sync_applying'")
+    db_manager.record_transaction(started, report['applied'])
+    for event in events:
+        db_manager.events.publish(event)
+    return report
+
+
+def _advance_version(conn, change):
+    # Changes that are not logged still count as seen
+    conn.execute('''INSERT INTO sync_versions(origin, seq) VALUES (?, ?)
+                    ON CONFLICT(origin) DO UPDATE SET seq = max(seq, excluded.seq)''',
+                 (change['origin'], change['origin_seq']))
+
+
+def _write_row(conn, table_name, columns, row_id, data):
+    if data is None:
+        conn.execute(f"DELETE FROM {table_name} WHERE id = ?", (row_id,))
+        return
+    values = [data[column] for column in columns]
+    if table_name == 'income_records':
+        columns = columns + ('content_hash',)
+        values.append(content_hash(data['client_id'], data['amount'], data['date'], data['description']))
+    assignments = ', '.join(f"{column} = excluded.{column}" for column in columns[1:])
+    conn.execute(f'''INSERT INTO {table_name}({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})
+                     ON CONFLICT(id) DO UPDATE SET {assignments}''', values)
+
+
+def _sent_seq(conn, peer):
+    row = conn.execute("SELECT sent_seq FROM sync_peers WHERE origin = ?", (peer,)).fetchone()
+    return row[0] if row is not None else 0
+
+
+def _record_sent(conn, peer, seq):
+    with conn:
+        conn.execute('''INSERT INTO sync_peers(origin, sent_seq) VALUES (?, ?)
+                        ON CONFLICT(origin) DO UPDATE SET sent_seq = excluded.sent_seq''', (peer, seq))
+
+
+def sync_databases(db_manager, other_path):
+    """
+    Exchange changes with another database file, both ways.
+    Only changes logged since the previous sync between the two are read and written.
+    Args:
+        db_manager (DatabaseManager): Instance to interact with this database.
+        other_path: Path of the other database file; it is migrated first if needed.
+
+    Returns:
+        dict: 'pulled' and 'pushed', the apply_changes() reports of each direction.
+    """
+    from database import DatabaseManager
+
+    other = DatabaseManager(other_path, verbose=False)
+    try:
+        local_origin = get_origin_id(db_manager.conn)
+        remote_origin = get_origin_id(other.conn)
+
+        delta = export_changes(other, _sent_seq(other.conn, local_origin), exclude_origin=local_origin)
+        pulled = apply_changes(db_manager, delta)
+        _record_sent(other.conn, local_origin, delta['last_seq'])
+
+        delta = export_changes(db_manager, _sent_seq(db_manager.conn, remote_origin), exclude_origin=remote_origin)
+        pushed = apply_changes(other, delta)
+        _record_sent(db_manager.conn, remote_origin, delta['last_seq'])
+    finally:
+        other.close_connection()
+    return {'pulled': pulled, 'pushed': pushed}
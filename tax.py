@@ -0,0 +1,168 @@
+"""
+Year-to-date tax estimates for planning quarterly estimated payments.
+
+Year-to-date income is read from income_month_totals, which triggers keep current on every write to
+income_records, so an estimate costs at most twelve primary key lookups however many records the
+year holds. Brackets and the payment schedule are configurable; nothing here is tax advice.
+"""
+import json
+from calendar import isleap
+from datetime import date
+
+# (last month of the period, due month, due day, years after the tax year the payment is due)
+DEFAULT_PAYMENT_SCHEDULE = (
+    (3, 4, 15, 0),
+    (5, 6, 15, 0),
+    (8, 9, 15, 0),
+    (12, 1, 15, 1),
+)
+
+
+class TaxEstimator:
+    """Progressive tax on projected yearly income, split into estimated payments."""
+
+    def __init__(self, brackets, deduction=0.0, payment_schedule=DEFAULT_PAYMENT_SCHEDULE):
+        """
+        Args:
+            brackets (sequence of (threshold, rate)): Income above each threshold, up to the next one, is
+                taxed at rate. The first threshold is usually 0.
+            deduction (float): Amount subtracted from income before the brackets apply.
+            payment_schedule (sequence of tuples): (period end month, due month, due day, due year offset)
+                per estimated payment, in order; see DEFAULT_PAYMENT_SCHEDULE.
+        """
+        if not brackets:
+            raise ValueError("At least one tax bracket is required.")
+        self.brackets = sorted((float(threshold), float(rate)) for threshold, rate in brackets)
+        if any(not 0 <= rate <= 1 for _, rate in self.brackets):
+            raise ValueError("Tax rates must be between 0 and 1.")
+        self.deduction = float(deduction)
+        self.payment_schedule = tuple(payment_schedule)
+
+    def tax_on(self, income):
+        """
+        Tax due on a year's income.
+        :param income: Gross income for the year.
+        :return: Float tax amount.
+        """
+        taxable = max(0.0, income - self.deduction)
+        tax = 0.0
+        for position, (threshold, rate) in enumerate(self.brackets):
+            if taxable <= threshold:
+                break
+            upper = self.brackets[position + 1][0] if position + 1 < len(self.brackets) else taxable
+            tax += (min(taxable, upper) - threshold) * rate
+        return tax
+
+    @staticmethod
+    def get_monthly_income(year, db_manager):
+        """
+        Retrieve the running income totals of a year.
+        Args:
+            year: Integer representing the year.
+            db_manager (DatabaseManager): Instance to interact with the database.
+        Return:
+            A list of 12 totals, January first.
+        """
+        cursor = db_manager.execute_query("SELECT month, total FROM income_month_totals WHERE year = ?", (int(year),))
+        totals = [0.0] * 12
+        for month, total in cursor.fetchall():
+            if 1 <= month <= 12:
+                totals[month - 1] = round(total, 2)
+        return totals
+
+    def estimate(self, year, db_manager, today=None):
+        """
+        Estimate the year's tax liability from the income so far.
+        The year-to-date income is projected over the whole year in proportion to the days elapsed. Each
+        estimated payment covers the tax on its period's income annualized, less what earlier payments
+        already covered (the annualized installment method); periods not yet over use the projection.
+        Args:
+            year: Integer representing the tax year.
+            db_manager (DatabaseManager): Instance to interact with the database.
+            today (datetime.date, optional): Date the estimate is made on. Defaults to today.
+        Return:
+            A dictionary of year-to-date income, projected income and tax, and the payment schedule.
+        """
+        year = int(year)
+        today = today or date.today()
+        monthly = self.get_monthly_income(year, db_manager)
+        ytd_income = sum(monthly)
+
+        if today.year > year:
+            elapsed = 1.0
+        elif today.year < year:
+            elapsed = 0.0
+        else:
+            elapsed = today.timetuple().tm_yday / (366 if isleap(year) else 365)
+        projected_income = ytd_income / elapsed if elapsed else 0.0
+        projected_tax = self.tax_on(projected_income)
+
+        payments = []
+        covered = 0.0
+        periods = len(self.payment_schedule)
+        for number, (end_month, due_month, due_day, due_offset) in enumerate(self.payment_schedule, start=1):
+            closed = today.year > year or (today.year == year and today.month > end_month)
+            if closed:
+                annualized = sum(monthly[:end_month]) * 12 / end_month
+                required = self.tax_on(annualized) * number / periods
+            else:
+                required = projected_tax * number / periods
+            amount = max(0.0, required - covered)
+            covered += amount
+            payments.append({
+                'period_end_month': end_month,
+                'due_date': date(year + due_offset, due_month, due_day).isoformat(),
+                'income_to_date': round(sum(monthly[:end_month]), 2),
+                'amount': round(amount, 2),
+                'estimated': not closed,
+            })
+
+        return {
+            'year': year,
+            'ytd_income': round(ytd_income, 2),
+            'projected_income': round(projected_income, 2),
+            'projected_tax': round(projected_tax, 2),
+            'effective_rate': round(projected_tax / projected_income, 4) if projected_income else 0.0,
+            'payments': payments,
+        }
+
+    def save(self, db_manager):
+        """
+        Store the brackets and deduction in the settings table.
+        Args:
+            db_manager (DatabaseManager): Instance to interact with the database.
+        """
+        value = json.dumps({'brackets': self.brackets, 'deduction': self.deduction,
+                            'payment_schedule': self.payment_schedule})
+        db_manager.execute_query("INSERT OR REPLACE INTO settings(key, value) VALUES ('tax', ?)", (value,))
+
+    @staticmethod
+    def load(db_manager):
+        """
+        Build a TaxEstimator from the stored settings.
+        Args:
+            db_manager (DatabaseManager): Instance to interact with the database.
+        Return:
+            A TaxEstimator, or None if no brackets are stored.
+        """
+        row = db_manager.execute_query("SELECT value FROM settings WHERE key = 'tax'").fetchone()
+        if row is None:
+            return None
+        config = json.loads(row[0])
+        return TaxEstimator(config['brackets'], config['deduction'],
+                            [tuple(period) for period in config['payment_schedule']])
+
+
+def parse_brackets(text):
+    """
+    Parse brackets written as 'threshold:rate' pairs separated by commas, e.g. '0:0.1,11000:0.12'.
+    :return: List of (threshold, rate) tuples.
+    """
+    brackets = []
+    for pair in text.split(","):
+        threshold, _, rate = pair.partition(":")
+        try:
+            brackets.append((float(threshold), float(rate)))
+        except ValueError:
+            raise ValueError(f"Invalid tax bracket: {pair.strip()!r}") from None
+    return brackets
@@ -0,0 +1,307 @@
+"""
+Multi-tenant mode: one isolated database file per tenant.
+
+TenantRegistry maps tenant ids to database files in one directory. TenantPool keeps the open
+DatabaseManagers in an LRU cache. At most max_open are open at a time and those idle for longer than
+idle_timeout are closed, so serving any number of tenants holds a bounded number of file descriptors.
+Model calls are routed with pool.run(tenant_id, func, *args), which also keeps per-tenant query stats.
+"""
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from datetime import datetime
+
+from database import DatabaseManager
+
+TENANT_ID_PATTERN = re.compile(r'[A-Za-z0-9][A-Za-z0-9_-]{0,63}')
+
+REGISTRY_FILE = "tenants.sqlite"
+
+
+class TenantRegistry:
+    """
+    Tenant ids and their database files, stored in '<root_dir>/tenants.sqlite'.
+    """
+    def __init__(self, root_dir):
+        """
+        Args:
+            root_dir: Directory holding the registry and the tenants' database files (created if missing).
+        """
+        self.root_dir = root_dir
+        os.makedirs(root_dir, exist_ok=True)
+        self._paths = {}
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(os.path.join(root_dir, REGISTRY_FILE), check_same_thread=False)
+        with self.conn:
+            self.conn.execute(''' CREATE TABLE IF NOT EXISTS tenants (
+                                    tenant_id text PRIMARY KEY,
+                                    file_name text NOT NULL,
+                                    created_at text NOT NULL
+                                ); ''')
+
+    def register(self, tenant_id):
+        """
+        Add a tenant, unless it exists. Its database file is created when it is first opened.
+        Args:
+            tenant_id: Letters, digits, '_' and '-', starting with a letter or digit; at most 64 characters.
+
+        Returns:
+            str: Path of the tenant's database file.
+        """
+        if not TENANT_ID_PATTERN.fullmatch(tenant_id):
+            raise ValueError(f"Invalid tenant id: {tenant_id!r}")
+        with self._lock, self.conn:
+            self.conn.execute("INSERT OR IGNORE INTO tenants(tenant_id, file_name, created_at) VALUES (?, ?, ?)",
+                              (tenant_id, f"{tenant_id}.sqlite", datetime.now().isoformat(timespec='seconds')))
+        return self.path(tenant_id)
+
+    def path(self, tenant_id):
+        """
+        Path of a registered tenant's database file.
+        Raises:
+            KeyError: The tenant is not registered.
+        """
+        path = self._paths.get(tenant_id)
+        if path is None:
+            with self._lock:
+                row = self.conn.execute("SELECT file_name FROM tenants WHERE tenant_id = ?", (tenant_id,)).fetchone()
+            if row is None:
+                raise KeyError(f"Unknown tenant: {tenant_id}")
+            path = self._paths[tenant_id] = os.path.join(self.root_dir, row[0])
+        return path
+
+    def tenants(self):
+        """List the registered tenant ids in order."""
+        with self._lock:
+            return [row[0] for row in self.conn.execute("SELECT tenant_id FROM tenants ORDER BY tenant_id")]
+
+    def close(self):
+        self.conn.close()
+
+
+class TenantStats:
+    """Per-tenant counters kept by TenantPool."""
+
+    def __init__(self):
+        self.calls = 0
+        self.statements = 0
+        self.errors = 0
+        self.total_time = 0.0
+        self.max_time = 0.0
+        self.opens = 0
+        self.evictions = 0
+
+    def as_dict(self):
+        return {
+            'calls': self.calls,
+            'statements': self.statements,
+            'errors': self.errors,
+            'total_time': self.total_time,
+            'avg_time': self.total_time / self.calls if self.calls else 0.0,
+            'max_time': self.max_time,
+            'opens': self.opens,
+            'evictions': self.evictions,
+        }
+
+
+class _Handle:
+    """An open DatabaseManager with its lock and use bookkeeping."""
+
+    def __init__(self):
+        self.db_manager = None  # set once opened; 'ready' is set then, or when opening failed
+        self.ready = threading.Event()
+        self.error = None
+        self.lock = threading.Lock()  # one caller at a time per connection
+        self.in_use = 0
+        self.last_used = time.monotonic()
+
+
+class TenantPool:
+    """
+    LRU cache of open DatabaseManagers, one per tenant.
+    Opening a tenant beyond max_open first closes the least recently used handle that is not in use, or
+    waits for one to be released when all are.
+    Handles idle for longer than idle_timeout seconds are closed on the next open or by evict_idle().
+    Calls for one tenant are serialized on its connection; different tenants run in parallel. Opening a
+    database file (which may run its migrations) happens outside the pool's lock, so a slow open only
+    delays the callers of that tenant.
+    """
+    def __init__(self, registry, max_open=64, idle_timeout=300.0):
+        """
+        Args:
+            registry (TenantRegistry): Where tenants' database files are.
+            max_open: Most database files open at once. Each holds one file descriptor, plus the files
+                of any attached archives.
+            idle_timeout: Seconds after which an unused handle is closed; None keeps handles until evicted.
+        """
+        if max_open < 1:
+            raise ValueError("max_open must be at least 1.")
+        self.registry = registry
+        self.max_open = max_open
+        self.idle_timeout = idle_timeout
+        self._handles = OrderedDict()  # tenant id -> _Handle, least recently used first
+        self._stats = {}
+        self._lock = threading.Lock()
+        self._released = threading.Condition(self._lock)
+        self._closed = False
+
+    def _stats_for(self, tenant_id):
+        stats = self._stats.get(tenant_id)
+        if stats is None:
+            stats = self._stats[tenant_id] = TenantStats()
+        return stats
+
+    def _reserve(self, tenant_id):
+        """
+        Return (handle, opening) with the handle marked in use. Called with self._lock held; waits for a
+        handle to be released when all max_open are in use. When opening is True the handle is a
+        placeholder the caller must open with _open() after releasing the lock.
+        """
+        while True:
+            handle = self._handles.get(tenant_id)
+            if handle is not None:
+                self._handles.move_to_end(tenant_id)
+                handle.in_use += 1
+                return handle, False
+            self._evict_idle(time.monotonic())
+            if len(self._handles) < self.max_open:
+                break
+            victim = next((key for key, candidate in self._handles.items() if not candidate.in_use), None)
+            if victim is not None:
+                self._close(victim)
+                break
+            self._released.wait()
+
+        handle = self._handles[tenant_id] = _Handle()
+        handle.in_use += 1
+        return handle, True
+
+    def _open(self, tenant_id, handle, path):
+        """Open the tenant's database into a placeholder from _reserve(), without holding self._lock."""
+        try:
+            # check_same_thread=False: calls for a tenant may come from any thread, one at a time (handle.lock)
+            db_manager = DatabaseManager(path, verbose=False, check_same_thread=False)
+            if db_manager.conn is None:
+                raise sqlite3.OperationalError(f"Cannot open the database of tenant {tenant_id}")
+        except Exception as e:
+            with self._lock:
+                if self._handles.get(tenant_id) is handle:
+                    del self._handles[tenant_id]
+                handle.error = e
+                handle.ready.set()
+                self._released.notify_all()
+            raise
+
+        with self._lock:
+            if self._handles.get(tenant_id) is not handle:
+                # The pool was closed while opening
+                db_manager.close_connection()
+                handle.error = RuntimeError("TenantPool is closed.")
+                handle.ready.set()
+                raise handle.error
+            stats = self._stats_for(tenant_id)
+            stats.opens += 1
+
+            def count_statement(statement):
+                stats.statements += 1
+
+            db_manager.conn.set_trace_callback(count_statement)
+            handle.db_manager = db_manager
+            handle.ready.set()
+
+    def _close(self, tenant_id, evicted=True):
+        handle = self._handles.pop(tenant_id)
+        if handle.db_manager is not None:  # a handle still opening is closed by its opener
+            handle.db_manager.close_connection()
+        if evicted:
+            self._stats_for(tenant_id).evictions += 1
+
+    def _evict_idle(self, now):
+        if self.idle_timeout is None:
+            return
+        # Least recently used first, so the scan stops at the first handle that is still fresh
+        for tenant_id, handle in list(self._handles.items()):
+            if now - handle.last_used < self.idle_timeout:
+                break
+            if not handle.in_use:
+                self._close(tenant_id)
+
+    @contextmanager
+    def session(self, tenant_id):
+        """
+        Use a tenant's DatabaseManager for several calls; it is not evicted until the block ends.
+        Opening other tenants inside the block can wait forever if every handle is held the same way.
+        Yields:
+            DatabaseManager
+        """
+        path = self.registry.path(tenant_id)
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("TenantPool is closed.")
+            handle, opening = self._reserve(tenant_id)
+        try:
+            if opening:
+                self._open(tenant_id, handle, path)
+            else:
+                handle.ready.wait()
+                if handle.error is not None:
+                    raise sqlite3.OperationalError(f"Cannot open the database of tenant {tenant_id}: "
+                                                   f"{handle.error}")
+            with handle.lock:
+                yield handle.db_manager
+        finally:
+            with self._lock:
+                handle.in_use -= 1
+                handle.last_used = time.monotonic()
+                self._released.notify_all()
+
+    def run(self, tenant_id, func, *args):
+        """
+        Call func(*args, db_manager) with the tenant's DatabaseManager, e.g.
+        pool.run("alice", IncomeRecord.get_monthly_totals, 2024), and record it in the tenant's stats.
+        Returns:
+            What func returns.
+        """
+        with self.session(tenant_id) as db_manager:
+            stats = self._stats[tenant_id]
+            started = time.perf_counter()
+            try:
+                return func(*args, db_manager)
+            except Exception:
+                stats.errors += 1
+                raise
+            finally:
+                elapsed = time.perf_counter() - started
+                stats.calls += 1
+                stats.total_time += elapsed
+                stats.max_time = max(stats.max_time, elapsed)
+
+    def evict_idle(self):
+        """Close the handles idle for longer than idle_timeout now."""
+        with self._lock:
+            self._evict_idle(time.monotonic())
+
+    def open_count(self):
+        return len(self._handles)
+
+    def stats(self, tenant_id=None):
+        """
+        Query stats as dicts (see TenantStats.as_dict()).
+        Returns:
+            One tenant's stats, or a dict of tenant id to stats for every tenant used so far.
+        """
+        with self._lock:
+            if tenant_id is not None:
+                return self._stats_for(tenant_id).as_dict()
+            return {key: stats.as_dict() for key, stats in self._stats.items()}
+
+    def close(self):
+        """Close every open handle."""
+        with self._lock:
+            self._closed = True
+            for tenant_id in list(self._handles):
+                self._close(tenant_id, evicted=False)
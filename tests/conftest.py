@@ -0,0 +1,10 @@
+import pytest
+from database import DatabaseManager
+
+
+@pytest.fixture
+def db_path(tmpdir):
+    """Fixture providing the path of a database file with the application's tables"""
+    path = str(tmpdir.join("mota.db"))
+    DatabaseManager(path, verbose=False).close_connection()
+    return path
@@ -0,0 +1,72 @@
+import asyncio
+from contextlib import aclosing
+
+import pytest
+from async_database import AsyncDatabaseManager
+from database import DatabaseManager
+from models import Client, IncomeRecord
+
+
+@pytest.fixture
+def populated_db_path(db_path):
+    """Fixture providing the path of a database file with a few records"""
+    db_manager = DatabaseManager(db_path, verbose=False)
+    Client(name="Async Client", email="async@example.com").add_client(db_manager)
+    for day in range(1, 21):
+        IncomeRecord(client_id=1, amount=10, date=f"2024-03-{day:02d}").add_record(db_manager)
+    db_manager.close_connection()
+    return db_path
+
+
+def test_model_facade(populated_db_path):
+    async def main():
+        async with AsyncDatabaseManager(populated_db_path, max_workers=2) as adb:
+            totals = await asyncio.gather(*(adb.get_monthly_totals(2024) for _ in range(10)))
+            new_id = await adb.add_record(IncomeRecord(client_id=1, amount=5, date="2024-04-01"))
+            clients = await adb.get_all_clients()
+            daily = await adb.get_daily_records(2024, 4)
+            return totals, new_id, clients, daily
+
+    totals, new_id, clients, daily = asyncio.run(main())
+    assert all(total == {"03": 200.0} for total in totals)
+    assert new_id == 21
+    assert clients[0][1] == "Async Client"
+    assert daily == {"2024-04-01": [(21, 1, 5.0, "", "Async Client")]}
+
+
+def test_stream_in_batches(populated_db_path):
+    async def main():
+        async with AsyncDatabaseManager(populated_db_path) as adb:
+            return [row async for row in adb.stream("SELECT id FROM income_records ORDER BY id", batch_size=3)]
+
+    assert asyncio.run(main()) == [(i,) for i in range(1, 21)]
+
+
+def test_stream_closed_early_and_cancelled(populated_db_path):
+    async def main():
+        async with AsyncDatabaseManager(populated_db_path, max_workers=1) as adb:
+            async with aclosing(adb.stream("SELECT id FROM income_records", batch_size=2)) as rows:
+                async for row in rows:
+                    break
+
+            task = asyncio.ensure_future(adb.get_monthly_totals(2024))
+            task.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await task
+            # The pool stays usable after an early exit and a cancellation
+            return await adb.get_monthly_totals(2024)
+
+    assert asyncio.run(main()) == {"03": 200.0}
+
+
+def test_worker_caches_see_writes_from_other_workers(populated_db_path):
+    async def main():
+        async with AsyncDatabaseManager(populated_db_path, max_workers=4) as adb:
+            before = await asyncio.gather(*(adb.get_active_years() for _ in range(40)))
+            await adb.add_record(IncomeRecord(client_id=1, amount=5, date="2021-06-01"))
+            after = await asyncio.gather(*(adb.get_active_years() for _ in range(40)))
+            return before, after
+
+    before, after = asyncio.run(main())
+    assert all(years == [2024] for years in before)
+    assert all(years == [2021, 2024] for years in after)
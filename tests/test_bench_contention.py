@@ -0,0 +1,30 @@
+import pytest
+from benchmarks import bench_contention
+
+
+@pytest.fixture
+def ledger(tmpdir):
+    path = str(tmpdir.join("contention.db"))
+    bench_contention.make_ledger(path, rows=200)
+    return path
+
+
+@pytest.mark.parametrize("processes", [False, True])
+def test_load_smoke(ledger, processes):
+    summary = bench_contention.load(ledger, readers=1, writers=1, seconds=0.3, processes=processes,
+                                    journal_mode='wal')
+    assert set(summary) == {'reader', 'writer'}
+    for stats in summary.values():
+        assert stats['workers'] == 1 and stats['ops'] > 0
+        assert stats['p50_ms'] <= stats['p95_ms'] <= stats['p99_ms'] <= stats['max_ms']
+
+
+@pytest.mark.parametrize("processes", [False, True])
+def test_failing_workers_are_reported(ledger, monkeypatch, processes):
+    def failing_worker(*job):
+        raise ValueError("worker broke")
+
+    # Forked worker processes inherit the patch
+    monkeypatch.setattr(bench_contention, "worker", failing_worker)
+    with pytest.raises(RuntimeError, match="2 of 2 workers failed(.|\\n)*worker broke"):
+        bench_contention.load(ledger, readers=1, writers=1, seconds=0.3, processes=processes)
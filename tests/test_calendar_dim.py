@@ -0,0 +1,55 @@
+from datetime import date
+
+import pytest
+from calendar_dim import ensure_calendar, fiscal_period, fiscal_year_bounds, set_fiscal_start_month
+from database import DatabaseManager
+from models import IncomeRecord
+
+
+@pytest.fixture
+def db_manager(db_path):
+    """Fixture providing a DatabaseManager with records spread over 2023 and 2024"""
+    db_manager = DatabaseManager(db_path, verbose=False)
+    for amount, day in [(100.0, "2023-03-31"), (50.0, "2023-04-01"), (20.0, "2023-12-31"),
+                        (10.0, "2024-01-01"), (5.0, "2024-04-06"), (1.0, "2024-06-30")]:
+        IncomeRecord(client_id=1, amount=amount, date=day).add_record(db_manager)
+    yield db_manager
+    db_manager.close_connection()
+
+
+def test_calendar_rows_match_datetime(db_manager):
+    assert ensure_calendar(db_manager.conn, 2024, 2024) == 366
+    assert ensure_calendar(db_manager.conn, 2024, 2024) == 0
+    assert ensure_calendar(db_manager.conn, 2022, 2022) == 365 * 2  # 2023 fills the gap
+
+    for day in (date(2022, 1, 1), date(2023, 1, 2), date(2024, 12, 30), date(2024, 2, 29)):
+        row = db_manager.conn.execute("SELECT quarter, iso_year, iso_week, weekday FROM calendar_dim WHERE date = ?",
+                                      (day.isoformat(),)).fetchone()
+        assert row == ((day.month - 1) // 3 + 1, *day.isocalendar())
+
+
+def test_quarterly_weekly_and_weekday_totals(db_manager):
+    assert IncomeRecord.get_quarterly_totals(2023, db_manager) == {1: 100.0, 2: 50.0, 4: 20.0}
+    assert IncomeRecord.get_weekly_totals(2024, db_manager) == {(2024, 1): 10.0, (2024, 14): 5.0, (2024, 26): 1.0}
+    assert IncomeRecord.get_weekly_totals(2023, db_manager)[(2023, 52)] == 20.0
+    assert IncomeRecord.get_weekday_totals(2024, db_manager) == {1: 10.0, 6: 5.0, 7: 1.0}
+
+
+def test_fiscal_year_follows_start_month(db_manager):
+    assert IncomeRecord.get_fiscal_quarter_totals(2023, db_manager) == {1: 100.0, 2: 50.0, 4: 20.0}
+
+    set_fiscal_start_month(db_manager.conn, 4)
+    assert IncomeRecord.get_fiscal_quarter_totals(2023, db_manager) == {4: 100.0}
+    assert IncomeRecord.get_fiscal_quarter_totals(2024, db_manager) == {1: 50.0, 3: 20.0, 4: 10.0}
+    assert IncomeRecord.get_fiscal_quarter_totals(2025, db_manager) == {1: 6.0}
+
+    with pytest.raises(ValueError):
+        set_fiscal_start_month(db_manager.conn, 13)
+
+
+def test_fiscal_period_and_bounds():
+    assert fiscal_period(2024, 3, 4) == (2024, 4)
+    assert fiscal_period(2024, 4, 4) == (2025, 1)
+    assert fiscal_period(2024, 12, 1) == (2024, 4)
+    assert fiscal_year_bounds(2025, 4) == ("2024-04-01", "2025-04-01")
+    assert fiscal_year_bounds(2025, 1) == ("2025-01-01", "2026-01-01")
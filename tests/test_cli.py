@@ -0,0 +1,202 @@
+import json
+import subprocess
+import sys
+
+import pytest
+import cli
+
+
+def run(capsys, db_path, *args):
+    exit_code = cli.main(["--db", db_path, *args])
+    out = capsys.readouterr().out
+    return exit_code, out
+
+
+@pytest.fixture
+def imported(tmpdir, db_path, capsys):
+    csv_file = tmpdir.join("records.csv")
+    csv_file.write("client_id,amount,date,description\n"
+                   "1,500,2024-01-10,Design\n"
+                   "1,250.5,2024-01-25,\n"
+                   "2,100,2024-02-05,Logo\n"
+                   "2,75,2023-12-31,Retainer\n")
+    exit_code, out = run(capsys, db_path, "import", str(csv_file))
+    assert exit_code == 0
+    assert json.loads(out) == {"imported": 4, "errors": [], "duplicates": []}
+
+
+def test_import_reports_invalid_rows(tmpdir, db_path, capsys):
+    csv_file = tmpdir.join("bad.csv")
+    csv_file.write("client_id,amount,date,description\n"
+                   ",10,2024-01-01,\n"
+                   "1,-5,2024-01-01,\n"
+                   "1,10,01/02/2024,\n"
+                   "x,10,2024-01-01,\n"
+                   "1,10,2024-01-01,ok\n")
+    exit_code, out = run(capsys, db_path, "import", str(csv_file))
+    assert exit_code == 1
+    assert json.loads(out) == {"imported": 1, "errors": [[2, "Client is required."], [3, "Invalid amount."],
+                                                         [4, "Invalid date format."], [5, "Invalid client id."]],
+                               "duplicates": []}
+
+
+def test_summary(imported, db_path, capsys):
+    _, out = run(capsys, db_path, "summary", "--year", "2024")
+    assert json.loads(out) == {"year": 2024, "months": {"01": 750.5, "02": 100.0}, "total": 850.5}
+
+    _, out = run(capsys, db_path, "summary")
+    assert json.loads(out) == {"years": {"2023": 75.0, "2024": 850.5}, "total": 925.5}
+
+
+def test_export_and_stats_include_archived_years(imported, db_path, capsys, tmpdir):
+    def export(*args):
+        output = str(tmpdir.join("export.csv"))
+        _, out = run(capsys, db_path, "export", "--output", output, *args)
+        return json.loads(out)["exported"], open(output).read()
+
+    def stats():
+        _, out = run(capsys, db_path, "stats")
+        stats = json.loads(out)
+        return {key: stats[key] for key in ("income_records", "total", "first_date", "last_date", "years")}
+
+    before = export(), export("--year", "2023"), stats()
+    assert before[2] == {"income_records": 4, "total": 925.5, "first_date": "2023-12-31",
+                         "last_date": "2024-02-05", "years": [2023, 2024]}
+    run(capsys, db_path, "archive", "--year", "2023")
+    assert (export(), export("--year", "2023"), stats()) == before
+
+    _, out = run(capsys, db_path, "summary", "--year", "2024", "--by", "quarter")
+    assert json.loads(out) == {"year": 2024, "quarters": {"Q1": 850.5}, "total": 850.5}
+
+
+def test_daily(imported, db_path, capsys):
+    _, out = run(capsys, db_path, "daily", "--year", "2024", "--month", "2")
+    days = json.loads(out)["days"]
+    assert list(days) == ["2024-02-05"]
+    assert days["2024-02-05"][0]["amount"] == 100.0
+    assert days["2024-02-05"][0]["description"] == "Logo"
+
+
+def test_export_csv_for_year(imported, tmpdir, db_path, capsys):
+    output = str(tmpdir.join("out.csv"))
+    _, out = run(capsys, db_path, "export", "--year", "2023", "--output", output)
+    assert json.loads(out) == {"exported": 1, "output": output}
+    with open(output) as f:
+        assert f.read().splitlines() == ["id,client_id,amount,date,description", "4,2,75.0,2023-12-31,Retainer"]
+
+
+def test_export_json_lines(imported, db_path, capsys):
+    _, out = run(capsys, db_path, "export", "--format", "json")
+    rows = [json.loads(line) for line in out.splitlines()]
+    assert [row["date"] for row in rows] == ["2023-12-31", "2024-01-10", "2024-01-25", "2024-02-05"]
+
+
+def test_stats_and_vacuum(imported, db_path, capsys):
+    _, out = run(capsys, db_path, "stats")
+    stats = json.loads(out)
+    assert stats["income_records"] == 4
+    assert stats["years"] == [2023, 2024]
+    assert (stats["first_date"], stats["last_date"]) == ("2023-12-31", "2024-02-05")
+
+    exit_code, out = run(capsys, db_path, "vacuum")
+    assert exit_code == 0
+    assert "reclaimed" in json.loads(out)
+
+
+def test_reimport_skips_duplicates(imported, tmpdir, db_path, capsys):
+    csv_file = tmpdir.join("overlap.csv")
+    csv_file.write("client_id,amount,date,description\n"
+                   "2,100.00,2024-02-05,  logo \n"
+                   "2,100,2024-02-06,Logo\n")
+    exit_code, out = run(capsys, db_path, "import", str(csv_file))
+    assert exit_code == 0
+    assert json.loads(out) == {"imported": 1, "errors": [], "duplicates": [[2, 3]]}
+
+    run(capsys, db_path, "import", "--allow-duplicates", str(csv_file))
+    _, out = run(capsys, db_path, "duplicates")
+    assert json.loads(out) == {"groups": [[3, 6], [5, 7]], "duplicates": 2}
+
+
+def test_clients(imported, db_path, capsys):
+    _, out = run(capsys, db_path, "clients")
+    clients = json.loads(out)["clients"]
+    assert clients["1"]["median"] == 375.25
+    assert clients["2"]["avg_days_between"] == 36.0
+
+
+def test_metrics(imported, db_path, capsys, tmpdir):
+    output = str(tmpdir.join("mota.prom"))
+    _, out = run(capsys, db_path, "metrics", "--output", output)
+    assert json.loads(out) == {"output": output}
+    assert "# TYPE mota_query_duration_seconds histogram" in open(output).read()
+
+
+def test_snapshot(imported, db_path, capsys, tmpdir):
+    output = str(tmpdir.join("records.snap"))
+    _, out = run(capsys, db_path, "snapshot", "--output", output)
+    assert json.loads(out)["mode"] == "full"
+    _, out = run(capsys, db_path, "snapshot", "--output", output)
+    assert json.loads(out)["mode"] == "unchanged"
+
+
+def test_maintain(imported, db_path, capsys):
+    _, out = run(capsys, db_path, "maintain", "--pages", "8")
+    report = json.loads(out)
+    assert report["optimize"] == "analyze" and report["vacuum"]["free_pages"] == 0 and report["skipped"] == []
+
+
+def test_schedules(db_path, capsys):
+    _, out = run(capsys, db_path, "schedule-add", "--client", "1", "--amount", "250", "--start", "2024-01-10",
+                 "--cadence", "quarterly", "--description", "Retainer")
+    assert json.loads(out) == {"id": 1}
+    _, out = run(capsys, db_path, "summary", "--year", "2024", "--scheduled")
+    assert json.loads(out)["months"] == {"01": 250.0, "04": 250.0, "07": 250.0, "10": 250.0}
+    _, out = run(capsys, db_path, "schedule-confirm", "--through", "2024-06-30")
+    assert json.loads(out) == {"through": "2024-06-30", "inserted": 2}
+    _, out = run(capsys, db_path, "schedules")
+    assert json.loads(out)["schedules"][0]["materialized_through"] == "2024-06-30"
+
+
+def test_changes_and_sync(imported, tmpdir, db_path, capsys):
+    delta_file = str(tmpdir.join("delta.json"))
+    _, out = run(capsys, db_path, "changes", "--output", delta_file)
+    assert json.loads(out)["changes"] == 4
+
+    other = str(tmpdir.join("other.db"))
+    _, out = run(capsys, other, "apply-changes", delta_file)
+    assert json.loads(out)["applied"] == 4
+    _, out = run(capsys, db_path, "sync", other)
+    result = json.loads(out)
+    assert result["pulled"]["applied"] == 0 and result["pushed"]["skipped"] == 4
+
+
+def test_archive(imported, db_path, capsys):
+    exit_code, out = run(capsys, db_path, "archive", "--year", "2023")
+    assert exit_code == 0
+    assert json.loads(out)["archived"] == 1
+
+    _, out = run(capsys, db_path, "summary")
+    assert json.loads(out) == {"years": {"2023": 75.0, "2024": 850.5}, "total": 925.5}
+
+
+def test_export_and_stats_include_archived_years(imported, db_path, capsys, tmpdir):
+    def export(*args):
+        output = str(tmpdir.join("export.csv"))
+        _, out = run(capsys, db_path, "export", "--output", output, *args)
+        return json.loads(out)["exported"], open(output).read()
+
+    def stats():
+        _, out = run(capsys, db_path, "stats")
+        stats = json.loads(out)
+        return {key: stats[key] for key in ("income_records", "total", "first_date", "last_date", "years")}
+
+    before = export(), export("--year", "2023"), stats()
+    assert before[2] == {"income_records": 4, "total": 925.5, "first_date": "2023-12-31",
+                         "last_date": "2024-02-05", "years": [2023, 2024]}
+    run(capsys, db_path, "archive", "--year", "2023")
+    assert (export(), export("--year", "2023"), stats()) == before
+
+
+def test_no_gui_modules_imported():
+    code = "import sys, cli; sys.exit('tkinter' in sys.modules)"
+    assert subprocess.run([sys.executable, "-c", code]).returncode == 0
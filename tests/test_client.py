@@ -1,6 +1,6 @@
 import pytest
 import sqlite3
-from models import Client
+from models import Client, IncomeRecord
 from database import DatabaseManager
 
 
@@ -111,3 +111,37 @@ def test_delete_client(db_manager):
     cursor = db_manager.execute_query("SELECT COUNT(*) FROM clients WHERE id=?", (client_id,))
     count = cursor.fetchone()[0]
     assert count == 0
+
+
+def test_validate_clients_matches_add_client_rules():
+    clients = [Client(name=name, email=email) for name in ("", "Ann")
+               for email in ("ann@example.com", "ann@example", "ann example.com", "", "a.b+c@x.co.uk")]
+
+    expected = []
+    for index, client in enumerate(clients):
+        try:
+            client.add_client(None)
+        except ValueError as e:
+            expected.append((index, str(e)))
+        except AttributeError:
+            pass  # valid; add_client reached the database call
+    assert Client.validate_clients(clients) == expected
+
+
+def test_client_analytics(tmpdir):
+    db_manager = DatabaseManager(str(tmpdir.join("analytics.db")), verbose=False)
+    for amount, date in [(10, "2024-01-01"), (40, "2024-01-11"), (20, "2024-01-31"), (30, "2024-02-10")]:
+        IncomeRecord(client_id=1, amount=amount, date=date).add_record(db_manager)
+    IncomeRecord(client_id=2, amount=100, date="2024-03-01").add_record(db_manager)
+
+    analytics = Client.get_client_analytics(db_manager)
+    assert analytics[1] == {'invoices': 4, 'total': 100.0, 'median': 25.0, 'p90': 40.0,
+                            'avg_days_between': 40 / 3, 'share': 0.5}
+    assert analytics[2]['median'] == analytics[2]['p90'] == 100.0
+    assert analytics[2]['avg_days_between'] is None
+
+    IncomeRecord(client_id=2, amount=50, date="2024-03-08").add_record(db_manager)
+    analytics = Client.get_client_analytics(db_manager)
+    assert analytics[2]['median'] == 75.0
+    assert analytics[2]['avg_days_between'] == 7.0
+    db_manager.close_connection()
@@ -0,0 +1,79 @@
+import os
+import sqlite3
+import sys
+
+import pytest
+
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "Tkinter"))
+
+from client_index import ClientIndex  # noqa: E402
+
+
+@pytest.fixture
+def index():
+    return ClientIndex([(1, "Alice Smith"), (2, "Bob"), (3, "bobby Tables"), (4, "Carol"), (5, "Carol"),
+                        (6, "alice jones")])
+
+
+def test_suggest_prefix_case_insensitive(index):
+    assert index.suggest("ali") == ["alice jones", "Alice Smith"]
+    assert index.suggest("BOB") == ["Bob", "bobby Tables"]
+    assert index.suggest("zed") == []
+
+
+def test_suggest_is_capped(index):
+    assert index.suggest("", limit=3) == ["alice jones", "Alice Smith", "Bob"]
+    assert index.suggest("bob", limit=1) == ["Bob"]
+
+
+def test_duplicate_names_get_distinct_labels(index):
+    assert index.suggest("carol") == ["Carol (#4)", "Carol (#5)"]
+    assert index.resolve("Carol (#5)") == 5
+    assert index.resolve("Carol") is None
+    assert index.label_for(4) == "Carol (#4)"
+
+
+def test_resolve(index):
+    assert index.resolve("Bob") == 2
+    assert index.resolve("alice smith") == 1
+    assert index.resolve("  Bob ") == 2
+    assert index.resolve("Bobb") is None
+    assert len(index) == 6
+
+
+def test_resolve_prefers_exact_case_match():
+    index = ClientIndex([(1, "Acme"), (2, "ACME")])
+    assert index.resolve("ACME") == 2
+    assert index.resolve("acme") is None
+
+
+@pytest.fixture
+def client_manager(tmpdir):
+    """Fixture providing the Tkinter Client manager on a fresh database"""
+    client = pytest.importorskip("client")
+
+    class Connection:
+        conn = sqlite3.connect(str(tmpdir.join("tk.sqlite")))
+
+    Connection.conn.execute("CREATE TABLE clients (id integer PRIMARY KEY, name text NOT NULL, "
+                            "phone_number text, email text, notes text)")
+    manager = client.Client(Connection())
+    for name in ("John Smith", "Jane Doe", "100%_Pure"):
+        manager.add_client(name, "", "", "")
+    yield manager
+    Connection.conn.close()
+
+
+def test_search_without_index_uses_like(client_manager):
+    assert not client_manager.has_search_index()
+    assert client_manager.search_clients("smi") == [(1, "John Smith")]
+    assert client_manager.search_clients("%_") == [(3, "100%_Pure")]
+    assert client_manager.search_clients("  ") == []
+
+
+def test_search_with_fts_index(client_manager):
+    if not client_manager.create_search_index():
+        pytest.skip("SQLite built without FTS5")
+    assert client_manager.search_clients("smi") == [(1, "John Smith")]
+    client_manager.update_client(2, "Jane Smithers", "", "", "")
+    assert sorted(client_manager.search_clients("smith")) == [(1, "John Smith"), (2, "Jane Smithers")]
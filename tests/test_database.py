@@ -0,0 +1,64 @@
+import os
+import sqlite3
+
+import pytest
+from database import DatabaseManager
+from models import Client, IncomeRecord
+
+
+@pytest.fixture
+def db_manager(tmpdir):
+    """Fixture providing a DatabaseManager on a fresh database file with some data"""
+    db_manager = DatabaseManager(str(tmpdir.join("ledger.db")), verbose=False)
+    Client(name="Backup Client", email="backup@example.com").add_client(db_manager)
+    for day in range(1, 29):
+        IncomeRecord(client_id=1, amount=day, date=f"2024-02-{day:02d}", description="x" * 500).add_record(db_manager)
+    yield db_manager
+    db_manager.close_connection()
+
+
+def test_backup_copies_in_steps(db_manager, tmpdir):
+    steps = []
+    target = str(tmpdir.join("copy.sqlite"))
+    assert db_manager.backup(target, pages=1, sleep=0, progress=lambda done, total: steps.append((done, total))) \
+        == target
+
+    assert len(steps) > 1
+    assert steps[-1][0] == steps[-1][1]
+    assert not os.path.exists(target + ".part")
+    copy = sqlite3.connect(target)
+    assert copy.execute("SELECT COUNT(*), SUM(amount) FROM income_records").fetchone() == (28, 406.0)
+    copy.close()
+
+
+def test_backup_sees_writes_made_during_backup(db_manager, tmpdir):
+    written = []
+
+    def write_during_backup(done, total):
+        if done == 1 and not written:
+            written.append(IncomeRecord(client_id=1, amount=1000, date="2024-03-01").add_record(db_manager))
+
+    target = db_manager.backup(str(tmpdir.join("copy.sqlite")), pages=1, sleep=0, progress=write_during_backup)
+    copy = sqlite3.connect(target)
+    assert copy.execute("SELECT COUNT(*) FROM income_records").fetchone()[0] == 29
+    copy.close()
+
+
+def test_failed_backup_leaves_no_partial_file(db_manager, tmpdir):
+    def fail(done, total):
+        raise KeyboardInterrupt
+
+    target = str(tmpdir.join("copy.sqlite"))
+    with pytest.raises(KeyboardInterrupt):
+        db_manager.backup(target, pages=1, sleep=0, progress=fail)
+    assert not os.path.exists(target)
+    assert not os.path.exists(target + ".part")
+
+
+def test_create_backup_rotates(db_manager, tmpdir):
+    backup_dir = str(tmpdir.join("backups"))
+    paths = [db_manager.create_backup(backup_dir, keep=2, sleep=0) for _ in range(4)]
+
+    remaining = [path for _, path in db_manager.list_backups(backup_dir)]
+    assert remaining == paths[:1:-1]
+    assert all(not os.path.exists(path) for path in paths[:2])
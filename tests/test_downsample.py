@@ -0,0 +1,36 @@
+import math
+import os
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "Tkinter"))
+
+from downsample import lttb, min_max  # noqa: E402
+
+
+def series(count):
+    return [(x, math.sin(x / 50) * 100 + (500 if x == count // 3 else 0)) for x in range(count)]
+
+
+def test_min_max_keeps_extremes():
+    points = series(10000)
+    reduced = min_max(points, 100)
+    assert len(reduced) <= 200
+    assert [x for x, _ in reduced] == sorted(x for x, _ in reduced)
+    assert max(y for _, y in reduced) == max(y for _, y in points)
+    assert min(y for _, y in reduced) == min(y for _, y in points)
+
+
+def test_lttb_keeps_ends_and_spikes():
+    points = series(10000)
+    reduced = lttb(points, 300)
+    assert len(reduced) == 300
+    assert reduced[0] == points[0] and reduced[-1] == points[-1]
+    assert (10000 // 3, points[10000 // 3][1]) in reduced
+    assert [x for x, _ in reduced] == sorted(x for x, _ in reduced)
+
+
+def test_short_series_are_unchanged():
+    points = series(10)
+    assert min_max(points, 100) == points
+    assert lttb(points, 100) == points
+    assert lttb(points, 2) == points
@@ -0,0 +1,89 @@
+import pytest
+from database import DatabaseManager
+from events import ChangeEvent, EventBus
+from models import Client, IncomeRecord
+
+
+@pytest.fixture
+def db_manager(db_path):
+    db_manager = DatabaseManager(db_path, verbose=False)
+    yield db_manager
+    db_manager.close_connection()
+
+
+def test_write_methods_publish_before_and_after(db_manager):
+    events = []
+    db_manager.events.subscribe(events.append)
+
+    client = Client(name="Acme", email="acme@example.com")
+    client.add_client(db_manager)
+    client.notes = "Pays late"
+    client.update_client(db_manager)
+    record = IncomeRecord(client_id=client.client_id, amount="150", date="2024-03-01", description="March")
+    record.income_id = record.add_record(db_manager)
+    record.amount = 175.5
+    record.update_record(db_manager)
+    IncomeRecord.delete_record(record.income_id, db_manager)
+    Client.delete_client(client.client_id, db_manager)
+
+    assert [(event.entity, event.action) for event in events] == [
+        ('client', 'insert'), ('client', 'update'),
+        ('income_record', 'insert'), ('income_record', 'update'), ('income_record', 'delete'),
+        ('client', 'delete')]
+    assert events[1].before['notes'] == "" and events[1].after['notes'] == "Pays late"
+    assert events[2].after == {'id': record.income_id, 'client_id': client.client_id, 'amount': 150.0,
+                               'date': "2024-03-01", 'description': "March"}
+    assert events[3].before['amount'] == 150.0 and events[3].after['amount'] == 175.5
+    assert events[4] == ChangeEvent('income_record', 'delete', record.income_id, events[3].after, None)
+    assert events[5].before['name'] == "Acme"
+
+
+def test_no_event_when_nothing_changed(db_manager):
+    events = []
+    db_manager.events.subscribe(events.append)
+    IncomeRecord.delete_record(42, db_manager)
+    Client(client_id=42, name="Nobody", email="nobody@example.com").update_client(db_manager)
+    assert events == []
+
+
+def test_subscriber_filters_and_unsubscribe(db_manager):
+    deletes = []
+    token = db_manager.events.subscribe(deletes.append, entity='client', actions=('delete',))
+    client_id = Client(name="Acme", email="acme@example.com").add_client(db_manager)
+    IncomeRecord(client_id=client_id, amount=10, date="2024-03-01").add_record(db_manager)
+    assert not db_manager.events.wants('income_record')
+    Client.delete_client(client_id, db_manager)
+    assert [event.row_id for event in deletes] == [client_id]
+
+    db_manager.events.unsubscribe(token)
+    Client(name="Other", email="other@example.com").add_client(db_manager)
+    Client.delete_client(client_id + 1, db_manager)
+    assert len(deletes) == 1
+
+
+def test_failing_subscriber_does_not_stop_delivery(db_manager, capsys):
+    def fail(event):
+        raise RuntimeError("subscriber bug")
+
+    received = []
+    db_manager.events.subscribe(fail)
+    db_manager.events.subscribe(received.append)
+    client_id = Client(name="Acme", email="acme@example.com").add_client(db_manager)
+
+    assert Client.get_client(client_id, db_manager) is not None
+    assert len(received) == 1
+    assert "subscriber bug" in capsys.readouterr().err
+
+
+def test_shared_bus_and_write_queue(db_path):
+    bus = EventBus()
+    events = []
+    bus.subscribe(events.append)
+    writer = DatabaseManager(db_path, verbose=False, events=bus)
+    writer.enable_write_queue()
+    try:
+        client_id = Client(name="Acme", email="acme@example.com").add_client(writer)
+        Client.delete_client(client_id, writer)
+    finally:
+        writer.close_connection()
+    assert [(event.action, event.row_id) for event in events] == [('insert', client_id), ('delete', client_id)]
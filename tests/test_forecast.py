@@ -0,0 +1,88 @@
+from datetime import date
+
+import pytest
+from database import DatabaseManager
+from forecast import Forecaster, SeasonalForecast
+from models import IncomeRecord
+
+
+@pytest.fixture
+def db_manager(db_path):
+    """Fixture providing a DatabaseManager with three years of monthly income for two clients"""
+    db_manager = DatabaseManager(db_path, verbose=False)
+    for year in (2021, 2022, 2023):
+        for month in range(1, 13):
+            IncomeRecord(client_id=1, amount=100 * month, date=f"{year}-{month:02d}-10").add_record(db_manager)
+        IncomeRecord(client_id=2, amount=50, date=f"{year}-12-20").add_record(db_manager)
+    yield db_manager
+    db_manager.close_connection()
+
+
+def test_seasonal_baselines():
+    model = SeasonalForecast(window=2, alpha=0.5)
+    model.update(2021, 1, 100)
+    model.update(2021, 3, 300)  # February counts as zero
+    model.update(2022, 1, 200)
+    model.update(2023, 1, 400)
+
+    assert model.baseline(0, 'moving_average') == 300.0
+    assert model.baseline(0, 'smoothing') == 0.5 * 400 + 0.5 * (0.5 * 200 + 0.5 * 100)
+    assert model.baseline(1) == 0.0
+    assert model.forecast(2) == [((2023, 2), 0.0), ((2023, 3), 150.0)]
+    with pytest.raises(ValueError):
+        model.update(2022, 6, 1)
+
+
+def test_forecast_overall_and_per_client(db_manager):
+    forecaster = Forecaster(db_manager, window=3)
+    overall = dict(forecaster.forecast(today=date(2024, 1, 5), method='moving_average'))
+    assert overall[(2024, 1)] == 100.0
+    assert overall[(2024, 12)] == 1250.0
+    assert dict(forecaster.forecast(2, today=date(2024, 1, 5), method='moving_average'))[(2024, 12)] == 50.0
+    assert forecaster.forecast(2, months=1, today=date(2024, 1, 5)) == [((2024, 1), 0.0)]
+
+
+def test_models_update_incrementally_and_refit_on_edits(db_manager):
+    forecaster = Forecaster(db_manager)
+    model = forecaster.model(today=date(2024, 1, 5))
+    assert forecaster.model(today=date(2024, 1, 5)) is model
+
+    IncomeRecord(client_id=1, amount=700, date="2024-01-10").add_record(db_manager)
+    updated = forecaster.model(today=date(2024, 2, 1))
+    assert updated is model
+    assert model.recent[0][-1] == 700.0
+
+    IncomeRecord(client_id=1, amount=1, date="2022-06-01").add_record(db_manager)
+    refit = forecaster.model(today=date(2024, 2, 1))
+    assert refit is not model
+    assert refit.observed_total == pytest.approx(model.observed_total + 1)
+
+
+def test_change_events_avoid_rescanning_records(db_manager, db_path):
+    forecaster = Forecaster(db_manager)
+    model = forecaster.model(1, today=date(2024, 1, 5))
+    statements = []
+    db_manager.conn.set_trace_callback(statements.append)
+
+    record = IncomeRecord(client_id=1, amount=5, date="2023-06-01")
+    record.income_id = record.add_record(db_manager)
+    assert forecaster.model(2, today=date(2024, 1, 5)) is not None
+    refit = forecaster.model(1, today=date(2024, 1, 5))
+    assert refit is not model and refit.observed_total == pytest.approx(model.observed_total + 5)
+    # Moving the record to another month keeps the total but still changes the months the model holds
+    record.date = "2023-07-01"
+    record.update_record(db_manager)
+    moved = forecaster.model(1, today=date(2024, 1, 5))
+    assert moved is not refit and moved.recent[6][-1] == 705.0
+    # A change to an open month is read when that month closes
+    IncomeRecord(client_id=1, amount=9, date="2024-01-20").add_record(db_manager)
+    assert forecaster.model(1, today=date(2024, 1, 5)) is moved
+    assert not [sql for sql in statements if "COALESCE(SUM(amount), 0)" in sql]
+
+    # Another connection's commit publishes no event, so the held months are summed again
+    other = DatabaseManager(db_path, verbose=False)
+    IncomeRecord(client_id=1, amount=1, date="2022-01-01").add_record(other)
+    other.close_connection()
+    assert forecaster.model(1, today=date(2024, 1, 5)) is not moved
+    db_manager.conn.set_trace_callback(None)
+    forecaster.close()
@@ -0,0 +1,88 @@
+import http.client
+import json
+import threading
+
+import pytest
+from database import DatabaseManager
+from http_api import ApiServer
+from models import Client, IncomeRecord
+
+
+@pytest.fixture
+def server(db_path):
+    db_manager = DatabaseManager(db_path, verbose=False)
+    client_id = Client(name="Acme", email="acme@example.com").add_client(db_manager)
+    for day, description in ((5, "Logo design"), (20, "Website"), (25, "100% done_")):
+        IncomeRecord(client_id=client_id, amount=day * 10, date=f"2024-03-{day:02d}",
+                     description=description).add_record(db_manager)
+    db_manager.close_connection()
+
+    server = ApiServer(db_path, port=0, readers=2)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def get(server, path, headers=None):
+    connection = http.client.HTTPConnection(*server.server_address[:2])
+    connection.request("GET", path, headers=headers or {})
+    response = connection.getresponse()
+    body = response.read()
+    connection.close()
+    return response, json.loads(body) if body else None
+
+
+def test_endpoints(server):
+    response, clients = get(server, "/clients")
+    assert response.getheader("Transfer-Encoding") == "chunked"
+    assert clients == [{"id": 1, "name": "Acme", "phone_number": "", "email": "acme@example.com", "notes": ""}]
+    assert get(server, "/clients/1")[1]["name"] == "Acme"
+    assert get(server, "/clients/9")[0].status == 404
+    assert get(server, "/totals")[1] == {"2024": 500.0}
+    assert get(server, "/totals/2024")[1] == {"03": 500.0}
+    days = get(server, "/records/2024/3")[1]
+    assert list(days) == ["2024-03-05", "2024-03-20", "2024-03-25"]
+    assert days["2024-03-05"][0]["client_name"] == "Acme"
+    assert get(server, "/records/2024/13")[0].status == 400
+    assert get(server, "/nothing")[0].status == 404
+
+
+def test_search(server):
+    assert [row["description"] for row in get(server, "/search?q=")[1]] == ["100% done_", "Website", "Logo design"]
+    assert [row["amount"] for row in get(server, "/search?q=%25")[1]] == [250.0]
+    assert get(server, "/search?q=web&from=2024-03-21")[1] == []
+    assert len(get(server, "/search?limit=2")[1]) == 2
+    assert get(server, "/search?from=March")[0].status == 400
+
+
+def test_etag(server, db_path):
+    response, _ = get(server, "/totals/2024")
+    etag = response.getheader("ETag")
+    assert get(server, "/totals/2024", {"If-None-Match": etag})[0].status == 304
+
+    db_manager = DatabaseManager(db_path, verbose=False)
+    IncomeRecord(client_id=1, amount=1, date="2024-03-26").add_record(db_manager)
+    db_manager.close_connection()
+    response, totals = get(server, "/totals/2024", {"If-None-Match": etag})
+    assert response.status == 200 and totals == {"03": 501.0}
+    assert response.getheader("ETag") != etag
+
+
+def test_metrics(server):
+    connection = http.client.HTTPConnection(*server.server_address[:2])
+    connection.request("GET", "/metrics")
+    response = connection.getresponse()
+    body = response.read().decode()
+    connection.close()
+    assert response.status == 200
+    assert response.getheader("Content-Type").startswith("text/plain")
+    assert 'mota_database_rows{database="mota.db",table="income_records"} 3' in body
+
+
+def test_readers_cannot_write(db_path):
+    db_manager = DatabaseManager(db_path, verbose=False, read_only=True)
+    with pytest.raises(Exception, match="readonly"):
+        Client(name="Acme", email="acme@example.com").add_client(db_manager)
+    db_manager.close_connection()
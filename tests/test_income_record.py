@@ -1,6 +1,8 @@
+import os
 import pytest
 import sqlite3
-from models import IncomeRecord
+from datetime import datetime
+from models import Client, IncomeRecord
 from database import DatabaseManager
 
 
@@ -124,3 +126,118 @@ def test_get_daily_records(db_manager):
     assert fetched_record[2] == 300.0
     assert fetched_record[3] == 'Design work'
     assert fetched_record[4] == 'Test Client'
+
+
+@pytest.fixture
+def empty_db_manager(tmpdir):
+    """Fixture providing a DatabaseManager on a fresh database file"""
+    db_manager = DatabaseManager(str(tmpdir.join("empty.db")))
+    yield db_manager
+    db_manager.close_connection()
+
+
+def test_active_years_empty(empty_db_manager):
+    assert IncomeRecord.get_active_years(empty_db_manager) == []
+    assert IncomeRecord.get_date_bounds(empty_db_manager) == (None, None)
+    assert IncomeRecord.get_yearly_totals(empty_db_manager) == {}
+
+
+def test_active_years_and_totals(empty_db_manager):
+    for amount, date in [(100.0, "2019-03-01"), (50.0, "2019-12-31"), (25.0, "2022-01-01"), (10.0, "2024-06-15")]:
+        IncomeRecord(client_id=1, amount=amount, date=date).add_record(empty_db_manager)
+
+    assert IncomeRecord.get_active_years(empty_db_manager) == [2019, 2022, 2024]
+    assert IncomeRecord.get_date_bounds(empty_db_manager) == ("2019-03-01", "2024-06-15")
+    assert IncomeRecord.get_yearly_totals(empty_db_manager) == {2019: 150.0, 2022: 25.0, 2024: 10.0}
+
+
+def test_active_years_invalidated_on_write(empty_db_manager):
+    new_id = IncomeRecord(client_id=1, amount=100.0, date="2020-05-05").add_record(empty_db_manager)
+    assert IncomeRecord.get_active_years(empty_db_manager) == [2020]
+
+    IncomeRecord(client_id=1, amount=100.0, date="2021-05-05").add_record(empty_db_manager)
+    assert IncomeRecord.get_active_years(empty_db_manager) == [2020, 2021]
+
+    IncomeRecord.delete_record(new_id, empty_db_manager)
+    assert IncomeRecord.get_active_years(empty_db_manager) == [2021]
+    assert IncomeRecord.get_yearly_totals(empty_db_manager) == {2021: 100.0}
+
+
+def test_active_years_see_writes_from_other_connections(empty_db_manager):
+    IncomeRecord(client_id=1, amount=5.0, date="2021-05-05").add_record(empty_db_manager)
+    assert IncomeRecord.get_yearly_totals(empty_db_manager) == {2021: 5.0}
+
+    other = DatabaseManager(empty_db_manager.db_path, verbose=False)
+    IncomeRecord(client_id=1, amount=7.0, date="2022-01-01").add_record(other)
+    other.close_connection()
+    assert IncomeRecord.get_yearly_totals(empty_db_manager) == {2021: 5.0, 2022: 7.0}
+
+    with empty_db_manager.conn:
+        empty_db_manager.conn.execute("INSERT INTO income_records(client_id, amount, date) VALUES (1, 1, '2023-01-01')")
+    assert IncomeRecord.get_active_years(empty_db_manager) == [2021, 2022, 2023]
+
+
+def test_archive_year_routes_queries_to_archive_file(empty_db_manager):
+    for amount, date in [(100.0, "2019-03-01"), (50.0, "2019-03-31"), (20.0, "2019-12-31"), (10.0, "2020-01-01")]:
+        IncomeRecord(client_id=1, amount=amount, date=date).add_record(empty_db_manager)
+
+    assert IncomeRecord.archive_year(2019, empty_db_manager) == 3
+    assert os.path.exists(empty_db_manager.archive_path(2019))
+    hot = empty_db_manager.execute_query("SELECT date FROM income_records").fetchall()
+    assert hot == [("2020-01-01",)]
+
+    assert IncomeRecord.get_monthly_totals(2019, empty_db_manager) == {"03": 150.0, "12": 20.0}
+    assert [record[0] for record in IncomeRecord.get_daily_records(2019, 3, empty_db_manager)["2019-03-31"]] == [2]
+    assert IncomeRecord.get_active_years(empty_db_manager) == [2019, 2020]
+    assert IncomeRecord.get_date_bounds(empty_db_manager) == ("2019-03-01", "2020-01-01")
+    assert IncomeRecord.get_yearly_totals(empty_db_manager) == {2019: 170.0, 2020: 10.0}
+    assert Client.has_records(1, empty_db_manager)
+
+    # A record dated in an archived year is still found until the year is archived again
+    IncomeRecord(client_id=1, amount=5.0, date="2019-03-15").add_record(empty_db_manager)
+    assert IncomeRecord.get_monthly_totals(2019, empty_db_manager) == {"03": 155.0, "12": 20.0}
+    assert IncomeRecord.archive_year(2019, empty_db_manager) == 1
+    assert IncomeRecord.get_yearly_totals(empty_db_manager) == {2019: 175.0, 2020: 10.0}
+
+
+def test_archive_current_year_is_refused(empty_db_manager):
+    with pytest.raises(ValueError, match="Only past years can be archived."):
+        IncomeRecord.archive_year(datetime.now().year, empty_db_manager)
+
+
+DATES = ["2024-02-25", "2024-2-5", "2024-02- 5", "2024-02-29", "2023-02-29", "1900-02-29", "2000-02-29",
+         "2024-04-31", "2024-13-01", "2024-00-10", "2024-01-00", "0000-01-01", "0001-01-01", "24-01-01",
+         "2024-01-01 ", " 2024-01-01", "2024/01/01", "20240101", "2024-01-011", "", "２０２４-01-01"]
+AMOUNTS = ["0", "10000", "10000.01", "-1", "abc", "", "1e3", " 12 ", "nan", "inf", 5, 7.5]
+
+
+def test_validate_records_matches_single_record_rules():
+    records = [IncomeRecord(client_id=client_id, amount=amount, date=date)
+               for client_id in (None, "", 1) for amount in AMOUNTS for date in DATES]
+
+    expected = []
+    for index, record in enumerate(records):
+        try:
+            IncomeRecord.add_record(record, None)
+        except ValueError as e:
+            expected.append((index, str(e)))
+        except AttributeError:
+            pass  # valid; add_record reached the database call
+    assert IncomeRecord.validate_records(records) == expected
+
+
+def test_add_records_recognises_duplicates(empty_db_manager):
+    IncomeRecord(client_id=1, amount=100, date="2024-03-01", description="Design").add_record(empty_db_manager)
+    batch = [IncomeRecord(client_id="1", amount="100.00", date="2024-03-01", description=" design "),
+             IncomeRecord(client_id=1, amount=100, date="2024-03-02", description="Design")]
+
+    assert IncomeRecord.add_records(batch, empty_db_manager) == (1, [(0, 1)])
+    assert IncomeRecord.add_records(batch, empty_db_manager, skip_duplicates=False) == (2, [(0, 1), (1, 2)])
+    assert IncomeRecord.find_duplicates(empty_db_manager) == [[1, 3], [2, 4]]
+
+
+def test_find_duplicates_hashes_rows_inserted_without_hash(empty_db_manager):
+    with empty_db_manager.conn:
+        empty_db_manager.conn.executemany("INSERT INTO income_records(client_id, amount, date) VALUES (?, ?, ?)",
+                                          [(1, 5, "2024-01-01"), (1, 5.0, "2024-01-01"), (2, 5, "2024-01-01")])
+    assert IncomeRecord.find_duplicates(empty_db_manager) == [[1, 2]]
@@ -0,0 +1,135 @@
+import sqlite3
+import threading
+
+from database import DatabaseManager
+from maintenance import MaintenanceScheduler, checkpoint, enable_incremental_auto_vacuum, incremental_vacuum, optimize
+from metrics import MetricsRegistry
+
+
+def fragment(db_path, rows=3000):
+    """Add and delete records, leaving their pages on the freelist."""
+    conn = sqlite3.connect(db_path, isolation_level=None)
+    enable_incremental_auto_vacuum(conn)
+    conn.isolation_level = ""
+    with conn:
+        conn.executemany("INSERT INTO income_records(client_id, amount, date, description) VALUES (1, ?, ?, ?)",
+                         [(number, "2024-01-01", "x" * 200) for number in range(rows)])
+    with conn:
+        conn.execute("DELETE FROM income_records")
+    free_pages = conn.execute("PRAGMA freelist_count").fetchone()[0]
+    conn.close()
+    return free_pages
+
+
+def test_incremental_auto_vacuum_is_enabled_once(db_path):
+    conn = sqlite3.connect(db_path, isolation_level=None)
+    # Migrating does not rebuild the file
+    assert conn.execute("PRAGMA auto_vacuum").fetchone()[0] == 0
+    assert enable_incremental_auto_vacuum(conn)
+    assert conn.execute("PRAGMA auto_vacuum").fetchone()[0] == 2
+    assert not enable_incremental_auto_vacuum(conn)
+    conn.close()
+
+
+def test_run_once_rebuilds_file_for_incremental_auto_vacuum(db_path):
+    scheduler = MaintenanceScheduler(db_path, metrics=MetricsRegistry())
+    assert scheduler.run_once()['rebuild'] is True
+    assert scheduler.run_once()['rebuild'] is False
+    scheduler.stop()
+    assert sqlite3.connect(db_path).execute("PRAGMA auto_vacuum").fetchone()[0] == 2
+
+
+def test_incremental_vacuum_in_slices(db_path):
+    free_pages = fragment(db_path)
+    assert free_pages > 20
+    conn = sqlite3.connect(db_path, isolation_level=None)
+    report = incremental_vacuum(conn, slice_pages=10, time_budget=0)
+    assert report == {'pages_freed': 10, 'free_pages': free_pages - 10, 'slices': 1}
+    report = incremental_vacuum(conn, slice_pages=10)
+    assert report['pages_freed'] == free_pages - 10 and report['free_pages'] == 0
+    conn.close()
+
+
+def test_optimize_analyzes_once(db_path):
+    conn = sqlite3.connect(db_path, isolation_level=None)
+    assert optimize(conn) == 'analyze'
+    assert conn.execute("SELECT COUNT(*) FROM sqlite_stat1").fetchone()[0] > 0
+    assert optimize(conn) == 'optimize'
+    conn.close()
+
+
+def test_checkpoint_over_threshold(db_path):
+    conn = sqlite3.connect(db_path, isolation_level=None)
+    assert checkpoint(conn, db_path) is None
+    conn.execute("PRAGMA journal_mode = WAL")
+    conn.execute("INSERT INTO clients(name) VALUES ('Acme')")
+    report = checkpoint(conn, db_path, threshold_bytes=10 ** 9)
+    assert not report['checkpointed'] and report['wal_bytes_after'] == report['wal_bytes_before'] > 0
+    report = checkpoint(conn, db_path, threshold_bytes=0)
+    assert report['checkpointed'] and report['wal_bytes_after'] == 0 and not report['busy']
+    conn.close()
+
+
+def test_run_once_reports_reclaimed_space(db_path):
+    free_pages = fragment(db_path)
+    registry = MetricsRegistry()
+    scheduler = MaintenanceScheduler(db_path, metrics=registry)
+    report = scheduler.run_once()
+    scheduler.stop()
+    page_size = sqlite3.connect(db_path).execute("PRAGMA page_size").fetchone()[0]
+    assert report['vacuum']['pages_freed'] == free_pages
+    assert report['vacuum']['bytes_reclaimed'] == free_pages * page_size
+    assert report['optimize'] == 'analyze' and report['checkpoint'] is None and report['skipped'] == []
+    assert f'mota_maintenance_reclaimed_bytes_total{{database="mota.db"}} {free_pages * page_size}' \
+        in registry.render()
+
+
+def test_locked_database_skips_steps(db_path):
+    fragment(db_path)
+    db_manager = DatabaseManager(db_path, verbose=False)
+    db_manager.conn.execute("BEGIN IMMEDIATE")
+    scheduler = MaintenanceScheduler(db_path, busy_timeout=0, metrics=MetricsRegistry())
+    report = scheduler.run_once()
+    assert report['skipped'] == ['vacuum', 'optimize']
+    db_manager.conn.rollback()
+    assert scheduler.run_once()['vacuum']['pages_freed'] > 0
+    scheduler.stop()
+    db_manager.close_connection()
+
+
+def test_thread_waits_for_idle(db_path):
+    fragment(db_path)
+    reports = []
+    done = threading.Event()
+    scheduler = MaintenanceScheduler(db_path, interval=0.01, idle_after=0.2, metrics=MetricsRegistry(),
+                                     on_report=lambda report: (reports.append(report), done.set()))
+    scheduler.start()
+    conn = sqlite3.connect(db_path)
+    for number in range(5):
+        with conn:
+            conn.execute("INSERT INTO clients(name) VALUES (?)", (f"Client {number}",))
+        assert not reports
+        done.wait(0.05)
+    conn.close()
+    assert done.wait(5)
+    scheduler.stop()
+    assert reports[0]['vacuum']['free_pages'] == 0
+
+
+def test_thread_survives_failing_on_report(db_path, capsys):
+    calls = []
+    two_runs = threading.Event()
+
+    def on_report(report):
+        calls.append(report)
+        if len(calls) == 2:
+            two_runs.set()
+        raise RuntimeError("report sink is down")
+
+    fragment(db_path)
+    scheduler = MaintenanceScheduler(db_path, interval=0.01, idle_after=0, analyze_every=0,
+                                     metrics=MetricsRegistry(), on_report=on_report)
+    scheduler.start()
+    assert two_runs.wait(5)
+    scheduler.stop()
+    assert "report sink is down" in capsys.readouterr().err
@@ -0,0 +1,64 @@
+import os
+
+from database import DatabaseManager
+from metrics import MetricsRegistry
+from models import Client, IncomeRecord
+
+
+def sample(text, line_start):
+    return [line.rsplit(" ", 1)[1] for line in text.splitlines() if line.startswith(line_start)]
+
+
+def test_render_exposition_format():
+    registry = MetricsRegistry()
+    registry.counter("jobs_total", "Jobs run.", ("queue",)).labels('say "hi"\n').inc(3)
+    latency = registry.histogram("latency_seconds", "Latency.", buckets=(0.1, 1.0)).labels()
+    for value in (0.05, 0.5, 0.5, 5):
+        latency.observe(value)
+
+    text = registry.render()
+    assert "# TYPE jobs_total counter\n" in text
+    assert 'jobs_total{queue="say \\"hi\\"\\n"} 3\n' in text
+    assert sample(text, "latency_seconds_bucket") == ["1", "3", "4"]
+    assert 'latency_seconds_bucket{le="+Inf"} 4' in text
+    assert sample(text, "latency_seconds_sum") == ["6.05"]
+    assert sample(text, "latency_seconds_count") == ["4"]
+
+
+def test_collectors_are_reference_counted():
+    registry = MetricsRegistry()
+    collector = lambda: [("things", "gauge", "Things.", [({"kind": "a"}, 2)])]
+    registry.add_collector("key", collector)
+    registry.add_collector("key", collector)
+    registry.remove_collector("key")
+    assert 'things{kind="a"} 2' in registry.render()
+    registry.remove_collector("key")
+    assert "things" not in registry.render()
+
+
+def test_database_manager_records_metrics(db_path, tmpdir):
+    registry = MetricsRegistry()
+    db_manager = DatabaseManager(db_path, verbose=False, metrics=registry)
+    client_id = Client(name="Acme", email="acme@example.com").add_client(db_manager)
+    IncomeRecord.add_records([IncomeRecord(client_id=client_id, amount=day, date=f"2024-01-{day:02d}")
+                              for day in range(1, 11)], db_manager)
+    IncomeRecord.get_yearly_totals(db_manager)
+    IncomeRecord.get_yearly_totals(db_manager)
+    Client.get_all_clients(db_manager)
+
+    text = registry.render()
+    assert sample(text, 'mota_rows_changed_total{database="mota.db"}') == ["11"]
+    assert sample(text, 'mota_commits_total{database="mota.db"}') == ["2"]
+    assert sample(text, 'mota_cache_requests_total{database="mota.db",result="hit"}') == ["1"]
+    assert sample(text, 'mota_query_duration_seconds_count{database="mota.db",kind="transaction"}') == ["1"]
+    assert int(sample(text, 'mota_query_duration_seconds_count{database="mota.db",kind="read"}')[0]) >= 2
+    assert sample(text, 'mota_database_rows{database="mota.db",table="income_records"}') == ["10"]
+    assert sample(text, 'mota_database_file_bytes{database="mota.db"}') == [str(os.path.getsize(db_path))]
+
+    output = str(tmpdir.join("mota.prom"))
+    assert registry.write(output) == output
+    assert "mota_database_page_cache_bytes" in open(output).read()
+
+    db_manager.close_connection()
+    db_manager.close_connection()
+    assert "mota_database_file_bytes" not in registry.render()
@@ -0,0 +1,104 @@
+import sqlite3
+import threading
+
+import pytest
+from database import DatabaseManager
+from migrations import LATEST_VERSION, MIGRATIONS, Migration, get_version, migrate
+from models import content_hash
+
+
+@pytest.fixture
+def conn(tmpdir):
+    """Fixture providing a connection to a fresh database file"""
+    conn = sqlite3.connect(str(tmpdir.join("migrations.db")))
+    yield conn
+    conn.close()
+
+
+def test_new_database_is_migrated_to_latest(conn):
+    assert migrate(conn) == LATEST_VERSION
+    tables = {name for (name,) in conn.execute("SELECT name FROM sqlite_master WHERE type='table'")}
+    assert {'clients', 'income_records'} <= tables
+
+
+def test_current_schema_only_reads_user_version(conn):
+    migrate(conn)
+    statements = []
+    conn.set_trace_callback(statements.append)
+    migrate(conn)
+    assert statements == ["PRAGMA user_version"]
+
+
+def test_unversioned_database_is_adopted(conn):
+    conn.execute("CREATE TABLE clients (id integer PRIMARY KEY, name text NOT NULL, phone_number text, "
+                 "email text, notes text)")
+    conn.execute("INSERT INTO clients(name) VALUES ('Existing')")
+    conn.commit()
+
+    assert migrate(conn) == LATEST_VERSION
+    assert conn.execute("SELECT name FROM clients").fetchall() == [("Existing",)]
+
+
+def test_failed_migration_rolls_back(conn):
+    migrations = [
+        Migration(1, "create", ["CREATE TABLE a (x integer)"]),
+        Migration(2, "broken", ["CREATE TABLE b (x integer)", "INSERT INTO missing VALUES (1)"]),
+    ]
+    with pytest.raises(sqlite3.OperationalError):
+        migrate(conn, migrations)
+
+    assert get_version(conn) == 1
+    tables = {name for (name,) in conn.execute("SELECT name FROM sqlite_master WHERE type='table'")}
+    assert tables == {'a'}
+
+
+def test_progress_is_reported(conn):
+    events = []
+    migrate(conn, progress=events.append, progress_interval=0)
+    assert [(event['version'], event['stage']) for event in events if event['stage'] != 'running'] == \
+        [(version, stage) for version in range(1, LATEST_VERSION + 1) for stage in ('start', 'done')]
+
+
+def test_database_manager_migrates_on_open(tmpdir):
+    db_manager = DatabaseManager(str(tmpdir.join("manager.db")), verbose=False)
+    assert get_version(db_manager.conn) == LATEST_VERSION
+    db_manager.close_connection()
+
+
+def test_concurrent_openers_apply_each_step_once(tmpdir):
+    path = str(tmpdir.join("race.db"))
+    migrations = [
+        Migration(1, "create", ["CREATE TABLE a (x integer)"]),
+        Migration(2, "add column", ["ALTER TABLE a ADD COLUMN y integer"]),
+    ]
+    errors = []
+
+    def open_and_migrate():
+        conn = sqlite3.connect(path, timeout=10)
+        try:
+            migrate(conn, migrations)
+        except sqlite3.Error as e:
+            errors.append(e)
+        finally:
+            conn.close()
+
+    threads = [threading.Thread(target=open_and_migrate) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+    conn = sqlite3.connect(path)
+    assert get_version(conn) == 2
+    conn.close()
+
+
+def test_content_hashes_are_backfilled(conn):
+    migrate(conn, MIGRATIONS[:3])
+    conn.execute("INSERT INTO income_records(client_id, amount, date) VALUES (1, 5, '2024-01-01')")
+    conn.commit()
+
+    migrate(conn)
+    assert conn.execute("SELECT content_hash FROM income_records").fetchone()[0] == \
+        content_hash(1, 5, "2024-01-01", None)
@@ -0,0 +1,79 @@
+from datetime import date
+
+import pytest
+from database import DatabaseManager
+from models import Client, IncomeRecord, RecurringSchedule, add_months, occurrence_dates
+
+
+@pytest.fixture
+def db_manager(db_path):
+    db_manager = DatabaseManager(db_path, verbose=False)
+    Client(name="Retainer Co", email="retainer@example.com").add_client(db_manager)
+    yield db_manager
+    db_manager.close_connection()
+
+
+def test_add_months_clips_to_month_end():
+    assert add_months(date(2024, 1, 31), 1) == date(2024, 2, 29)
+    assert add_months(date(2023, 1, 31), 1) == date(2023, 2, 28)
+    assert add_months(date(2024, 11, 15), 3) == date(2025, 2, 15)
+
+
+def test_occurrence_dates():
+    monthly = list(occurrence_dates(date(2024, 1, 31), 'monthly', date(2024, 2, 1), date(2024, 5, 1)))
+    assert monthly == [date(2024, 2, 29), date(2024, 3, 31), date(2024, 4, 30)]
+    weekly = list(occurrence_dates(date(2024, 1, 1), 'weekly', date(2030, 1, 1), date(2030, 1, 14)))
+    assert weekly == [date(2030, 1, 7), date(2030, 1, 14)]
+    assert list(occurrence_dates(date(2024, 6, 1), 'yearly', date(2020, 1, 1), date(2026, 1, 1))) == \
+        [date(2024, 6, 1), date(2025, 6, 1)]
+
+
+def test_add_schedule_validates(db_manager):
+    with pytest.raises(ValueError, match="Cadence"):
+        RecurringSchedule(client_id=1, amount=100, cadence='daily', start_date="2024-01-01").add_schedule(db_manager)
+    with pytest.raises(ValueError, match="End date"):
+        RecurringSchedule(client_id=1, amount=100, start_date="2024-02-01",
+                          end_date="2024-01-01").add_schedule(db_manager)
+
+
+def test_scheduled_occurrences_are_computed_not_stored(db_manager):
+    RecurringSchedule(client_id=1, amount=500, start_date="2024-01-15", end_date="2024-04-30",
+                      description="Retainer").add_schedule(db_manager)
+    IncomeRecord(client_id=1, amount=20, date="2024-02-03").add_record(db_manager)
+
+    assert IncomeRecord.get_monthly_totals(2024, db_manager) == {"02": 20.0}
+    assert IncomeRecord.get_monthly_totals(2024, db_manager, include_scheduled=True) == \
+        {"01": 500.0, "02": 520.0, "03": 500.0, "04": 500.0}
+    days = IncomeRecord.get_daily_records(2024, 2, db_manager, include_scheduled=True)
+    assert days == {"2024-02-03": [(1, 1, 20.0, "", "Retainer Co")],
+                    "2024-02-15": [(None, 1, 500.0, "Retainer", "Retainer Co")]}
+    assert db_manager.execute_query("SELECT COUNT(*) FROM income_records").fetchone()[0] == 1
+
+
+def test_materialize_only_once(db_manager):
+    RecurringSchedule(client_id=1, amount=100, start_date="2024-01-01").add_schedule(db_manager)
+
+    assert RecurringSchedule.materialize("2024-03-10", db_manager) == 3
+    assert RecurringSchedule.materialize("2024-03-31", db_manager) == 0
+    assert RecurringSchedule.materialize("2024-04-01", db_manager) == 1
+    assert RecurringSchedule.get_all_schedules(db_manager)[0].materialized_through == "2024-04-01"
+
+    # Materialized occurrences are ordinary records now and are not counted twice
+    assert IncomeRecord.get_monthly_totals(2024, db_manager, include_scheduled=True) == \
+        {f"{month:02d}": 100.0 for month in range(1, 13)}
+    assert IncomeRecord.get_monthly_totals(2024, db_manager) == {"01": 100.0, "02": 100.0, "03": 100.0, "04": 100.0}
+
+
+def test_materialize_skips_entered_payments_and_publishes_inserts(db_manager):
+    RecurringSchedule(client_id=1, amount=100, start_date="2024-01-01", description="Retainer").add_schedule(db_manager)
+    # February's payment was already entered by hand
+    IncomeRecord(client_id=1, amount=100, date="2024-02-01", description="Retainer").add_record(db_manager)
+    events = []
+    db_manager.events.subscribe(events.append, entity='income_record')
+
+    assert RecurringSchedule.materialize("2024-03-31", db_manager) == 2
+    assert IncomeRecord.get_monthly_totals(2024, db_manager) == {"01": 100.0, "02": 100.0, "03": 100.0}
+    assert [(event.action, event.after["date"]) for event in events] == [("insert", "2024-01-01"),
+                                                                        ("insert", "2024-03-01")]
+    assert all(db_manager.execute_query("SELECT amount FROM income_records WHERE id = ?",
+                                        (event.row_id,)).fetchone()[0] == 100 for event in events)
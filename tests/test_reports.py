@@ -0,0 +1,49 @@
+import csv
+
+import pytest
+from database import DatabaseManager
+from models import Client, IncomeRecord
+from reports import generate_report, summarise_year
+
+
+@pytest.fixture
+def db_manager(db_path):
+    """Fixture providing a DatabaseManager with records over three years for two clients"""
+    db_manager = DatabaseManager(db_path, verbose=False)
+    Client(name="Ann <Design>", email="ann@example.com").add_client(db_manager)
+    for year in (2019, 2020, 2021):
+        IncomeRecord(client_id=1, amount=100, date=f"{year}-01-10").add_record(db_manager)
+        IncomeRecord(client_id=2, amount=50, date=f"{year}-03-05").add_record(db_manager)
+    IncomeRecord.archive_year(2019, db_manager)
+    yield db_manager
+    db_manager.close_connection()
+
+
+def test_summarise_year(db_manager):
+    section = summarise_year(db_manager.db_path, 2020)
+    assert section['total'] == 150.0
+    assert section['months'] == [(1, 100.0, 1), (3, 50.0, 1)]
+    assert section['clients'] == [(1, "Ann <Design>", 100.0, 1), (2, None, 50.0, 1)]
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_csv_report_in_year_order(db_manager, tmpdir, workers):
+    output = str(tmpdir.join("report.csv"))
+    result = generate_report(db_manager, output, report_format='csv', workers=workers)
+    assert result == {'years': [2019, 2020, 2021], 'records': 6, 'total': 450.0}
+
+    with open(output, newline="") as f:
+        rows = list(csv.reader(f))
+    assert [row[1] for row in rows if row[0] == "year"] == ["2019", "2020", "2021"]
+    assert rows[-1] == ["total", "", "", "", "6", "450.0"]
+
+
+def test_text_and_html_reports(db_manager, tmpdir):
+    text = tmpdir.join("report.txt")
+    generate_report(db_manager, str(text), years=[2021])
+    assert "January" in text.read() and "Client #2" in text.read()
+
+    page = tmpdir.join("report.html")
+    generate_report(db_manager, str(page), report_format='html')
+    assert "Ann &lt;Design&gt;" in page.read()
+    assert page.read().rstrip().endswith("</html>")
@@ -0,0 +1,90 @@
+import mmap
+from datetime import date
+
+import pytest
+from database import DatabaseManager
+from models import Client, IncomeRecord
+from snapshot import Snapshot, load_snapshot, to_cents, update_snapshot, write_snapshot
+
+
+@pytest.fixture
+def db_manager(db_path):
+    db_manager = DatabaseManager(db_path, verbose=False)
+    client_id = Client(name="Acme", email="acme@example.com").add_client(db_manager)
+    IncomeRecord.add_records([IncomeRecord(client_id=client_id, amount=amount, date=record_date)
+                              for amount, record_date in ((100.5, "2023-12-31"), (0.29, "2024-01-01"),
+                                                          (1.005, "2024-02-29"))], db_manager)
+    yield db_manager
+    db_manager.close_connection()
+
+
+def columns(snapshot):
+    return [list(column) for column in snapshot.columns]
+
+
+def test_round_trip(db_manager, tmpdir):
+    path = str(tmpdir.join("records.snap"))
+    assert write_snapshot(db_manager, path) == {'rows': 3, 'mode': 'full', 'changes': 0}
+    with Snapshot(path) as snapshot:
+        assert len(snapshot) == 3
+        assert isinstance(snapshot.amounts.obj, mmap.mmap)
+        assert (snapshot.ids.format, snapshot.amounts.format, snapshot.dates.format) == ('q', 'q', 'i')
+        assert list(snapshot.ids) == [1, 2, 3]
+        assert list(snapshot.amounts) == [10050, 29, to_cents(1.005)]
+        assert [date.fromordinal(ordinal).isoformat() for ordinal in snapshot.dates] == \
+            ["2023-12-31", "2024-01-01", "2024-02-29"]
+        assert list(snapshot.client_ids) == [1, 1, 1]
+
+
+def test_incremental_update_matches_full_build(db_manager, tmpdir):
+    path = str(tmpdir.join("records.snap"))
+    full_path = str(tmpdir.join("full.snap"))
+    write_snapshot(db_manager, path)
+    assert update_snapshot(db_manager, path)['mode'] == 'unchanged'
+
+    IncomeRecord(client_id=1, amount=7.5, date="2024-03-01").add_record(db_manager)
+    IncomeRecord(income_id=2, client_id=1, amount=12.34, date="2024-01-02",
+                 description="changed").update_record(db_manager)
+    IncomeRecord.delete_record(1, db_manager)
+    IncomeRecord(client_id=1, amount=1, date="2024-03-02").add_record(db_manager)
+    IncomeRecord.delete_record(5, db_manager)
+    assert update_snapshot(db_manager, path) == {'rows': 3, 'mode': 'incremental', 'changes': 4}
+
+    write_snapshot(db_manager, full_path)
+    with Snapshot(path) as snapshot, Snapshot(full_path) as full:
+        assert columns(snapshot) == columns(full)
+        assert list(snapshot.ids) == [2, 3, 4]
+        assert snapshot.generation == full.generation
+
+
+def test_unparseable_dates_are_merged_like_full_builds(db_manager, tmpdir):
+    path = str(tmpdir.join("records.snap"))
+    full_path = str(tmpdir.join("full.snap"))
+    write_snapshot(db_manager, path)
+    # Stored by raw SQL; julianday() normalizes the first and rejects the second
+    with db_manager.conn:
+        db_manager.conn.executemany("INSERT INTO income_records(client_id, amount, date) VALUES (1, 5, ?)",
+                                    [("2024-02-30",), ("someday",)])
+    assert update_snapshot(db_manager, path) == {'rows': 5, 'mode': 'incremental', 'changes': 2}
+
+    write_snapshot(db_manager, full_path)
+    with Snapshot(path) as snapshot, Snapshot(full_path) as full:
+        assert columns(snapshot) == columns(full)
+        assert list(snapshot.dates)[3:] == [date(2024, 3, 1).toordinal(), 0]
+
+
+def test_archiving_rebuilds(db_manager, tmpdir):
+    db_manager.archive_dir = str(tmpdir)
+    path = str(tmpdir.join("records.snap"))
+    write_snapshot(db_manager, path)
+    IncomeRecord.archive_year(2023, db_manager)
+    assert update_snapshot(db_manager, path) == {'rows': 2, 'mode': 'full', 'changes': 0}
+
+
+def test_foreign_file_is_replaced(db_manager, tmpdir):
+    path = tmpdir.join("records.snap")
+    path.write("not a snapshot")
+    with pytest.raises(ValueError):
+        Snapshot(str(path))
+    with load_snapshot(db_manager, str(path)) as snapshot:
+        assert len(snapshot) == 3
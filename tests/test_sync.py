@@ -0,0 +1,113 @@
+import shutil
+
+import pytest
+import sync
+from database import DatabaseManager
+from models import Client, IncomeRecord
+
+
+@pytest.fixture
+def laptop(tmpdir):
+    db_manager = DatabaseManager(str(tmpdir.join("laptop.db")), verbose=False)
+    yield db_manager
+    db_manager.close_connection()
+
+
+@pytest.fixture
+def desktop_path(tmpdir):
+    return str(tmpdir.join("desktop.db"))
+
+
+def rows(db_manager):
+    return (db_manager.conn.execute("SELECT * FROM clients ORDER BY id").fetchall(),
+            db_manager.conn.execute("SELECT id, client_id, amount, date, description FROM income_records "
+                                    "ORDER BY id").fetchall())
+
+
+def test_triggers_log_changes(laptop):
+    client_id = Client(name="Acme", email="acme@example.com").add_client(laptop)
+    income_id = IncomeRecord(client_id=client_id, amount=10, date="2024-01-05").add_record(laptop)
+    IncomeRecord.delete_record(income_id, laptop)
+
+    delta = sync.export_changes(laptop)
+    assert [(change['table_name'], change['action']) for change in delta['changes']] == \
+        [('clients', 'upsert'), ('income_records', 'upsert'), ('income_records', 'delete')]
+    assert [change['origin_seq'] for change in delta['changes']] == [1, 2, 3]
+    assert delta['changes'][1]['data']['amount'] == 10.0
+    assert delta['versions'] == {delta['origin']: 3}
+    assert sync.export_changes(laptop, since=delta['last_seq'])['changes'] == []
+
+
+def test_sync_both_ways_only_sends_new_changes(laptop, desktop_path):
+    client_id = Client(name="Acme", email="acme@example.com").add_client(laptop)
+    IncomeRecord(client_id=client_id, amount=100, date="2024-01-05").add_record(laptop)
+
+    first = sync.sync_databases(laptop, desktop_path)
+    assert first['pushed']['applied'] == 2 and first['pulled']['applied'] == 0
+
+    desktop = DatabaseManager(desktop_path, verbose=False)
+    IncomeRecord(client_id=client_id, amount=50, date="2024-02-01").add_record(desktop)
+    assert IncomeRecord.get_monthly_totals(2024, desktop)["01"] == 100
+    desktop.close_connection()
+
+    second = sync.sync_databases(laptop, desktop_path)
+    assert second['pulled']['applied'] == 1
+    assert second['pushed'] == {'applied': 0, 'unchanged': 0, 'skipped': 0, 'conflicts': []}
+    assert IncomeRecord.get_monthly_totals(2024, laptop)["02"] == 50
+
+    desktop = DatabaseManager(desktop_path, verbose=False)
+    assert rows(desktop) == rows(laptop)
+    desktop.close_connection()
+
+
+def test_concurrent_edits_resolve_last_writer_wins(laptop, desktop_path):
+    client = Client(name="Acme", email="acme@example.com")
+    client.add_client(laptop)
+    sync.sync_databases(laptop, desktop_path)
+
+    client.notes = "laptop edit"
+    client.update_client(laptop)
+    desktop = DatabaseManager(desktop_path, verbose=False)
+    Client(client.client_id, "Acme", email="acme@example.com", notes="desktop edit").update_client(desktop)
+    desktop.close_connection()
+
+    result = sync.sync_databases(laptop, desktop_path)
+    assert len(result['pulled']['conflicts']) == 1
+    assert result['pushed']['conflicts'][0]['winner'] == 'local'
+    conflict = result['pulled']['conflicts'][0]
+    assert conflict['winner'] == 'remote'
+    assert conflict['local']['data']['notes'] == "laptop edit"
+    assert Client.get_client(client.client_id, laptop)[4] == "desktop edit"
+
+    desktop = DatabaseManager(desktop_path, verbose=False)
+    assert rows(desktop) == rows(laptop)
+    desktop.close_connection()
+
+
+def test_apply_publishes_events_and_rejects_own_origin(laptop, tmpdir):
+    Client(name="Acme", email="acme@example.com").add_client(laptop)
+    delta = sync.export_changes(laptop)
+
+    with pytest.raises(ValueError, match="same origin"):
+        sync.apply_changes(laptop, delta)
+
+    other = DatabaseManager(str(tmpdir.join("other.db")), verbose=False)
+    events = []
+    other.events.subscribe(events.append)
+    assert sync.apply_changes(other, delta)['applied'] == 1
+    assert sync.apply_changes(other, delta)['skipped'] == 1
+    assert [(event.entity, event.action) for event in events] == [('client', 'insert')]
+    other.close_connection()
+
+
+def test_copied_file_needs_new_origin(laptop, desktop_path):
+    Client(name="Acme", email="acme@example.com").add_client(laptop)
+    shutil.copy(laptop.db_path, desktop_path)
+    with pytest.raises(ValueError, match="same origin"):
+        sync.sync_databases(laptop, desktop_path)
+
+    sync.new_origin_id(laptop.conn)
+    Client(name="Beta", email="beta@example.com").add_client(laptop)
+    result = sync.sync_databases(laptop, desktop_path)
+    assert result['pushed']['applied'] == 1
+    assert result['pulled']['applied'] == 0
@@ -0,0 +1,62 @@
+from datetime import date
+
+import pytest
+from database import DatabaseManager
+from models import IncomeRecord
+from tax import TaxEstimator, parse_brackets
+
+
+@pytest.fixture
+def db_manager(db_path):
+    """Fixture providing a DatabaseManager on a database with the application's tables"""
+    db_manager = DatabaseManager(db_path, verbose=False)
+    yield db_manager
+    db_manager.close_connection()
+
+
+def test_tax_on_applies_brackets_progressively():
+    estimator = TaxEstimator([(0, 0.1), (10000, 0.2), (40000, 0.3)], deduction=1000)
+    assert estimator.tax_on(500) == 0
+    assert estimator.tax_on(11000) == pytest.approx(1000)
+    assert estimator.tax_on(51000) == pytest.approx(1000 + 6000 + 3000)
+
+
+def test_monthly_income_follows_writes(db_manager):
+    new_id = IncomeRecord(client_id=1, amount=100, date="2024-01-15").add_record(db_manager)
+    IncomeRecord(client_id=1, amount=50, date="2024-2-5").add_record(db_manager)
+    IncomeRecord(income_id=new_id, client_id=1, amount=70, date="2024-03-01").update_record(db_manager)
+    assert TaxEstimator.get_monthly_income(2024, db_manager)[:3] == [0.0, 50.0, 70.0]
+
+    IncomeRecord.delete_record(new_id, db_manager)
+    assert sum(TaxEstimator.get_monthly_income(2024, db_manager)) == 50.0
+
+
+def test_archived_years_keep_their_income(db_manager):
+    IncomeRecord(client_id=1, amount=100, date="2020-06-01").add_record(db_manager)
+    IncomeRecord.archive_year(2020, db_manager)
+    assert TaxEstimator.get_monthly_income(2020, db_manager)[5] == 100.0
+
+
+def test_estimate_projects_year_and_schedules_payments(db_manager):
+    for month in range(1, 7):
+        IncomeRecord(client_id=1, amount=1000, date=f"2024-{month:02d}-10").add_record(db_manager)
+    estimator = TaxEstimator([(0, 0.1)])
+
+    estimate = estimator.estimate(2024, db_manager, today=date(2024, 7, 1))
+    assert estimate['ytd_income'] == 6000.0
+    assert estimate['projected_income'] == pytest.approx(6000 * 366 / 183, abs=0.01)
+    assert [payment['estimated'] for payment in estimate['payments']] == [False, False, True, True]
+    assert estimate['payments'][0]['amount'] == pytest.approx(12000 * 0.1 / 4)
+    assert estimate['payments'][3]['due_date'] == "2025-01-15"
+    assert sum(payment['amount'] for payment in estimate['payments']) == pytest.approx(estimate['projected_tax'])
+
+
+def test_settings_round_trip(db_manager):
+    assert TaxEstimator.load(db_manager) is None
+    TaxEstimator(parse_brackets("0:0.1, 11000:0.12"), deduction=500).save(db_manager)
+    estimator = TaxEstimator.load(db_manager)
+    assert estimator.brackets == [(0.0, 0.1), (11000.0, 0.12)]
+    assert estimator.deduction == 500.0
+
+    with pytest.raises(ValueError, match="Invalid tax bracket"):
+        parse_brackets("0:ten")
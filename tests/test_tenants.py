@@ -0,0 +1,145 @@
+import threading
+import time
+
+import pytest
+import tenants
+from database import DatabaseManager
+from models import Client, IncomeRecord
+from tenants import TenantPool, TenantRegistry
+
+
+@pytest.fixture
+def registry(tmpdir):
+    registry = TenantRegistry(str(tmpdir.join("tenants")))
+    yield registry
+    registry.close()
+
+
+def test_registry(registry):
+    path = registry.register("alice")
+    assert registry.register("alice") == path
+    assert path.endswith("alice.sqlite")
+    assert registry.tenants() == ["alice"]
+    with pytest.raises(KeyError):
+        registry.path("bob")
+    with pytest.raises(ValueError):
+        registry.register("../escape")
+
+
+def test_tenants_are_isolated_and_counted(registry):
+    pool = TenantPool(registry)
+    for tenant_id in ("alice", "bob"):
+        registry.register(tenant_id)
+    client_id = pool.run("alice", Client(name="Acme", email="acme@example.com").add_client)
+    pool.run("alice", IncomeRecord(client_id=client_id, amount=100, date="2024-03-01").add_record)
+
+    assert pool.run("alice", IncomeRecord.get_monthly_totals, 2024) == {"03": 100.0}
+    assert pool.run("bob", IncomeRecord.get_monthly_totals, 2024) == {}
+
+    stats = pool.stats()
+    assert stats["alice"]["calls"] == 3 and stats["bob"]["calls"] == 1
+    assert stats["alice"]["statements"] >= 3
+    assert stats["alice"]["opens"] == 1
+    pool.close()
+
+
+def test_open_handles_are_capped(registry):
+    pool = TenantPool(registry, max_open=3)
+    for number in range(20):
+        registry.register(f"t{number}")
+        pool.run(f"t{number}", Client.get_all_clients)
+        assert pool.open_count() <= 3
+    assert pool.stats("t0")["evictions"] == 1
+
+    # A handle in use is never closed under its caller
+    with pool.session("t19") as db_manager:
+        for number in range(5):
+            pool.run(f"t{number}", Client.get_all_clients)
+        assert db_manager.execute_query("SELECT COUNT(*) FROM clients").fetchone() == (0,)
+    pool.close()
+    assert pool.open_count() == 0
+
+
+def test_idle_handles_are_evicted(registry):
+    pool = TenantPool(registry, idle_timeout=0)
+    registry.register("alice")
+    pool.run("alice", Client.get_all_clients)
+    pool.evict_idle()
+    assert pool.open_count() == 0
+    assert pool.stats("alice")["evictions"] == 1
+
+
+def test_concurrent_tenants(registry):
+    pool = TenantPool(registry, max_open=4)
+    tenant_ids = [f"t{number}" for number in range(8)]
+    for tenant_id in tenant_ids:
+        registry.register(tenant_id)
+    errors = []
+
+    def work(tenant_id):
+        try:
+            for day in range(1, 11):
+                pool.run(tenant_id, IncomeRecord(client_id=1, amount=day, date=f"2024-01-{day:02d}").add_record)
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=work, args=(tenant_id,)) for tenant_id in tenant_ids]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert errors == []
+    assert all(pool.run(tenant_id, IncomeRecord.get_monthly_totals, 2024) == {"01": 55.0} for tenant_id in tenant_ids)
+    pool.close()
+
+
+def test_slow_open_does_not_block_other_tenants(registry, monkeypatch):
+    pool = TenantPool(registry)
+    registry.register("cached")
+    slow_path = registry.register("slow")
+    pool.run("cached", Client.get_all_clients)
+    opening = threading.Event()
+    finish = threading.Event()
+
+    def open_database(path, **options):
+        if path == slow_path:
+            opening.set()
+            finish.wait(5)
+        return DatabaseManager(path, **options)
+
+    monkeypatch.setattr(tenants, "DatabaseManager", open_database)
+    results = []
+    callers = [threading.Thread(target=lambda: results.append(pool.run("slow", Client.get_all_clients)))
+               for _ in range(2)]
+    for caller in callers:
+        caller.start()
+    assert opening.wait(5)
+
+    started = time.perf_counter()
+    assert pool.run("cached", Client.get_all_clients) == []
+    assert time.perf_counter() - started < 1
+    assert results == []
+
+    finish.set()
+    for caller in callers:
+        caller.join()
+    assert results == [[], []]
+    assert pool.stats("slow")["opens"] == 1
+    pool.close()
+
+
+def test_failed_open_releases_its_slot(registry, monkeypatch):
+    pool = TenantPool(registry, max_open=1)
+    registry.register("broken")
+    registry.register("alice")
+
+    def open_database(path, **options):
+        raise OSError("disk unavailable")
+
+    monkeypatch.setattr(tenants, "DatabaseManager", open_database)
+    with pytest.raises(OSError):
+        pool.run("broken", Client.get_all_clients)
+    monkeypatch.undo()
+    assert pool.open_count() == 0
+    assert pool.run("alice", Client.get_all_clients) == []
+    pool.close()
@@ -0,0 +1,108 @@
+import sqlite3
+import threading
+
+import pytest
+from database import DatabaseManager, is_read_query
+from models import IncomeRecord
+from write_queue import WriteQueue
+
+
+def test_concurrent_writers_share_one_queue(db_path):
+    errors = []
+    ids = []
+
+    def worker(worker_id):
+        db_manager = DatabaseManager(db_path, verbose=False)
+        db_manager.enable_write_queue()
+        try:
+            for i in range(50):
+                record = IncomeRecord(client_id=worker_id, amount=10, date="2024-03-01", description=str(i))
+                ids.append(record.add_record(db_manager))
+        except sqlite3.Error as e:
+            errors.append(e)
+        finally:
+            db_manager.close_connection()
+
+    threads = [threading.Thread(target=worker, args=(n,)) for n in range(1, 9)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+    assert len(set(ids)) == 400
+    db_manager = DatabaseManager(db_path, verbose=False)
+    assert db_manager.execute_query("SELECT COUNT(*) FROM income_records").fetchone()[0] == 400
+    db_manager.close_connection()
+
+
+def test_group_commit_and_failed_statement(db_path):
+    write_queue = WriteQueue(db_path, max_batch=50, max_delay=0.05)
+    sql = "INSERT INTO income_records(client_id, amount, date) VALUES (?, ?, ?)"
+    futures = [write_queue.submit(sql, (1, 5.0, "2024-01-01")) for _ in range(20)]
+    bad = write_queue.submit(sql, (1, None, "2024-01-01"))  # amount is NOT NULL
+    futures += [write_queue.submit(sql, (1, 5.0, "2024-01-02")) for _ in range(20)]
+
+    assert len({future.result(timeout=5).lastrowid for future in futures}) == 40
+    with pytest.raises(sqlite3.IntegrityError):
+        bad.result(timeout=5)
+
+    stats = write_queue.stats()
+    write_queue.close()
+    assert stats['operations'] == 41
+    assert stats['commits'] < stats['operations']
+    assert stats['queue_depth'] == 0
+
+
+def test_busy_database_is_retried(db_path):
+    write_queue = WriteQueue(db_path, busy_timeout=0.01, backoff=0.01, max_retries=10)
+    blocker = sqlite3.connect(db_path, isolation_level=None, check_same_thread=False)
+    blocker.execute("BEGIN IMMEDIATE")
+
+    future = write_queue.submit("INSERT INTO clients(name) VALUES (?)", ("Locked Out",))
+    timer = threading.Timer(0.1, blocker.execute, args=("COMMIT",))
+    timer.start()
+
+    assert future.result(timeout=10).lastrowid == 1
+    timer.join()
+    blocker.close()
+    assert write_queue.stats()['retries'] > 0
+    write_queue.close()
+
+
+@pytest.mark.parametrize("query, expected", [
+    ("SELECT 1", True),
+    ("  with t AS (SELECT 1) SELECT * FROM t", True),
+    ("-- totals\nSELECT 1", True),
+    ("/* header */ /* more */\n  pragma user_version", True),
+    ("-- note\nINSERT INTO clients(name) VALUES ('x')", False),
+    ("UPDATE clients SET name = 'x'", False),
+    ("", True),
+    ("-- only a comment", True),
+])
+def test_is_read_query(query, expected):
+    assert is_read_query(query) is expected
+
+
+def test_commented_select_runs_directly_with_queue_enabled(db_path):
+    db_manager = DatabaseManager(db_path, verbose=False)
+    db_manager.enable_write_queue()
+    db_manager.execute_query("INSERT INTO clients(name) VALUES (?)", ("Queued",))
+    assert db_manager.execute_query("-- all clients\nSELECT name FROM clients").fetchall() == [("Queued",)]
+    db_manager.close_connection()
+
+
+@pytest.mark.filterwarnings("ignore::pytest.PytestUnhandledThreadExceptionWarning")
+def test_writer_failure_fails_pending_futures(tmpdir):
+    write_queue = WriteQueue(str(tmpdir.join("missing", "dir", "queue.db")))
+    try:
+        future = write_queue.submit("INSERT INTO clients(name) VALUES ('x')")
+    except RuntimeError:
+        pass  # the writer thread already failed
+    else:
+        with pytest.raises(sqlite3.OperationalError):
+            future.result(timeout=5)
+    write_queue._thread.join(5)
+    with pytest.raises(RuntimeError):
+        write_queue.submit("INSERT INTO clients(name) VALUES ('y')")
+    assert isinstance(write_queue.error, sqlite3.OperationalError)
@@ -0,0 +1,267 @@
+import os
+import queue
+import random
+import sqlite3
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import Future
+
+# Result of one queued write; stands in for the cursor execute_query would return
+WriteResult = namedtuple('WriteResult', ['lastrowid', 'rowcount'])
+
+_STOP = object()
+
+
+def is_busy_error(error):
+    """
+    Check whether a sqlite3 error means another connection holds the lock (SQLITE_BUSY / SQLITE_LOCKED).
+    :param error: sqlite3.Error instance.
+    :return: Boolean.
+    """
+    message = str(error).lower()
+    return isinstance(error, sqlite3.OperationalError) and ("locked" in message or "busy" in message)
+
+
+class WriteQueue:
+    """
+    Serializes writes to one database file through a single writer thread.
+    Queued statements are committed in groups: a group closes when it holds 'max_batch' statements or
+    'max_delay' seconds after its first statement arrived. Each statement runs inside its own savepoint,
+    so a failing statement does not roll back the rest of its group.
+    """
+    def __init__(self, db_path, max_batch=200, max_delay=0.005, max_retries=8, backoff=0.005, busy_timeout=0.1):
+        """
+        Start the writer thread.
+        Args:
+            db_path: Path of the SQLite database file. Must be a file; ':memory:' is private to the writer.
+            max_batch: Maximum number of statements per commit.
+            max_delay: Seconds to wait for more statements before committing a group.
+            max_retries: Attempts made on SQLITE_BUSY before failing the group.
+            backoff: Initial sleep in seconds between attempts; doubled after each attempt.
+            busy_timeout: Seconds SQLite itself waits on a lock before reporting SQLITE_BUSY.
+        """
+        self.db_path = db_path
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.busy_timeout = busy_timeout
+
+        self.operations = 0
+        self.commits = 0
+        self.retries = 0
+        self.busy_errors = 0
+        self.last_commit_latency = 0.0
+        self.max_commit_latency = 0.0
+        self.total_commit_latency = 0.0
+        self.total_queue_wait = 0.0
+
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._closed = False
+        # Set when the writer thread stops because of an unexpected error
+        self.error = None
+        self._thread = threading.Thread(target=self._run, name="mota-writer", daemon=True)
+        self._thread.start()
+
+    def submit(self, query, params=None):
+        """
+        Queue a write statement.
+        Args:
+            query: SQL statement to execute
+            params: Optional values to be used in the SQL statement
+
+        Returns:
+            concurrent.futures.Future resolving to a WriteResult once the statement's group is committed.
+        """
+        future = Future()
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("Write queue is closed.") from self.error
+            self._queue.put((query, params, future, time.perf_counter()))
+        return future
+
+    @property
+    def queue_depth(self):
+        """Number of statements waiting for the writer thread."""
+        return self._queue.qsize()
+
+    def stats(self):
+        """
+        Return a snapshot of the queue's counters.
+        :return: A dictionary of queue depth, throughput, latency and retry figures. Latencies are in seconds.
+        """
+        commits = self.commits
+        return {
+            'queue_depth': self.queue_depth,
+            'operations': self.operations,
+            'commits': commits,
+            'average_batch_size': self.operations / commits if commits else 0.0,
+            'last_commit_latency': self.last_commit_latency,
+            'average_commit_latency': self.total_commit_latency / commits if commits else 0.0,
+            'max_commit_latency': self.max_commit_latency,
+            'average_queue_wait': self.total_queue_wait / self.operations if self.operations else 0.0,
+            'retries': self.retries,
+            'busy_errors': self.busy_errors,
+        }
+
+    def close(self, timeout=None):
+        """
+        Commit everything already queued, then stop the writer thread.
+        :param timeout: Seconds to wait for the writer thread to finish.
+        """
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            self._queue.put(_STOP)
+        self._thread.join(timeout)
+
+    def _run(self):
+        try:
+            self._drain()
+        except BaseException as e:
+            self.error = e
+            self._fail_pending(e)
+            raise
+
+    def _fail_pending(self, error):
+        """Close the queue and fail every statement still waiting, so no caller blocks forever."""
+        with self._lock:
+            self._closed = True
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                return
+            if item is not _STOP and item[2].set_running_or_notify_cancel():
+                item[2].set_exception(error)
+
+    def _drain(self):
+        conn = sqlite3.connect(self.db_path, timeout=self.busy_timeout, isolation_level=None)
+        try:
+            stopping = False
+            while not stopping:
+                item = self._queue.get()
+                if item is _STOP:
+                    break
+                batch = [item]
+                deadline = time.perf_counter() + self.max_delay
+                while len(batch) < self.max_batch:
+                    remaining = deadline - time.perf_counter()
+                    try:
+                        item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+                    except queue.Empty:
+                        break
+                    if item is _STOP:
+                        stopping = True
+                        break
+                    batch.append(item)
+                try:
+                    self._commit_batch(conn, batch)
+                except BaseException as e:
+                    for _, _, future, _ in batch:
+                        if not future.done() and (future.running() or future.set_running_or_notify_cancel()):
+                            future.set_exception(e)
+                    raise
+        finally:
+            conn.close()
+
+    def _commit_batch(self, conn, batch):
+        # Callers may have cancelled their future while it was queued
+        batch = [op for op in batch if op[2].set_running_or_notify_cancel()]
+        if not batch:
+            return
+
+        attempt = 0
+        while True:
+            started = time.perf_counter()
+            try:
+                results = self._execute_batch(conn, batch)
+                break
+            except sqlite3.Error as e:
+                if conn.in_transaction:
+                    conn.execute("ROLLBACK")
+                if is_busy_error(e):
+                    self.busy_errors += 1
+                    if attempt < self.max_retries:
+                        self.retries += 1
+                        # Exponential backoff with jitter so competing processes do not retry in lockstep
+                        time.sleep(self.backoff * (2 ** attempt) * random.uniform(0.5, 1.0))
+                        attempt += 1
+                        continue
+                for _, _, future, _ in batch:
+                    future.set_exception(e)
+                return
+
+        committed = time.perf_counter()
+        latency = committed - started
+        self.commits += 1
+        self.operations += len(batch)
+        self.last_commit_latency = latency
+        self.total_commit_latency += latency
+        self.max_commit_latency = max(self.max_commit_latency, latency)
+        for (_, _, future, queued), result in zip(batch, results):
+            self.total_queue_wait += started - queued
+            if isinstance(result, Exception):
+                future.set_exception(result)
+            else:
+                future.set_result(result)
+
+    @staticmethod
+    def _execute_batch(conn, batch):
+        conn.execute("BEGIN IMMEDIATE")
+        results = []
+        for query, params, _, _ in batch:
+            conn.execute("SAVEPOINT queued_write")
+            try:
+                cursor = conn.execute(query, params or ())
+            except sqlite3.Error as e:
+                if is_busy_error(e):
+                    raise
+                conn.execute("ROLLBACK TO queued_write")
+                results.append(e)
+            else:
+                results.append(WriteResult(cursor.lastrowid, cursor.rowcount))
+            conn.execute("RELEASE queued_write")
+        conn.execute("COMMIT")
+        return results
+
+
+# Queues shared by every DatabaseManager writing to the same file in this process
+_shared_queues = {}
+_shared_lock = threading.Lock()
+
+
+def acquire_write_queue(db_path, **options):
+    """
+    Return the process-wide WriteQueue for a database file, starting it if needed.
+    Every call must be paired with release_write_queue().
+    :param db_path: Path of the SQLite database file.
+    :param options: WriteQueue options, used only when the queue is started.
+    :return: WriteQueue instance.
+    """
+    key = os.path.abspath(db_path)
+    with _shared_lock:
+        entry = _shared_queues.get(key)
+        if entry is None:
+            entry = _shared_queues[key] = [WriteQueue(db_path, **options), 0]
+        entry[1] += 1
+        return entry[0]
+
+
+def release_write_queue(write_queue):
+    """
+    Drop one reference to a shared WriteQueue, closing it when the last user releases it.
+    :param write_queue: WriteQueue returned by acquire_write_queue().
+    """
+    with _shared_lock:
+        for key, entry in list(_shared_queues.items()):
+            if entry[0] is write_queue:
+                entry[1] -= 1
+                if entry[1] == 0:
+                    del _shared_queues[key]
+                    break
+                return
+    write_queue.close()